@@ -1,15 +1,15 @@
-import base64
-import pyotp
-from django.contrib.auth import login, logout, authenticate
-from django.conf import settings
+from django.contrib.auth import login, logout
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 from rest_framework.permissions import IsAuthenticated
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenRefreshView
 
 from authentication.serializers import (
     SuperAdminRegistrationSerializer,
@@ -18,44 +18,61 @@ from authentication.serializers import (
     ResetPasswordSerializer,
     EmailandPhoneNumberSerializer,
     OTPVerificationSerializer,
-    ResendOTPSerializer
+    ResendOTPSerializer,
+    RevocableTokenRefreshSerializer,
 )
-
+from authentication.backends import PooledModelBackend
+from authentication.denylist import denylist
+from authentication.groups import SUPER_ADMIN
+from authentication.hashing import HashingPoolFull
+from authentication.otp import otp_remaining_validity
+from authentication.outbox import enqueue_otp_email
+from authentication.tokens import tokens_for_user
+
+from grito_talent_pool_server.images import ImageUploadMixin, schedule_delete, schedule_variants
 from grito_talent_pool_server.utils import (
     error_400,
     error_406,
     error_401,
     serializer_errors,
     error_404,
-    GenerateKey,
     error_response,
+    error_503,
 )
+from grito_talent_pool_server.views import AsyncAPIView
 
 User = get_user_model()
 
 
-class AdminRegistrationView(APIView):
+class AdminRegistrationView(AsyncAPIView):
     permission_classes = (AllowAny,)  # For now, it is open
     serializer_class = SuperAdminRegistrationSerializer
+    # BEGIN, INSERT user, INSERT user-group row, INSERT outbox email, COMMIT, and the group id
+    # lookup until it is cached
+    query_budget = 6
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         serializer = self.serializer_class(
             data=request.data, context={"request": request}
         )
 
         if serializer.is_valid():
-            code, result = serializer.create(serializer.validated_data)
+            try:
+                code, result = await serializer.acreate(serializer.validated_data)
+            except HashingPoolFull:
+                return error_503("Server is busy. Kindly retry shortly")
             if code == 406:
                 return error_406(result)
-            email = result["email"]
-            user = User.objects.get(email=email)
-            refresh = RefreshToken.for_user(user)
+            user = result
+            # Admin rights are only claimed by tokens issued at login, once the OTP is confirmed
+            refresh = tokens_for_user(user, groups=[])
             user_data = UserUpdateVerifiedSerializer(user).data
             return Response(
                 {
                     "code": 201,
                     "status": "success",
                     "message": "Super User created successfully, Check email for verification code",
+                    "expires_in": otp_remaining_validity(),
                     "name": user_data['name'],
                     'email': user_data['email'],
                     "refresh": str(refresh),
@@ -71,30 +88,58 @@ class AdminRegistrationView(APIView):
 
 
 class LogoutView(APIView):
+    """
+    Revoke the access token of the request and the `refresh` token of the body, if any.
+    The session and access token are ended even when the refresh token is invalid.
+    """
+
     @staticmethod
     def post(request):
+        if request.auth is not None:
+            denylist.revoke_token(request.auth)
         logout(request)
+        refresh = request.data.get("refresh")
+        if refresh:
+            try:
+                denylist.revoke_token(RefreshToken(refresh))
+            except TokenError:
+                return error_400("Invalid refresh token")
         return Response({'message': "Logout successful"})
 
 
-class AdminLoginView(APIView):
+class RefreshTokenView(TokenRefreshView):
+    """A new access token for a refresh token that was not revoked"""
+
+    serializer_class = RevocableTokenRefreshSerializer
+    # SELECT user on a user cache miss, the revocation check on a denylist filter hit, and
+    # up to 3 for a denylist sync (see ResetPasswordView)
+    query_budget = 5
+
+
+class AdminLoginView(AsyncAPIView):
     permission_classes = [AllowAny]
     serializer_class = LoginSerializer
+    # The user with its super admin flag, the group id lookup until it is cached, and the
+    # password update when its hash is outdated
+    query_budget = 3
 
-    def post(self, request):
+    async def post(self, request):
         serializer = self.serializer_class(data=request.data)
 
         if serializer.is_valid():
             email = serializer.validated_data["email"]
             password = serializer.validated_data["password"]
-            user = authenticate(request, email=email.lower(), password=password)
+            try:
+                user = await PooledModelBackend().aauthenticate(request, email=email.lower(), password=password)
+            except HashingPoolFull:
+                return error_503("Server is busy. Kindly retry shortly")
 
             if user is not None:
                 if user.is_verified:
-                    if user.groups.filter(name="super-admin").exists():
+                    if user.is_super_admin:
                         the_serializer = UserUpdateVerifiedSerializer(user).data
 
-                        refresh = RefreshToken.for_user(user)
+                        refresh = tokens_for_user(user, groups=[SUPER_ADMIN])
 
                         return Response(
                             {
@@ -126,21 +171,27 @@ class AdminLoginView(APIView):
             return error_response(error_message, status.HTTP_400_BAD_REQUEST)
 
 
-class ResetPasswordView(APIView):
+class ResetPasswordView(AsyncAPIView):
     serializer_class = ResetPasswordSerializer
     permission_classes = [IsAuthenticated]
+    # SELECT user on a user cache miss, UPDATE password, and up to 3 for a token denylist sync:
+    # a rebuild purges expired rows in its own transaction, whose BEGIN SQLite sends as a query
+    query_budget = 5
 
-    def post(self, request):
+    async def post(self, request):
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
-            user = User.objects.get(id=request.user.id)
-            name = serializer.save(user=user)
+            user = request.user
+            try:
+                name = await serializer.asave(user=user)
+            except HashingPoolFull:
+                return error_503("Server is busy. Kindly retry shortly")
             user_data = UserUpdateVerifiedSerializer(user).data
             return Response(
                 {
                     "code": 200,
                     "message": "Your password has been changed successfully!",
-                    "email_verification": user_data['is_email_verified'],
+                    "email_verification": user_data['is_verified'],
                     "user_type": user_data['user_type'],
                     "name": name
                 },
@@ -154,31 +205,25 @@ class ResetPasswordView(APIView):
 class ResetPasswordEmailView(APIView):
     permission_classes = (AllowAny,)
     serializer_class = EmailandPhoneNumberSerializer
+    # SELECT user, cooldown check, BEGIN, INSERT outbox email
+    query_budget = 4
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
             email_address = serializer.data.get("email").lower()
-            try:
-                keygen = GenerateKey()
-                key = base64.b32encode(keygen.return_value(email_address).encode()).decode("utf-8")
-                OTP = pyotp.TOTP(key, interval=settings.OTP_TIMEOUT)
-                otp_code = OTP.now()
-                message = "Kindly check your email for your verification code to reset your password"
-                email = email_address
-                user = User.objects.get(email=email)
-                # send_otp_email(email, otp_code, user.first_name)
-
-                return Response(
-                    {
-                        "status": "Successful",
-                        "message": message
-                    },
-                    status=status.HTTP_200_OK,
-                )
-
-            except User.DoesNotExist:
+            user = User.objects.filter(email=email_address).only("first_name").first()
+            if user is None:
                 return error_404("User with this email does not exist")
+            enqueue_otp_email(email_address, user.first_name, cooldown=settings.OTP_RESEND_COOLDOWN)
+            return Response(
+                {
+                    "status": "Successful",
+                    "message": "Kindly check your email for your verification code to reset your password",
+                    "expires_in": otp_remaining_validity(),
+                },
+                status=status.HTTP_200_OK,
+            )
 
         else:
             default_errors = serializer.errors
@@ -188,6 +233,8 @@ class ResetPasswordEmailView(APIView):
 
 class OTPVerificationView(APIView):
     serializer_class = OTPVerificationSerializer
+    # User lookup and verification, then login(): session rotation and insert, last_login update
+    query_budget = 12
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
@@ -196,15 +243,15 @@ class OTPVerificationView(APIView):
             name = serializer.validated_data["name"]
             user_data = UserUpdateVerifiedSerializer(verified_user).data
             login(request, verified_user)
-            refresh = RefreshToken.for_user(verified_user)
+            refresh = tokens_for_user(verified_user)
 
             return Response(
                 {
                     "code": 200,
                     "status": "success",
                     "message": "OTP verification successful",
-                    "email_verification": user_data['is_email_verified'] or None,
-                    "phone_verification": user_data['is_phone_number_verified'] or None,
+                    "email_verification": user_data['is_verified'] or None,
+                    "phone_verification": None,
                     "user_type": user_data['user_type'],
                     "name": name,
                     "refresh": str(refresh),
@@ -219,6 +266,9 @@ class OTPVerificationView(APIView):
 
 
 class ResendOTPView(APIView):
+    # 2 user lookups, cooldown check, BEGIN, INSERT outbox email, COMMIT
+    query_budget = 6
+
     @staticmethod
     def post(request, *args, **kwargs):
         email = request.data.get("email")
@@ -226,5 +276,39 @@ class ResendOTPView(APIView):
         serializer = ResendOTPSerializer(data={"email": email})
         if serializer.is_valid():
             serializer.resend_otp()
-            return Response(status=status.HTTP_200_OK)
+            # Seconds the code being sent stays valid
+            return Response({"expires_in": otp_remaining_validity()}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class UserImageView(ImageUploadMixin, APIView):
+    """
+    Replace the signed-in user's image with the `image` file of a multipart body. Responds
+    once the file is stored; its variants are added, and the previous image deleted, in the background.
+    """
+
+    permission_classes = [IsAuthenticated]
+    image_name_prefix = "user"
+
+    def put(self, request):
+        _, image, error = self.get_image_data(request)
+        if error is not None:
+            return error
+        if image is None:
+            return error_400("image is required")
+        user = User.objects.get(pk=request.user.pk)
+        previous_image = user.image_url
+        user.image_url = image.url
+        user.image_variants = {}
+        user.save(update_fields=["image_url", "image_variants"])
+        schedule_delete(previous_image)
+        schedule_variants(user, "image_url", "image_variants", image)
+        return Response(
+            {
+                "code": 202,
+                "status": "success",
+                "message": "Image uploaded successfully",
+                "data": {"image_url": user.image_url, "image_variants": user.image_variants},
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.signals import user_login_failed
+from django.db.models import Exists, OuterRef
+
+from .groups import SUPER_ADMIN, aget_group_id
+from .hashing import acheck_password, amake_password
+
+User = get_user_model()
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend with an async path that verifies the password in the bounded hashing pool.
+    The user is loaded together with an `is_super_admin` flag, so a login needs a single
+    query before the password check. Raises HashingPoolFull when the pool cannot take the job.
+    Failed attempts send user_login_failed, which django.contrib.auth.aauthenticate would
+    send for views that call it.
+    """
+
+    @staticmethod
+    def get_login_queryset(super_admin_group_id):
+        return User._default_manager.annotate(
+            is_super_admin=Exists(
+                User.groups.through.objects.filter(
+                    user_id=OuterRef("pk"), group_id=super_admin_group_id
+                )
+            )
+        )
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        queryset = self.get_login_queryset(await aget_group_id(SUPER_ADMIN))
+        try:
+            user = await queryset.aget(**{User.USERNAME_FIELD: username})
+        except User.DoesNotExist:
+            # Run the hasher once to reduce the timing difference between an existing
+            # and a nonexistent user, as ModelBackend.authenticate does.
+            await amake_password(password)
+            await self.login_failed(request, username)
+            return None
+
+        if await acheck_password(user, password) and self.user_can_authenticate(user):
+            return user
+        await self.login_failed(request, username)
+        return None
+
+    @staticmethod
+    async def login_failed(request, username):
+        # The password is masked as django.contrib.auth does before sending the signal
+        credentials = {User.USERNAME_FIELD: username, "password": "********************"}
+        await user_login_failed.asend(sender=__name__, credentials=credentials, request=request)
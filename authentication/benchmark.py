@@ -0,0 +1,204 @@
+import itertools
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .groups import SUPER_ADMIN
+from .models import User
+from .otp import generate_otp
+from .tokens import tokens_for_user
+
+PASSWORD = "Passw0rd!x"
+# Distinguishes the fixtures of repeated runs against one database
+_runs = itertools.count()
+
+
+class Scenario:
+    """
+    One auth endpoint driven through the test client.
+    `prepare(i)` creates what request i needs, outside the measured time, and returns the
+    keyword arguments of client.post.
+    """
+
+    def __init__(self, name, url_name, expected_status, prepare):
+        self.name = name
+        self.url_name = url_name
+        self.expected_status = expected_status
+        self.prepare = prepare
+
+
+def create_user(email, **fields):
+    return User.objects.create(
+        email=email,
+        username=email.split("@")[0],
+        name="Bench",
+        first_name="Bench",
+        password=make_password(PASSWORD),
+        is_active=True,
+        **fields,
+    )
+
+
+def auth_scenarios():
+    """Scenarios of the six public auth views, with their fixtures"""
+    run = next(_runs)
+    counter = itertools.count()
+    group, _ = Group.objects.get_or_create(name=SUPER_ADMIN)
+    admin = create_user(f"bench-admin-{run}@example.com", is_verified=True, user_type="super-admin")
+    admin.groups.add(group)
+    access = str(tokens_for_user(admin, groups=[SUPER_ADMIN]).access_token)
+
+    def json_post(data, **extra):
+        return {"data": json.dumps(data), "content_type": "application/json", **extra}
+
+    def sign_up(i):
+        return json_post(
+            {"name": "Bench", "username": f"bench{i}", "email": f"bench-{run}-{i}@example.com", "password": PASSWORD}
+        )
+
+    def confirm_otp(i):
+        # A newly signed up user confirming the code it was sent
+        user = create_user(f"bench-otp-{run}-{next(counter)}@example.com", is_verified=False)
+        return json_post({"email": user.email, "otp_code": generate_otp(user.email)})
+
+    return [
+        Scenario("sign-up", "create-admin-user", 201, sign_up),
+        Scenario("login", "login-admin", 200, lambda i: json_post({"email": admin.email, "password": PASSWORD})),
+        Scenario("confirm-otp", "confirm-otp", 200, confirm_otp),
+        Scenario("resend-otp", "resend-otp", 200, lambda i: json_post({"email": admin.email})),
+        Scenario("reset-password-request", "reset-password-link", 200, lambda i: json_post({"email": admin.email})),
+        Scenario(
+            "reset-password",
+            "reset-password",
+            200,
+            lambda i: json_post(
+                {"password": PASSWORD, "confirm_password": PASSWORD}, HTTP_AUTHORIZATION=f"Bearer {access}"
+            ),
+        ),
+    ]
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def measure(client, scenario, iterations, warmup=2, allocation_iterations=5):
+    """
+    :return: dict of wall time percentiles and the largest query count over `iterations`
+        requests, and the median of the peak memory allocated per request, which is traced
+        in separate requests since tracing slows them down
+    :raises BenchmarkError: when a response has an unexpected status
+    """
+    url = reverse(scenario.url_name)
+    sequence = itertools.count()
+
+    def post():
+        kwargs = scenario.prepare(next(sequence))
+        started = time.perf_counter()
+        response = client.post(url, **kwargs)
+        elapsed = time.perf_counter() - started
+        if response.status_code != scenario.expected_status:
+            raise BenchmarkError(
+                f"{scenario.name}: expected {scenario.expected_status}, got {response.status_code}: "
+                f"{response.content[:500]!r}"
+            )
+        return elapsed
+
+    for _ in range(warmup):
+        post()
+
+    durations = []
+    queries = 0
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            durations.append(post())
+        queries = max(queries, len(captured))
+
+    allocations = []
+    tracemalloc.start()
+    try:
+        for _ in range(allocation_iterations):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            post()
+            allocations.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+
+    quantiles = statistics.quantiles(durations, n=100, method="inclusive")
+    return {
+        "p50Ms": round(quantiles[49] * 1000, 3),
+        "p95Ms": round(quantiles[94] * 1000, 3),
+        "maxMs": round(max(durations) * 1000, 3),
+        "queries": queries,
+        "allocatedKiB": round(statistics.median(allocations) / 1024, 1),
+    }
+
+
+def run_benchmark(iterations=50, scenarios=None):
+    """
+    Drive every scenario `iterations` times through the Django test client, against the
+    current database. Mail is only queued in the outbox by these views; callers that may
+    reach the provider should point the mail client at the ZeptoMail stub.
+    """
+    if iterations < 2:
+        raise BenchmarkError("At least 2 iterations are needed for percentiles")
+    client = Client()
+    return {
+        "vendor": connection.vendor,
+        "iterations": iterations,
+        "passwordHashIterations": settings.PASSWORD_HASH_ITERATIONS,
+        "scenarios": {
+            scenario.name: measure(client, scenario, iterations) for scenario in scenarios or auth_scenarios()
+        },
+    }
+
+
+def query_baseline(results):
+    """
+    :return: `results` without timings, which depend on the machine, so it can be committed
+        and compared anywhere
+    """
+    return {
+        "vendor": results["vendor"],
+        "iterations": results["iterations"],
+        "scenarios": {name: {"queries": result["queries"]} for name, result in results["scenarios"].items()},
+    }
+
+
+def compare(results, baseline, tolerance=0.2, min_delta_ms=1.0):
+    """
+    :param baseline: Full results, or a query_baseline, whose scenarios have no p95 to compare
+    :param tolerance: Share by which p95 may exceed its baseline
+    :param min_delta_ms: Increase of p95 always tolerated, so sub-millisecond noise is not a regression
+    :return: A message per regression: p95 beyond the tolerance, or any extra query
+    :raises BenchmarkError: when the baseline was recorded on another database or password hashing cost
+    """
+    # Hashing cost only matters to timings, which a query baseline does not have
+    keys = ("vendor", "passwordHashIterations") if "passwordHashIterations" in baseline else ("vendor",)
+    for key in keys:
+        if baseline.get(key) != results[key]:
+            raise BenchmarkError(
+                f"The baseline was recorded with {key} {baseline.get(key)}, not {results[key]}; record a new one"
+            )
+    regressions = []
+    for name, current in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        if "p95Ms" in base:
+            allowed = max(base["p95Ms"] * (1 + tolerance), base["p95Ms"] + min_delta_ms)
+            if current["p95Ms"] > allowed:
+                regressions.append(f"{name}: p95 {current['p95Ms']} ms, baseline {base['p95Ms']} ms")
+        if current["queries"] > base["queries"]:
+            regressions.append(f"{name}: {current['queries']} queries, baseline {base['queries']}")
+    return regressions
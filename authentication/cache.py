@@ -0,0 +1,100 @@
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+User = get_user_model()
+
+
+class UserCache:
+    """
+    Two-level cache of User rows keyed by id.
+    Every user has a version stamp in the shared cache; the process-local LRU and the shared
+    copy are only used while their stamp matches it, so bumping the stamp invalidates the
+    user in every worker at once. Stamps are random tokens rather than counters, so an
+    evicted stamp can never come back with a value an outdated entry was stored under.
+    Local entries also expire after `timeout`, like the shared copies.
+    """
+
+    def __init__(self, maxsize=1024, timeout=300):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def version_key(user_id):
+        return f"user-version:{user_id}"
+
+    def get_version(self, user_id):
+        key = self.version_key(user_id)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            version = cache.get(key)
+        return version
+
+    def get(self, user_id):
+        """
+        Return a private copy of the user, loading it from the database on a miss
+        :raises User.DoesNotExist:
+        """
+        user_id = str(user_id)
+        version = self.get_version(user_id)
+
+        with self._lock:
+            entry = self._local.get(user_id)
+            if entry is not None and entry[0] == version and entry[2] > time.monotonic():
+                self._local.move_to_end(user_id)
+                return copy.copy(entry[1])
+
+        user_key = f"user:{user_id}:{version}"
+        user = cache.get(user_key)
+        if user is None:
+            # Read from the primary: a lagging replica could put a stale row under the new stamp
+            user = User.objects.using(DEFAULT_DB_ALIAS).get(pk=user_id)
+            cache.set(user_key, user, self.timeout)
+
+        with self._lock:
+            self._local[user_id] = (version, user, time.monotonic() + self.timeout)
+            self._local.move_to_end(user_id)
+            if len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+        return copy.copy(user)
+
+    def invalidate(self, user_id):
+        user_id = str(user_id)
+        cache.set(self.version_key(user_id), uuid.uuid4().hex, timeout=None)
+        with self._lock:
+            self._local.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+
+user_cache = UserCache(maxsize=settings.USER_CACHE_SIZE, timeout=settings.USER_CACHE_TIMEOUT)
+
+
+def invalidate_user(user_id):
+    """
+    Drop the cached user now and again when the current transaction commits, so a request
+    that read the old row before the commit cannot keep it cached.
+    Call it after queryset.update() on users, which sends no signals.
+    """
+    user_cache.invalidate(user_id)
+    transaction.on_commit(lambda: user_cache.invalidate(user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
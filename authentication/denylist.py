@@ -0,0 +1,122 @@
+import datetime
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import RevokedToken
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings.
+    `in` never gives a false negative; false positives happen at about `error_rate`
+    once `capacity` items have been added.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class TokenDenylist:
+    """
+    Revoked JWT ids, stored in the RevokedToken table and mirrored in a per-process Bloom filter.
+    A token that misses the filter is not revoked and costs no query; only filter hits are
+    confirmed against the table. Each process pulls new revocations every `sync_interval`
+    seconds, so a token revoked by another worker stays usable there for at most that long.
+    Every `rebuild_interval` seconds the filter is rebuilt from scratch and expired rows are
+    deleted, since entries cannot be removed from a Bloom filter.
+    """
+
+    def __init__(self, capacity, error_rate=0.001, sync_interval=5, rebuild_interval=3600):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self._filter = None
+        self._synced_at = 0
+        self._rebuilt_at = 0
+        self._last_revoked_at = None
+        self._lock = threading.Lock()
+
+    def revoke(self, jti, expires_at):
+        RevokedToken.objects.bulk_create(
+            [RevokedToken(jti=jti, expires_at=expires_at)], ignore_conflicts=True
+        )
+        if self._filter is not None:
+            self._filter.add(jti)
+
+    def revoke_token(self, token):
+        self.revoke(token[api_settings.JTI_CLAIM], datetime_from_epoch(token["exp"]))
+
+    def is_revoked(self, jti):
+        self.sync()
+        if jti not in self._filter:
+            return False
+        return (
+            RevokedToken.objects.using(DEFAULT_DB_ALIAS)
+            .filter(jti=jti, expires_at__gt=timezone.now())
+            .exists()
+        )
+
+    def sync(self, force=False):
+        now = time.monotonic()
+        if not force and self._filter is not None and now - self._synced_at < self.sync_interval:
+            return
+        with self._lock:
+            if not force and self._filter is not None and now - self._synced_at < self.sync_interval:
+                return
+            if self._filter is None or now - self._rebuilt_at >= self.rebuild_interval:
+                self._rebuild()
+                self._rebuilt_at = now
+            else:
+                self._pull()
+            self._synced_at = now
+
+    def _rebuild(self):
+        # Always the primary: a lagging replica would hide the newest revocations until the next rebuild
+        revoked = RevokedToken.objects.using(DEFAULT_DB_ALIAS)
+        current_time = timezone.now()
+        revoked.filter(expires_at__lte=current_time).delete()
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        for jti in revoked.values_list("jti", flat=True).iterator(chunk_size=5000):
+            bloom.add(jti)
+        self._filter = bloom
+        self._last_revoked_at = current_time
+
+    def _pull(self):
+        # Overlap the previous pull so rows committed late with an older revoked_at are not missed
+        since = self._last_revoked_at - datetime.timedelta(seconds=self.sync_interval * 2)
+        self._last_revoked_at = timezone.now()
+        revoked = RevokedToken.objects.using(DEFAULT_DB_ALIAS).filter(revoked_at__gte=since)
+        for jti in revoked.values_list("jti", flat=True):
+            self._filter.add(jti)
+
+
+denylist = TokenDenylist(
+    capacity=settings.JWT_DENYLIST_CAPACITY,
+    error_rate=settings.JWT_DENYLIST_ERROR_RATE,
+    sync_interval=settings.JWT_DENYLIST_SYNC_INTERVAL,
+    rebuild_interval=settings.JWT_DENYLIST_REBUILD_INTERVAL,
+)
@@ -0,0 +1,38 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+SUPER_ADMIN = "super-admin"
+
+_group_ids = {}
+
+
+def get_group_id(name):
+    """
+    Return the id of the named group, creating the group if needed.
+    The id is cached per process once the transaction that read or created it commits,
+    so a rolled back get_or_create never leaves a dangling id behind.
+    """
+    group_id = _group_ids.get(name)
+    if group_id is None:
+        group_id = Group.objects.get_or_create(name=name)[0].id
+        transaction.on_commit(lambda: _group_ids.__setitem__(name, group_id))
+    return group_id
+
+
+async def aget_group_id(name):
+    group_id = _group_ids.get(name)
+    if group_id is None:
+        group_id = await sync_to_async(get_group_id)(name)
+    return group_id
+
+
+def clear_group_cache():
+    _group_ids.clear()
+
+
+@receiver(post_delete, sender=Group)
+def forget_deleted_group(sender, instance, **kwargs):
+    _group_ids.pop(instance.name, None)
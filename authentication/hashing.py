@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+
+from grito_talent_pool_server.metrics import current_request, observe_password_hash
+
+
+class HashingPoolFull(Exception):
+    pass
+
+
+class HashingPool:
+    """
+    Bounded pool for password hashing and verification.
+    hashlib releases the GIL while running PBKDF2, so threads give real parallelism without
+    the cost of shipping work to other processes. At most `max_workers + max_pending` jobs
+    are accepted at once; beyond that submit() raises HashingPoolFull instead of queueing.
+    """
+
+    def __init__(self, max_workers, max_pending):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolFull("Password hashing pool is full")
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(timed, fn, current_request(), *args))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def timed(fn, request_stats, *args):
+    """Run a hashing job, recording its duration for the request that queued it"""
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        observe_password_hash(fn.__name__, time.perf_counter() - started, request_stats)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HashingPool(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE)
+    return _pool
+
+
+def check_and_upgrade_password(password, encoded):
+    """
+    Verify a password and, when the stored hash uses an outdated hasher or cost,
+    return a fresh hash for it computed in the same pool job.
+    :return: (is_correct, new_encoded_password or None)
+    """
+    is_correct, must_update = verify_password(password, encoded)
+    if is_correct and must_update:
+        return True, make_password(password)
+    return is_correct, None
+
+
+async def amake_password(password):
+    return await get_hashing_pool().run(make_password, password)
+
+
+async def acheck_password(user, password):
+    is_correct, rehashed = await get_hashing_pool().run(check_and_upgrade_password, password, user.password)
+    if rehashed:
+        user.password = rehashed
+        await user.asave(update_fields=["password"])
+    return is_correct
@@ -0,0 +1,89 @@
+import json
+import os
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from authentication.benchmark import BenchmarkError, compare, query_baseline, run_benchmark
+from grito_talent_pool_server import mail
+from grito_talent_pool_server.mail import CircuitBreaker, ZeptoMailClient
+from grito_talent_pool_server.mail_stub import ZeptoStubServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the auth views through the test client, in a throwaway test database, "
+        "and compare p95 and query counts with a JSON baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument(
+            "--baseline",
+            help="Baseline file. Defaults to benchmarks/auth-<database vendor>.json in the project directory",
+        )
+        parser.add_argument("--tolerance", type=float, default=0.2, help="Share by which p95 may exceed the baseline")
+        parser.add_argument("--save", action="store_true", help="Write the results as the new baseline")
+        parser.add_argument(
+            "--queries-only",
+            action="store_true",
+            help="With --save, keep only query counts, which hold on any machine, e.g. for the committed baseline",
+        )
+        parser.add_argument(
+            "--require-baseline", action="store_true", help="Fail when there is no baseline, e.g. in CI"
+        )
+        parser.add_argument("--output", help="Also write the results to this file")
+
+    def handle(self, *args, **options):
+        server = ZeptoStubServer().start()
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, serialized_aliases=())
+        try:
+            # Nothing these views do may reach the real provider
+            client = ZeptoMailClient("stub-key", base_url=server.url, breaker=CircuitBreaker())
+            with mock.patch.object(mail, "_client", client):
+                results = run_benchmark(iterations=options["iterations"])
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+            server.stop()
+
+        for name, result in results["scenarios"].items():
+            self.stdout.write(
+                f"{name}: p50 {result['p50Ms']:.1f} ms, p95 {result['p95Ms']:.1f} ms, max {result['maxMs']:.1f} ms, "
+                f"{result['queries']} queries, {result['allocatedKiB']:.0f} KiB allocated"
+            )
+        if options["output"]:
+            self.write(options["output"], results)
+
+        path = options["baseline"] or os.path.join(settings.BASE_DIR, "benchmarks", f"auth-{results['vendor']}.json")
+        if options["save"]:
+            self.write(path, query_baseline(results) if options["queries_only"] else results)
+            self.stdout.write(f"Baseline saved to {path}")
+            return
+        try:
+            with open(path) as file:
+                baseline = json.load(file)
+        except FileNotFoundError:
+            if options["require_baseline"]:
+                raise CommandError(f"No baseline at {path}; run with --save to record one")
+            self.stdout.write(f"No baseline at {path}; run with --save to record one")
+            return
+        try:
+            regressions = compare(results, baseline, tolerance=options["tolerance"])
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+        if regressions:
+            raise CommandError("Regressions against %s:\n%s" % (path, "\n".join(regressions)))
+        self.stdout.write(f"No regression against {path}")
+
+    @staticmethod
+    def write(path, results):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(results, file, indent=2)
+            file.write("\n")
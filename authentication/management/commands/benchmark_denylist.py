@@ -0,0 +1,65 @@
+import datetime
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from authentication.authentication import CachedJWTAuthentication
+from authentication.denylist import denylist
+from authentication.models import RevokedToken, User
+from authentication.tokens import tokens_for_user
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare JWT authentication overhead with the token denylist enabled and disabled. "
+        "Runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=5000)
+        parser.add_argument("--revoked", type=int, default=50000, help="Revoked tokens in the denylist")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        user = User.objects.create(
+            email=f"bench-{uuid.uuid4().hex}@example.com", username="bench", is_active=True
+        )
+        expires_at = timezone.now() + datetime.timedelta(days=1)
+        RevokedToken.objects.bulk_create(
+            [RevokedToken(jti=uuid.uuid4().hex, expires_at=expires_at) for _ in range(options["revoked"])],
+            batch_size=5000,
+        )
+        started = time.perf_counter()
+        denylist.sync(force=True)
+        self.stdout.write(
+            f"filter built over {options['revoked']} revoked tokens in "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+
+        factory = APIRequestFactory()
+        requests = [
+            factory.get("/", HTTP_AUTHORIZATION=f"Bearer {tokens_for_user(user, groups=[]).access_token}")
+            for _ in range(min(options["requests"], 500))
+        ]
+        authentication = CachedJWTAuthentication()
+        authentication.authenticate(requests[0])
+
+        for enabled in (False, True):
+            with override_settings(JWT_DENYLIST_ENABLED=enabled):
+                started = time.perf_counter()
+                for i in range(options["requests"]):
+                    authentication.authenticate(requests[i % len(requests)])
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"denylist {'enabled' if enabled else 'disabled'}: "
+                f"{elapsed / options['requests'] * 1e6:.1f} us per authentication"
+            )
@@ -0,0 +1,39 @@
+import time
+
+import pyotp
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from authentication.otp import TOTPCache, derive_key
+
+
+class Command(BaseCommand):
+    help = "Measure single-core generate+verify throughput of the OTP service"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20000)
+        parser.add_argument("--users", type=int, default=500, help="Distinct emails cycled through")
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        emails = [f"user{i}@example.com" for i in range(options["users"])]
+
+        def uncached(email):
+            totp = pyotp.TOTP(derive_key(email), interval=settings.OTP_TIMEOUT)
+            return totp.verify(totp.now())
+
+        cache = TOTPCache(maxsize=len(emails))
+
+        def cached(email):
+            totp = cache.get(email)
+            return totp.verify(totp.now())
+
+        for label, func in (("derive per call", uncached), ("memoized", cached)):
+            started = time.perf_counter()
+            for i in range(iterations):
+                func(emails[i % len(emails)])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{label}: {iterations / elapsed:,.0f} generate+verify/s per core "
+                f"({elapsed / iterations * 1e6:.1f} us/op)"
+            )
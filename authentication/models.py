@@ -1,11 +1,13 @@
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractUser,
     PermissionsMixin,
 )
 from .manager import CustomUserManager
 from django_countries.fields import CountryField
-# from grito_talent_pool_server.models import BaseModel
+from grito_talent_pool_server.models import BaseModel
 import uuid
 
 
@@ -22,6 +24,8 @@ class User(AbstractUser, PermissionsMixin):
     email = models.EmailField(max_length=254, unique=True, db_index=True)
     phone = models.CharField(max_length=20, null=True, blank=True, unique=True)
     image_url = models.TextField(null=True, blank=True)
+    # Variant name -> URL of a resized copy of the image, filled in the background after an upload
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     name = models.CharField(max_length=255, null=True, blank=True)
     gender = models.CharField(max_length=10, choices=GENDER, null=True, blank=True)
     user_type = models.CharField(
@@ -31,11 +35,86 @@ class User(AbstractUser, PermissionsMixin):
     country = CountryField(default="NG")
     is_verified = models.BooleanField(default=False, null=True, blank=True)
     is_active = models.BooleanField(default=False, null=True, blank=True)
+    # Embedded in issued JWTs; bumped whenever the claims they carry change, which revokes older tokens
+    token_version = models.PositiveIntegerField(default=0)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username"]
+    TOKEN_CLAIM_FIELDS = ("user_type", "is_verified")
 
     objects = CustomUserManager()
 
     def __str__(self) -> str:
         return f"{self.user_type}: {self.last_name} {self.first_name}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_token_claims = instance.get_token_claims()
+        return instance
+
+    def get_token_claims(self):
+        return {field: self.__dict__.get(field) for field in self.TOKEN_CLAIM_FIELDS}
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, "_loaded_token_claims", None)
+        update_fields = kwargs.get("update_fields")
+        if loaded is not None:
+            changed = {
+                field for field, value in self.get_token_claims().items() if loaded[field] != value
+            }
+            if update_fields is not None:
+                changed &= set(update_fields)
+            if changed:
+                self.token_version += 1
+                if update_fields is not None:
+                    kwargs["update_fields"] = {*update_fields, "token_version"}
+        super().save(*args, **kwargs)
+        self._loaded_token_claims = self.get_token_claims()
+
+
+class OutboxEmail(BaseModel):
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS = (
+        (PENDING, "Pending"),
+        (SENDING, "Sending"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+    )
+    OTP = "otp"
+    KIND = ((OTP, "OTP"),)
+
+    email = models.EmailField(max_length=254)
+    name = models.CharField(max_length=255, null=True, blank=True)
+    kind = models.CharField(max_length=20, choices=KIND, default=OTP)
+    status = models.CharField(max_length=10, choices=STATUS, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(null=True, blank=True)
+
+    class Meta(BaseModel.Meta):
+        indexes = [*BaseModel.Meta.indexes, models.Index(fields=["status", "next_attempt_at"])]
+        constraints = [
+            # At most one undelivered email per address and kind: repeated resend clicks collapse into it
+            models.UniqueConstraint(
+                fields=["email", "kind"],
+                condition=Q(status__in=["pending", "sending"]),
+                name="unique_undelivered_outbox_email",
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind} to {self.email}: {self.status}"
+
+
+class RevokedToken(models.Model):
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self) -> str:
+        return self.jti
@@ -0,0 +1,93 @@
+import base64
+import datetime
+import threading
+from collections import OrderedDict
+
+import pyotp
+from django.conf import settings
+
+from grito_talent_pool_server.utils import GenerateKey
+
+
+class CachedTOTP(pyotp.TOTP):
+    """TOTP that base32-decodes its secret once instead of on every now()/verify()."""
+
+    def __init__(self, s, **kwargs):
+        super().__init__(s, **kwargs)
+        self._byte_secret = super().byte_secret()
+
+    def byte_secret(self):
+        return self._byte_secret
+
+
+class TOTPCache:
+    """
+    Bounded LRU of the TOTP object derived for each (email, day).
+    The derived key embeds the current date, so every entry becomes useless at the day
+    rollover; the whole cache is dropped then instead of being aged out entry by entry.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._day = None
+        self._lock = threading.Lock()
+
+    def get(self, email):
+        day = datetime.date.today()
+        key = (email, day)
+        with self._lock:
+            if day != self._day:
+                self._entries.clear()
+                self._day = day
+            totp = self._entries.get(key)
+            if totp is not None:
+                self._entries.move_to_end(key)
+                return totp
+
+        totp = CachedTOTP(derive_key(email), interval=settings.OTP_TIMEOUT)
+        with self._lock:
+            if day == self._day:
+                self._entries[key] = totp
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return totp
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def derive_key(email):
+    keygen = GenerateKey()
+    return base64.b32encode(keygen.return_value(email).encode()).decode("utf-8")
+
+
+_cache = TOTPCache(maxsize=settings.OTP_CACHE_SIZE)
+
+
+def get_totp(email):
+    return _cache.get(email)
+
+
+def generate_otp(email):
+    return get_totp(email).now()
+
+
+def verify_otp(email, otp_code):
+    return get_totp(email).verify(otp_code)
+
+
+def otp_remaining_validity(now=None):
+    """
+    Seconds the code returned by generate_otp() right now stays valid.
+    A code expires at the end of its TOTP interval, or at midnight when the derived key changes.
+    :param now: Local datetime to compute it for; the current time by default
+    """
+    now = now or datetime.datetime.now()
+    remaining = settings.OTP_TIMEOUT - int(now.timestamp()) % settings.OTP_TIMEOUT
+    midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+    return min(remaining, int((midnight - now).total_seconds()))
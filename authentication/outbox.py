@@ -0,0 +1,131 @@
+import datetime
+
+from decouple import config
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from grito_talent_pool_server.mail import get_mail_client, MailError, MailRejected
+from .models import OutboxEmail
+from .otp import generate_otp, otp_remaining_validity
+
+
+def enqueue_otp_email(email, name, cooldown=0):
+    """
+    Record an OTP email to be sent by the outbox worker.
+    Call it inside the transaction that creates/updates the user so both commit together.
+    :param email: Recipient address
+    :param name: Recipient name used in the template
+    :param cooldown: Seconds during which an OTP email already sent to this address is not sent again
+    :return: void
+    """
+    if cooldown and OutboxEmail.objects.filter(
+        email=email,
+        kind=OutboxEmail.OTP,
+        status=OutboxEmail.SENT,
+        sent_at__gte=timezone.now() - datetime.timedelta(seconds=cooldown),
+    ).exists():
+        return
+
+    # An undelivered OTP email for this address already exists when the insert conflicts.
+    # ignore_conflicts avoids the savepoint a try/except around create() would need.
+    OutboxEmail.objects.bulk_create(
+        [OutboxEmail(email=email, name=name, kind=OutboxEmail.OTP)], ignore_conflicts=True
+    )
+
+
+def claim_outbox_batch(batch_size):
+    now = timezone.now()
+    stale = now - datetime.timedelta(seconds=settings.OUTBOX_SENDING_LEASE)
+    with transaction.atomic():
+        ids = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=OutboxEmail.PENDING, next_attempt_at__lte=now)
+                | Q(status=OutboxEmail.SENDING, last_modified__lt=stale)
+            )
+            .order_by("next_attempt_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        OutboxEmail.objects.filter(id__in=ids).update(
+            status=OutboxEmail.SENDING, attempts=F("attempts") + 1, last_modified=now
+        )
+    return list(OutboxEmail.objects.filter(id__in=ids))
+
+
+def send_batch(client, template_key, messages, errors):
+    """
+    Send `messages` in one batch call, recording in `errors` the MailError of each message
+    that was not sent. A batch the provider rejects is split in halves and each half sent
+    again, so one bad recipient only fails its own email. Other errors fail the whole batch.
+    """
+    expires_in_minutes = max(1, otp_remaining_validity() // 60)
+    recipients = [
+        (
+            message.email,
+            message.name,
+            {
+                "name": message.name,
+                "OTP": generate_otp(message.email),
+                "expires_in_minutes": expires_in_minutes,
+                "product_name": "Grito Talent Pool",
+            },
+        )
+        for message in messages
+    ]
+    try:
+        client.send_batch_template(template_key, recipients)
+    except MailRejected as e:
+        if len(messages) == 1:
+            errors[messages[0].id] = e
+            return
+        middle = len(messages) // 2
+        send_batch(client, template_key, messages[:middle], errors)
+        send_batch(client, template_key, messages[middle:], errors)
+    except MailError as e:
+        for message in messages:
+            errors[message.id] = e
+
+
+def drain_outbox(batch_size=100, client=None):
+    """
+    Claim up to `batch_size` due emails and send them in batch calls.
+    Emails the provider rejects fail for good; after other errors they are retried with
+    exponential backoff until OUTBOX_MAX_ATTEMPTS is reached.
+    :return: The number of emails claimed
+    """
+    messages = claim_outbox_batch(batch_size)
+    if not messages:
+        return 0
+
+    client = client or get_mail_client()
+    template_key = config("VERIFY_EMAIL_TEMPLATE")
+    errors = {}
+    # One call per provider batch, so a failing batch cannot take earlier, delivered ones with it
+    for start in range(0, len(messages), client.BATCH_LIMIT):
+        send_batch(client, template_key, messages[start:start + client.BATCH_LIMIT], errors)
+
+    now = timezone.now()
+    failed = [message for message in messages if message.id in errors]
+    for message in failed:
+        error = errors[message.id]
+        message.last_error = str(error)
+        message.last_modified = now
+        if isinstance(error, MailRejected) or message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            message.status = OutboxEmail.FAILED
+        else:
+            message.status = OutboxEmail.PENDING
+            message.next_attempt_at = now + datetime.timedelta(
+                seconds=settings.OUTBOX_RETRY_DELAY * 2 ** (message.attempts - 1)
+            )
+    if failed:
+        OutboxEmail.objects.bulk_update(
+            failed, ["status", "next_attempt_at", "last_error", "last_modified"]
+        )
+    sent = [message.id for message in messages if message.id not in errors]
+    if sent:
+        OutboxEmail.objects.filter(id__in=sent).update(
+            status=OutboxEmail.SENT, sent_at=now, last_error=None, last_modified=now
+        )
+    return len(messages)
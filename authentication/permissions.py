@@ -0,0 +1,31 @@
+from rest_framework.permissions import BasePermission
+
+from .groups import SUPER_ADMIN
+
+
+class TokenClaimPermission(BasePermission):
+    """
+    Authorize from the claims of the validated access token (see tokens_for_user) without
+    touching the database. Token revocation is checked by CachedJWTAuthentication.
+    """
+
+    def has_permission(self, request, view):
+        token = request.auth
+        return token is not None and self.has_claims(token)
+
+    def has_claims(self, token):
+        raise NotImplementedError
+
+
+class IsSuperAdmin(TokenClaimPermission):
+    message = "User is not an admin. Kindly contact us for further assistance"
+
+    def has_claims(self, token):
+        return token.get("is_verified") is True and SUPER_ADMIN in token.get("groups", [])
+
+
+class IsVerified(TokenClaimPermission):
+    message = "User is not verified. Kindly contact us for further assistance"
+
+    def has_claims(self, token):
+        return token.get("is_verified") is True
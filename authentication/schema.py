@@ -0,0 +1,7 @@
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    """Documents CachedJWTAuthentication as the bearer JWT scheme of simplejwt it extends"""
+
+    target_class = "authentication.authentication.CachedJWTAuthentication"
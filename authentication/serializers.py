@@ -1,18 +1,24 @@
-import base64
 import re
 
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
-from django.contrib.auth.models import Group
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
 from django.contrib.auth.password_validation import validate_password
 from decouple import config
-import pyotp
 from django.conf import settings
-from grito_talent_pool_server.utils import (
-    custom_normalize_email,
-    GenerateKey, send_otp_email
-)
+from grito_talent_pool_server.utils import custom_normalize_email
+from .cache import user_cache
+from .denylist import denylist
+from .groups import SUPER_ADMIN, get_group_id
+from .hashing import amake_password
 from .mixins import OTPVerificationMixin
+from .outbox import enqueue_otp_email
 from .models import User
 
 
@@ -27,27 +33,8 @@ class SuperAdminRegistrationSerializer(serializers.Serializer):
         fields = "__all__"
 
     @staticmethod
-    def generate_key(email):
-        keygen = GenerateKey()
-        key_bytes = keygen.return_value(email).encode()
-        key_base32 = base64.b32encode(key_bytes).decode('utf-8')
-        return key_base32
-
-    @staticmethod
-    def get_user_data(user):
-        serializer = UserUpdateVerifiedSerializer(user)
-        user_data = serializer.data
-        user_data["otp_code"] = None
-        return user_data
-
-    def send_otp_email(self, user):
-        key = self.generate_key(user.email)
-        OTP = pyotp.TOTP(key, interval=settings.OTP_TIMEOUT)
-        otp_code = OTP.now()
-        send_otp_email(user.email, otp_code, user.first_name)
-
-        user_data = self.get_user_data(user)
-        user_data["otp_code"] = otp_code
+    def send_otp_email(user):
+        enqueue_otp_email(user.email, user.first_name)
 
     @staticmethod
     def validate__password(value):
@@ -56,30 +43,72 @@ class SuperAdminRegistrationSerializer(serializers.Serializer):
             return 406, "Password must contain at least 8 characters, including one uppercase letter, one lowercase letter, one digit, and one special character."
         return value
 
-    def create(self, validated_data):
-        email = custom_normalize_email(validated_data["email"])
+    async def acreate(self, validated_data):
+        """
+        Async create() that hashes the password in the bounded hashing pool
+        :raises HashingPoolFull: when the pool cannot take the job
+        """
+        validated_password = self.validate__password(validated_data["password"])
+        if isinstance(validated_password, tuple):
+            return validated_password[0], validated_password[1]
+        encoded_password = await amake_password(validated_password)
+        return await sync_to_async(self.create)(validated_data, encoded_password=encoded_password)
+
+    def create(self, validated_data, encoded_password=None):
+        """
+        Create a super admin with its group membership and queued OTP email in one transaction.
+        Steady-state query budget: INSERT user, INSERT user-group row, INSERT outbox email.
+        A duplicate email is caught by the unique constraint instead of a pre-check, and
+        confirmed with a query only once the insert has failed.
+        :return: (200, user) or (406, error message)
+        """
+        validated_data["email"] = custom_normalize_email(validated_data["email"])
 
-        existing_user = User.objects.filter(email=email).exists()
-        if existing_user:
+        password = validated_data.pop("password")
+        if encoded_password is None:
+            validated_password = self.validate__password(password)
+            if isinstance(validated_password, tuple):
+                return validated_password[0], validated_password[1]
+            encoded_password = make_password(validated_password)
+
+        try:
+            with transaction.atomic():
+                user = User.objects.create(
+                    **validated_data,
+                    password=encoded_password,
+                    is_verified=False,
+                    user_type="super-admin",
+                )
+                User.groups.through.objects.create(user_id=user.pk, group_id=get_group_id(SUPER_ADMIN))
+                self.send_otp_email(user)
+        except IntegrityError:
+            # Only a duplicate email is the client's error; any other integrity error is a bug
+            if not User.objects.filter(email=validated_data["email"]).exists():
+                raise
             return 406, "User with the provided email already exists."
 
-        password = validated_data.pop("password")
-        validated_password = self.validate__password(password)
-        if isinstance(validated_password, tuple):
-            return validated_password[0], validated_password[1]
-        user = User.objects.create(**validated_data)
-        user.set_password(validated_password)
-        user.is_verified = False
-        user.user_type = "super-admin"
-        user.save()
+        return 200, user
 
-        group, _ = Group.objects.get_or_create(name="super-admin")
-        user.groups.add(group)
 
-        self.send_otp_email(user)
-        user_data = self.get_user_data(user)
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    TokenRefreshSerializer that also rejects refresh tokens revoked on logout, tokens of
+    inactive users and tokens issued before the user's token_version was bumped
+    """
 
-        return 200, user_data
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs["refresh"])
+        if settings.JWT_DENYLIST_ENABLED and denylist.is_revoked(refresh[api_settings.JTI_CLAIM]):
+            raise InvalidToken("Token has been revoked")
+        try:
+            user = user_cache.get(refresh[api_settings.USER_ID_CLAIM])
+        except (KeyError, User.DoesNotExist):
+            raise InvalidToken("Token has no active user")
+        if not user.is_active:
+            raise InvalidToken("Token has no active user")
+        if refresh.get("token_version", user.token_version) != user.token_version:
+            raise InvalidToken("Token has been revoked")
+        return super().validate(attrs)
 
 
 class LoginSerializer(serializers.Serializer):
@@ -110,8 +139,21 @@ class ResetPasswordSerializer(serializers.Serializer):
 
         if password_1 == password_2:
             user.set_password(password_1)
-            user.is_email_verified = True
-            user.save()
+            user.save(update_fields=["password"])
+
+            return self.get_name(user)
+
+    async def asave(self, user):
+        """
+        Async save() that hashes the password in the bounded hashing pool
+        :raises HashingPoolFull: when the pool cannot take the job
+        """
+        password_1 = self.validated_data["password"]
+        password_2 = self.validated_data["confirm_password"]
+
+        if password_1 == password_2:
+            user.password = await amake_password(password_1)
+            await user.asave(update_fields=["password"])
 
             return self.get_name(user)
 
@@ -187,15 +229,6 @@ class ResendOTPSerializer(serializers.Serializer):
         user = User.objects.get(email=email)
         self.send_otp_email(email, user.first_name)
 
-    def send_otp_email(self, email, name):
-        key = self.generate_key(email)
-        OTP = pyotp.TOTP(key, interval=settings.OTP_TIMEOUT)
-        otp_code = OTP.now()
-        # send_otp_email(email, otp_code, name)
-
     @staticmethod
-    def generate_key(email):
-        keygen = GenerateKey()
-        key_bytes = keygen.return_value(email).encode()
-        key_base32 = base64.b32encode(key_bytes).decode('utf-8')
-        return key_base32
+    def send_otp_email(email, name):
+        enqueue_otp_email(email, name, cooldown=settings.OTP_RESEND_COOLDOWN)
@@ -1,3 +1,598 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from grito_talent_pool_server.mail import CircuitBreaker, ZeptoMailClient
+from grito_talent_pool_server.mail_stub import ZeptoStubServer
+from grito_talent_pool_server.schema import generate_schema
+
+from .authentication import CachedJWTAuthentication
+from .benchmark import BenchmarkError, compare, query_baseline, run_benchmark
+from .cache import UserCache, user_cache
+from .denylist import BloomFilter, denylist
+from . import otp
+from .otp import generate_otp
+from .permissions import IsSuperAdmin, IsVerified
+from .tokens import tokens_for_user
+
+from .groups import SUPER_ADMIN, clear_group_cache, get_group_id
+from .hashing import HashingPool, HashingPoolFull
+from .models import OutboxEmail, User
+from .outbox import drain_outbox, enqueue_otp_email
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class AdminLoginQueryBudgetTests(TestCase):
+    password = "Passw0rd!x"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            email="admin@grito.africa",
+            username="admin",
+            name="Ada",
+            password=make_password(cls.password),
+            is_active=True,
+            is_verified=True,
+            user_type="super-admin",
+        )
+        cls.admin.groups.add(Group.objects.create(name=SUPER_ADMIN))
+        cls.client_user = User.objects.create(
+            email="client@grito.africa",
+            username="client",
+            password=make_password(cls.password),
+            is_active=True,
+            is_verified=True,
+            user_type="client",
+        )
+
+    def setUp(self):
+        clear_group_cache()
+        with self.captureOnCommitCallbacks(execute=True):
+            get_group_id(SUPER_ADMIN)
+        self.addCleanup(clear_group_cache)
+
+    def login(self, email, password):
+        return self.client.post(reverse("login-admin"), {"email": email, "password": password})
+
+    def test_admin_login_uses_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.login(self.admin.email, self.password)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["name"], "Ada (Admin)")
+
+    def test_non_admin_login_uses_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.login(self.client_user.email, self.password)
+        self.assertEqual(response.status_code, 401)
+
+    def test_unknown_email_uses_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.login("nobody@grito.africa", self.password)
+        self.assertEqual(response.status_code, 401)
+
+    def test_wrong_password_uses_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.login(self.admin.email, "wrong")
+        self.assertEqual(response.status_code, 401)
+
+    def test_failed_logins_send_user_login_failed(self):
+        received = []
+
+        def receiver(sender, credentials, request, **kwargs):
+            received.append(credentials)
+
+        user_login_failed.connect(receiver)
+        self.addCleanup(user_login_failed.disconnect, receiver)
+        self.login(self.admin.email, "wrong")
+        self.login("nobody@grito.africa", self.password)
+        self.login(self.admin.email, self.password)
+        self.assertEqual([credentials["email"] for credentials in received], [self.admin.email, "nobody@grito.africa"])
+        self.assertNotIn("wrong", [credentials["password"] for credentials in received])
+
+    @override_settings(
+        PASSWORD_HASHERS=[
+            "django.contrib.auth.hashers.MD5PasswordHasher",
+            "django.contrib.auth.hashers.UnsaltedMD5PasswordHasher",
+        ]
+    )
+    def test_outdated_hash_is_upgraded_on_login(self):
+        User.objects.filter(pk=self.admin.pk).update(password=make_password(self.password, hasher="unsalted_md5"))
+        # The user, then the new hash
+        with self.assertNumQueries(2):
+            response = self.login(self.admin.email, self.password)
+        self.assertEqual(response.status_code, 200)
+        self.admin.refresh_from_db()
+        self.assertTrue(self.admin.password.startswith("md5$"))
+        self.assertTrue(self.admin.check_password(self.password))
+
+    def test_full_hashing_pool_returns_503(self):
+        pool = HashingPool(max_workers=1, max_pending=0)
+        release = threading.Event()
+        self.addCleanup(pool.shutdown)
+        self.addCleanup(release.set)
+        pool.submit(release.wait)
+        with mock.patch("authentication.hashing._pool", pool):
+            response = self.login(self.admin.email, self.password)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+
+class HashingPoolTests(SimpleTestCase):
+    def test_concurrency_and_queue_are_bounded(self):
+        pool = HashingPool(max_workers=2, max_pending=1)
+        self.addCleanup(pool.shutdown)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def job():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            release.wait()
+            with lock:
+                running.pop()
+
+        futures = [pool.submit(job) for _ in range(3)]
+        with self.assertRaises(HashingPoolFull):
+            pool.submit(job)
+        release.set()
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(max(peak), 2)
+        # Finished jobs give their slots back
+        pool.submit(job).result(timeout=5)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class AdminRegistrationQueryBudgetTests(TestCase):
+    payload = {
+        "name": "Ada",
+        "username": "ada",
+        "email": " Ada@Grito.Africa ",
+        "password": "Passw0rd!x",
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        Group.objects.create(name=SUPER_ADMIN)
+
+    def setUp(self):
+        clear_group_cache()
+        with self.captureOnCommitCallbacks(execute=True):
+            get_group_id(SUPER_ADMIN)
+        self.addCleanup(clear_group_cache)
+
+    def register(self):
+        return self.client.post(reverse("create-admin-user"), self.payload)
+
+    def test_registration_query_budget(self):
+        # SAVEPOINT, INSERT user, INSERT user-group row, INSERT outbox email, RELEASE SAVEPOINT
+        with self.assertNumQueries(5):
+            response = self.register()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(AccessToken(response.json()["access"])["groups"], [])
+
+        user = User.objects.get(email="ada@grito.africa")
+        self.assertEqual(user.user_type, "super-admin")
+        self.assertFalse(user.is_active)
+        self.assertFalse(user.is_verified)
+        self.assertTrue(user.groups.filter(name=SUPER_ADMIN).exists())
+        self.assertTrue(user.check_password(self.payload["password"]))
+
+    def test_duplicate_email_is_rejected_by_the_unique_constraint(self):
+        self.register()
+        # SAVEPOINT, failing INSERT user, ROLLBACK TO SAVEPOINT, RELEASE SAVEPOINT, SELECT email
+        with self.assertNumQueries(5):
+            response = self.register()
+        self.assertEqual(response.status_code, 406)
+        self.assertEqual(User.objects.filter(email="ada@grito.africa").count(), 1)
+
+    def test_other_integrity_errors_are_not_reported_as_duplicates(self):
+        with mock.patch.object(User.groups.through.objects, "create", side_effect=IntegrityError("foreign key")):
+            with self.assertRaises(IntegrityError):
+                self.register()
+        self.assertFalse(User.objects.filter(email="ada@grito.africa").exists())
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="ada@grito.africa", username="ada", is_active=True)
+
+    def setUp(self):
+        # Cached rows outlive the rollback at the end of each test
+        self.addCleanup(cache.clear)
+        self.addCleanup(user_cache.clear)
+
+    def authenticate(self):
+        token = RefreshToken.for_user(self.user).access_token
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        return CachedJWTAuthentication().authenticate(request)[0]
+
+    def test_steady_state_request_runs_no_user_query(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_cached_user_is_a_private_copy(self):
+        self.authenticate().name = "Changed"
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.authenticate().name)
+
+    def test_save_invalidates_cached_user(self):
+        self.authenticate()
+        self.user.name = "Ada"
+        self.user.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate().name, "Ada")
+
+    def test_local_entry_expires_after_timeout(self):
+        users = UserCache(timeout=60)
+        users.get(self.user.pk)
+        # As if the shared copy had expired, which leaves only the local entry
+        cache.delete(f"user:{self.user.pk}:{users.get_version(self.user.pk)}")
+        with self.assertNumQueries(0):
+            users.get(self.user.pk)
+        now = time.monotonic()
+        with mock.patch("authentication.cache.time.monotonic", return_value=now + 61):
+            with self.assertNumQueries(1):
+                users.get(self.user.pk)
+
+    def test_deactivated_user_is_rejected(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+
+class TokenClaimPermissionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            email="admin@grito.africa",
+            username="admin",
+            is_active=True,
+            is_verified=True,
+            user_type="super-admin",
+        )
+        cls.admin.groups.add(Group.objects.create(name=SUPER_ADMIN))
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.addCleanup(user_cache.clear)
+
+    def request_with(self, token):
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        user, validated_token = CachedJWTAuthentication().authenticate(request)
+        request.user, request.auth = user, validated_token
+        return request
+
+    def test_permissions_read_claims_without_queries(self):
+        token = tokens_for_user(self.admin).access_token
+        request = self.request_with(token)
+        with self.assertNumQueries(0):
+            self.assertTrue(IsSuperAdmin().has_permission(request, None))
+            self.assertTrue(IsVerified().has_permission(request, None))
+
+    def test_non_admin_token_is_denied(self):
+        token = tokens_for_user(self.admin, groups=[]).access_token
+        self.assertFalse(IsSuperAdmin().has_permission(self.request_with(token), None))
+
+    def test_unverified_admin_token_is_denied(self):
+        User.objects.filter(pk=self.admin.pk).update(is_verified=False)
+        self.admin.refresh_from_db()
+        token = tokens_for_user(self.admin).access_token
+        self.assertFalse(IsSuperAdmin().has_permission(self.request_with(token), None))
+
+    def test_role_change_revokes_issued_tokens(self):
+        token = tokens_for_user(self.admin).access_token
+        self.admin.user_type = "client"
+        self.admin.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.request_with(token)
+        self.request_with(tokens_for_user(self.admin).access_token)
+
+    def test_group_change_revokes_issued_tokens(self):
+        token = tokens_for_user(self.admin).access_token
+        self.admin.groups.clear()
+        with self.assertRaises(AuthenticationFailed):
+            self.request_with(token)
+
+    def test_group_changes_through_stale_instances_each_bump_the_version(self):
+        stale = User.objects.get(pk=self.admin.pk)
+        version = stale.token_version
+        group = Group.objects.create(name="reviewers")
+        self.admin.groups.add(group)
+        stale.groups.remove(group)
+        self.assertEqual(stale.token_version, version + 2)
+        self.assertEqual(User.objects.get(pk=self.admin.pk).token_version, version + 2)
+
+
+class LogoutRevocationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="ada@grito.africa", username="ada", is_active=True)
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.addCleanup(user_cache.clear)
+
+    def authenticate(self, token):
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        return CachedJWTAuthentication().authenticate(request)
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        refresh = tokens_for_user(self.user, groups=[])
+        access = refresh.access_token
+        response = self.client.post(
+            reverse("logout"), {"refresh": str(refresh)}, HTTP_AUTHORIZATION=f"Bearer {access}"
+        )
+        self.assertEqual(response.status_code, 200)
+        with self.assertRaises(InvalidToken):
+            self.authenticate(access)
+        self.assertTrue(denylist.is_revoked(refresh["jti"]))
+
+    def test_logout_with_an_invalid_refresh_token_still_revokes_the_access_token(self):
+        access = tokens_for_user(self.user, groups=[]).access_token
+        response = self.client.post(reverse("logout"), {"refresh": "garbage"}, HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.assertEqual(response.status_code, 400)
+        with self.assertRaises(InvalidToken):
+            self.authenticate(access)
+
+    def test_refresh_is_refused_once_the_refresh_token_is_revoked(self):
+        refresh = tokens_for_user(self.user, groups=[])
+        response = self.client.post(reverse("token-refresh"), {"refresh": str(refresh)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.authenticate(response.json()["access"])[0], self.user)
+
+        self.client.post(
+            reverse("logout"), {"refresh": str(refresh)}, HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}"
+        )
+        response = self.client.post(reverse("token-refresh"), {"refresh": str(refresh)})
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_is_refused_after_a_token_version_bump(self):
+        refresh = tokens_for_user(self.user, groups=[])
+        User.objects.filter(pk=self.user.pk).update(token_version=F("token_version") + 1)
+        user_cache.clear()
+        response = self.client.post(reverse("token-refresh"), {"refresh": str(refresh)})
+        self.assertEqual(response.status_code, 401)
+
+    def test_other_tokens_stay_valid(self):
+        self.client.post(
+            reverse("logout"), HTTP_AUTHORIZATION=f"Bearer {tokens_for_user(self.user, groups=[]).access_token}"
+        )
+        self.authenticate(tokens_for_user(self.user, groups=[]).access_token)
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000)
+        items = [f"jti-{i}" for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 100)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class AuthFlowQueryBudgetTests(TestCase):
+    password = "Passw0rd!x"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email="ada@grito.africa",
+            username="ada",
+            first_name="Ada",
+            password=make_password(cls.password),
+            is_active=True,
+            user_type="super-admin",
+        )
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.addCleanup(user_cache.clear)
+
+    def post(self, url_name, data, **extra):
+        return self.client.post(reverse(url_name), data, content_type="application/json", **extra)
+
+    def test_otp_verification_verifies_the_user(self):
+        # User lookup and update, then login(): session insert and save, last_login update, groups for the token
+        with self.assertNumQueries(11):
+            response = self.post("confirm-otp", {"email": self.user.email, "otp_code": generate_otp(self.user.email)})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["email_verification"])
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_verified)
+
+        response = self.post("confirm-otp", {"email": self.user.email, "otp_code": "000000"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_resend_otp(self):
+        # 2 user lookups, cooldown check, INSERT outbox email
+        with self.assertNumQueries(4):
+            response = self.post("resend-otp", {"email": self.user.email})
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(response.json()["expires_in"], settings.OTP_TIMEOUT)
+        self.assertEqual(self.post("resend-otp", {"email": "nobody@grito.africa"}).status_code, 400)
+
+    def test_reset_password_request(self):
+        # User lookup, cooldown check, INSERT outbox email
+        with self.assertNumQueries(3):
+            response = self.post("reset-password-link", {"email": self.user.email})
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(response.json()["expires_in"], settings.OTP_TIMEOUT)
+        self.assertTrue(OutboxEmail.objects.filter(email=self.user.email, kind=OutboxEmail.OTP).exists())
+        self.assertEqual(self.post("reset-password-link", {"email": "nobody@grito.africa"}).status_code, 404)
+
+    def test_reset_password(self):
+        access = tokens_for_user(self.user, groups=[]).access_token
+        denylist.sync(force=True)
+        new_password = "N3w-Passw0rd!"
+        with self.assertNumQueries(2):
+            response = self.post(
+                "reset-password",
+                {"password": new_password, "confirm_password": new_password},
+                HTTP_AUTHORIZATION=f"Bearer {access}",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["name"], "Ada (Admin)")
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password(new_password))
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class AuthBenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Group.objects.create(name=SUPER_ADMIN)
+
+    def setUp(self):
+        clear_group_cache()
+        with self.captureOnCommitCallbacks(execute=True):
+            get_group_id(SUPER_ADMIN)
+        self.addCleanup(clear_group_cache)
+        self.addCleanup(cache.clear)
+        self.addCleanup(user_cache.clear)
+
+    def test_every_scenario_is_measured(self):
+        results = run_benchmark(iterations=2)
+        self.assertEqual(
+            set(results["scenarios"]),
+            {"sign-up", "login", "confirm-otp", "resend-otp", "reset-password-request", "reset-password"},
+        )
+        self.assertEqual(results["scenarios"]["login"]["queries"], 1)
+        self.assertEqual(compare(results, results), [])
+        # The committed baseline, which benchmark_auth --require-baseline checks in CI
+        with open(os.path.join(settings.BASE_DIR, "benchmarks", "auth-sqlite.json")) as file:
+            self.assertEqual(compare(results, json.load(file)), [])
+
+    def test_compare_flags_p95_and_query_regressions(self):
+        baseline = {
+            "vendor": "sqlite",
+            "passwordHashIterations": 1000,
+            "scenarios": {"login": {"p95Ms": 10.0, "queries": 1}, "sign-up": {"p95Ms": 0.2, "queries": 5}},
+        }
+        results = {
+            **baseline,
+            "scenarios": {"login": {"p95Ms": 12.5, "queries": 2}, "sign-up": {"p95Ms": 1.1, "queries": 5}},
+        }
+        self.assertEqual(compare(results, baseline), ["login: p95 12.5 ms, baseline 10.0 ms", "login: 2 queries, baseline 1"])
+        self.assertEqual(compare(results, baseline, tolerance=0.3), ["login: 2 queries, baseline 1"])
+        with self.assertRaises(BenchmarkError):
+            compare({**results, "passwordHashIterations": 720000}, baseline)
+
+        # Only query counts are compared with a query baseline, on any hashing cost
+        regressions = compare({**results, "passwordHashIterations": 720000}, query_baseline({**baseline, "iterations": 2}))
+        self.assertEqual(regressions, ["login: 2 queries, baseline 1"])
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.stub = ZeptoStubServer(rejected={"bounced@example.com"}).start()
+        self.addCleanup(self.stub.stop)
+        self.mail_client = ZeptoMailClient("stub-key", base_url=self.stub.url, max_retries=0, breaker=CircuitBreaker())
+        self.addCleanup(self.mail_client.close)
+
+    def enqueue(self, *emails):
+        for email in emails:
+            enqueue_otp_email(email, "Ada")
+
+    def statuses(self):
+        return dict(OutboxEmail.objects.values_list("email", "status"))
+
+    def test_rejected_recipient_fails_alone(self):
+        self.enqueue("a@example.com", "bounced@example.com", "b@example.com", "c@example.com")
+        self.assertEqual(drain_outbox(client=self.mail_client), 4)
+        self.assertEqual(
+            self.statuses(),
+            {
+                "a@example.com": OutboxEmail.SENT,
+                "bounced@example.com": OutboxEmail.FAILED,
+                "b@example.com": OutboxEmail.SENT,
+                "c@example.com": OutboxEmail.SENT,
+            },
+        )
+        self.assertEqual(self.stub.emails_accepted, 3)
+        self.assertIn("422", OutboxEmail.objects.get(email="bounced@example.com").last_error)
+
+    def test_transient_error_reschedules_the_batch(self):
+        self.stub.failure_rate = 1.0
+        self.enqueue("a@example.com", "b@example.com")
+        drain_outbox(client=self.mail_client)
+        for message in OutboxEmail.objects.all():
+            self.assertEqual(message.status, OutboxEmail.PENDING)
+            self.assertEqual(message.attempts, 1)
+            self.assertGreater(message.next_attempt_at, message.last_modified)
+
+    def test_each_provider_batch_is_sent_on_its_own(self):
+        self.mail_client.BATCH_LIMIT = 2
+        self.enqueue("a@example.com", "b@example.com", "c@example.com")
+        drain_outbox(client=self.mail_client)
+        self.assertEqual(self.stub.requests_served, 2)
+        self.assertEqual(set(self.statuses().values()), {OutboxEmail.SENT})
+
+
+class SchemaTests(SimpleTestCase):
+    def test_cached_jwt_authentication_is_documented_as_a_bearer_scheme(self):
+        document = generate_schema()
+        self.assertEqual(
+            document["components"]["securitySchemes"]["jwtAuth"],
+            {"type": "http", "scheme": "bearer", "bearerFormat": "JWT"},
+        )
+        self.assertIn({"jwtAuth": []}, document["paths"]["/auth/v1/logout/"]["post"]["security"])
+
+
+class OTPTests(SimpleTestCase):
+    def test_remaining_validity_is_cut_at_midnight(self):
+        # The derived key changes with the date, so a code cannot outlive the day
+        self.assertEqual(otp.otp_remaining_validity(datetime.datetime(2026, 10, 17, 23, 59, 50)), 10)
+        noon = datetime.datetime(2026, 10, 17, 12, 0, 5)
+        self.assertEqual(otp.otp_remaining_validity(noon), settings.OTP_TIMEOUT - int(noon.timestamp()) % settings.OTP_TIMEOUT)
+
+    def test_cache_evicts_the_least_recently_used_email(self):
+        totps = otp.TOTPCache(maxsize=2)
+        a, b = totps.get("a@grito.africa"), totps.get("b@grito.africa")
+        self.assertIs(totps.get("a@grito.africa"), a)
+        totps.get("c@grito.africa")
+        self.assertEqual(len(totps), 2)
+        self.assertIs(totps.get("a@grito.africa"), a)
+        self.assertIsNot(totps.get("b@grito.africa"), b)
+
+    def test_cache_is_cleared_when_the_day_rolls_over(self):
+        totps = otp.TOTPCache(maxsize=10)
+        with mock.patch.object(otp.datetime, "date", wraps=datetime.date) as date:
+            date.today.return_value = datetime.date(2026, 10, 17)
+            first = totps.get("a@grito.africa")
+            totps.get("b@grito.africa")
+            date.today.return_value = datetime.date(2026, 10, 18)
+            self.assertIsNot(totps.get("a@grito.africa"), first)
+            self.assertEqual(len(totps), 1)
+
+    def test_code_generated_before_eviction_still_verifies(self):
+        with mock.patch.object(otp, "_cache", otp.TOTPCache(maxsize=1)):
+            code = otp.generate_otp("a@grito.africa")
+            otp.generate_otp("b@grito.africa")
+            self.assertTrue(otp.verify_otp("a@grito.africa", code))
@@ -0,0 +1,48 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .cache import invalidate_user
+from .models import User
+
+
+def tokens_for_user(user, groups=None):
+    """
+    RefreshToken.for_user() with the claims the permission classes authorize from.
+    The claims are copied into the access token derived from the refresh token.
+    :param user: The user the tokens are issued for
+    :param groups: The user's group names, when the caller already knows them. Queried otherwise
+    :return: RefreshToken
+    """
+    if groups is None:
+        groups = list(user.groups.values_list("name", flat=True))
+
+    refresh = RefreshToken.for_user(user)
+    refresh["user_type"] = user.user_type
+    refresh["is_verified"] = bool(user.is_verified)
+    refresh["groups"] = sorted(groups)
+    refresh["token_version"] = user.token_version
+    return refresh
+
+
+def revoke_user_tokens(user_ids):
+    User.objects.filter(pk__in=user_ids).update(token_version=F("token_version") + 1)
+    for user_id in user_ids:
+        invalidate_user(user_id)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def revoke_tokens_on_group_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        # Incremented in the database, so concurrent changes each count, then read back so a
+        # later save() of the in-memory user does not write the old version back
+        User.objects.filter(pk=instance.pk).update(token_version=F("token_version") + 1)
+        instance.refresh_from_db(fields=["token_version"])
+        invalidate_user(instance.pk)
+    elif action == "pre_clear":
+        revoke_user_tokens(list(instance.user_set.values_list("pk", flat=True)))
+    elif pk_set:
+        revoke_user_tokens(list(pk_set))
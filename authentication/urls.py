@@ -14,9 +14,11 @@ urlpatterns += [
     ),
     path("login/admin/", view.AdminLoginView.as_view(), name="login-admin"),
     path("logout/", view.LogoutView.as_view(), name="logout"),
+    path("token/refresh/", view.RefreshTokenView.as_view(), name="token-refresh"),
     path("reset-password/", view.ResetPasswordView.as_view(), name="reset-password"),
     path("confirm/otp/", view.OTPVerificationView.as_view(), name="confirm-otp"),
     path("resend/otp/", view.ResendOTPView.as_view(), name="resend-otp"),
+    path("me/image/", view.UserImageView.as_view(), name="user-image"),
 
     path(
         "reset-password-request/",
@@ -0,0 +1,22 @@
+from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+PROCESS_LOCAL_CACHE = "django.core.cache.backends.locmem.LocMemCache"
+
+
+class GritoTalentPoolServerConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'grito_talent_pool_server'
+
+    def ready(self):
+        from . import metrics  # noqa: F401
+        from .db import inspection  # noqa: F401
+
+        # Cached users and talent listings are invalidated through version stamps in the
+        # default cache, which a worker cannot see in another's process-local cache
+        if settings.WEB_CONCURRENCY > 1 and settings.CACHES["default"]["BACKEND"] == PROCESS_LOCAL_CACHE:
+            raise ImproperlyConfigured(
+                "WEB_CONCURRENCY > 1 needs a shared CACHE_BACKEND, e.g. "
+                "django.core.cache.backends.redis.RedisCache"
+            )
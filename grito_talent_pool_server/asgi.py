@@ -14,3 +14,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'grito_talent_pool_server.settings')
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.TALENT_MATCHER_PRELOAD:
+    from talents.matching import matcher
+
+    matcher.preload()
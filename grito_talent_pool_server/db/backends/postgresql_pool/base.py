@@ -0,0 +1,42 @@
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.creation import DatabaseCreation as BaseDatabaseCreation
+
+from grito_talent_pool_server.db.pool import close_pools, get_pool
+
+
+class DatabaseCreation(BaseDatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections would keep the test database in use
+        close_pools(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend that checks connections out of a per-process pool instead of opening
+    one per request. Closing the Django connection (at the end of every request when
+    CONN_MAX_AGE is 0) hands the connection back to the pool.
+    Pool options are read from the "POOL" key of the database settings.
+    """
+
+    creation_class = DatabaseCreation
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        key = (
+            self.alias,
+            conn_params.get("dbname"),
+            conn_params.get("host"),
+            conn_params.get("port"),
+            conn_params.get("user"),
+        )
+        self.pool = get_pool(key, self.settings_dict.get("POOL", {}))
+        return self.pool.getconn(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                if self.errors_occurred and not self.is_usable():
+                    self.pool.discard(self.connection)
+                else:
+                    self.pool.putconn(self.connection)
@@ -0,0 +1,203 @@
+import contextvars
+import logging
+import re
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.decorators import sync_and_async_middleware
+
+from grito_talent_pool_server import metrics
+
+logger = logging.getLogger(__name__)
+
+# Placeholder lists of IN (...) and VALUES (...), whose length varies with the arguments
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+_EXPLAINABLE = ("SELECT", "WITH")
+
+slow_queries = metrics.registry.register(
+    metrics.Counter("db_slow_queries_total", "SQL queries slower than SLOW_QUERY_THRESHOLD, by URL name", ("view",))
+)
+repeated_queries = metrics.registry.register(
+    metrics.Counter(
+        "db_repeated_queries_total",
+        "Statements run more than N_PLUS_ONE_THRESHOLD times in one request, by URL name",
+        ("view",),
+    )
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def normalize_sql(sql):
+    """The shape of a statement: literals replaced and placeholder lists collapsed"""
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _PLACEHOLDER_LIST.sub("(%s, ...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def redact_params(params):
+    """Query parameters reduced to their types, so values such as emails stay out of logs"""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {name: type(value).__name__ for name, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+class RequestQueries:
+    __slots__ = ("request", "statements")
+
+    def __init__(self, request):
+        self.request = request
+        # SQL as sent -> times run. Django sends parameters separately, so repeats of a
+        # statement mostly share the same string, and only distinct ones are normalized.
+        self.statements = Counter()
+
+    def total(self):
+        return sum(self.statements.values())
+
+    def repeated(self, threshold):
+        """:return: [(normalized sql, times run)] of statements run more than `threshold` times"""
+        shapes = Counter()
+        for sql, count in self.statements.items():
+            shapes[normalize_sql(sql)] += count
+        return [(sql, count) for sql, count in shapes.most_common() if count > threshold]
+
+
+_current = contextvars.ContextVar("request_queries", default=None)
+# Set while the wrapper runs its own EXPLAIN, so that statement is not inspected in turn
+_explaining = contextvars.ContextVar("explaining", default=False)
+
+
+def explain(connection, sql, params):
+    """Plan of a read statement, without running it, or None when it cannot be explained"""
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+    token = _explaining.set(True)
+    try:
+        # A savepoint keeps a failed EXPLAIN from breaking the surrounding transaction
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+    except DatabaseError:
+        logger.debug("Could not explain %s", sql, exc_info=True)
+        return None
+    finally:
+        _explaining.reset(token)
+
+
+def inspection_wrapper(execute, sql, params, many, context):
+    if _explaining.get():
+        return execute(sql, params, many, context)
+    queries = _current.get()
+    if queries is not None:
+        queries.statements[sql] += 1
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - started
+    threshold = settings.SLOW_QUERY_THRESHOLD
+    if threshold and duration > threshold:
+        view = metrics.url_name(queries.request) if queries is not None else None
+        slow_queries.inc((view or "",))
+        plan = None if many else explain(context["connection"], sql, params)
+        if not settings.SLOW_QUERY_LOG_PARAMS:
+            params = redact_params(params)
+            if plan is not None:
+                plan = _STRING_LITERAL.sub("'?'", plan)
+        logger.warning(
+            "Slow query (%.3fs%s): %s\nParameters: %r\nPlan:\n%s",
+            duration,
+            f" in {view}" if view else "",
+            sql,
+            params,
+            plan,
+        )
+    return result
+
+
+@receiver(connection_created)
+def install_inspection_wrapper(sender, connection, **kwargs):
+    if settings.QUERY_INSPECTION_ENABLED and inspection_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(inspection_wrapper)
+
+
+def query_budget(request):
+    """
+    Most queries the view that served `request` declares it needs: its `query_budget`
+    attribute, an int or a {method: int} dict, set on the view class or function
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return None
+    view = getattr(match.func, "view_class", None) or getattr(match.func, "cls", None) or match.func
+    budget = getattr(view, "query_budget", None)
+    if isinstance(budget, dict):
+        budget = budget.get(request.method)
+    return budget
+
+
+def check_request(queries):
+    request = queries.request
+    view = metrics.url_name(request)
+    for sql, count in queries.repeated(settings.N_PLUS_ONE_THRESHOLD):
+        repeated_queries.inc((view,))
+        logger.warning("Possible N+1 in %s %s (%s): ran %d times: %s", request.method, request.path, view, count, sql)
+
+    budget = query_budget(request)
+    total = queries.total()
+    if budget is None or total <= budget:
+        return
+    message = f"{request.method} {request.path} ({view}) ran {total} queries, over its budget of {budget}"
+    if settings.QUERY_BUDGET_RAISE:
+        statements = "\n".join(f"{count} x {sql}" for sql, count in queries.statements.most_common())
+        raise QueryBudgetExceeded(f"{message}:\n{statements}")
+    logger.warning(message)
+
+
+@sync_and_async_middleware
+def QueryInspectionMiddleware(get_response):
+    """
+    Count the statements each request runs, to report those repeated more than
+    N_PLUS_ONE_THRESHOLD times and requests over their view's query_budget. Over budget
+    raises QueryBudgetExceeded when QUERY_BUDGET_RAISE is on, as it is under tests.
+    """
+    if not settings.QUERY_INSPECTION_ENABLED:
+        raise MiddlewareNotUsed()
+
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            queries = RequestQueries(request)
+            token = _current.set(queries)
+            try:
+                response = await get_response(request)
+            finally:
+                _current.reset(token)
+            check_request(queries)
+            return response
+
+    else:
+
+        def middleware(request):
+            queries = RequestQueries(request)
+            token = _current.set(queries)
+            try:
+                response = get_response(request)
+            finally:
+                _current.reset(token)
+            check_request(queries)
+            return response
+
+    return middleware
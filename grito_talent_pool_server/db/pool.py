@@ -0,0 +1,188 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Per-process pool of DB-API connections.
+    Idle connections are kept LIFO so the warmest one is reused first and the coldest ages
+    out; those idle longer than `max_idle` are closed down to `min_size`. A connection idle
+    for more than `check_after` seconds is pinged before being handed out, and a checkout
+    waits at most `timeout` seconds for a free slot once `max_size` connections are in use.
+    """
+
+    def __init__(self, min_size=0, max_size=10, timeout=5.0, max_idle=300.0, check_after=30.0):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self.pid = os.getpid()
+        self._idle = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+        self.stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "created": 0,
+            "closed": 0,
+            "evicted": 0,
+            "failed_checks": 0,
+        }
+
+    def getconn(self, connect):
+        """
+        :param connect: Callable opening a new connection when the pool needs one
+        :raises PoolTimeout: when no connection frees up within `timeout` seconds
+        """
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        with self._cond:
+            self.stats["checkouts"] += 1
+
+        while True:
+            candidate = None
+            with self._cond:
+                self._evict_idle()
+                if self._idle:
+                    candidate = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["timeouts"] += 1
+                        raise PoolTimeout(f"No connection available within {self.timeout}s")
+                    if not waited:
+                        self.stats["waits"] += 1
+                        waited = True
+                    self._cond.wait(remaining)
+                    continue
+
+            if candidate is None:
+                break
+            # The health check may hit the network, so it runs outside the lock
+            conn, idle_since = candidate
+            if self._is_usable(conn, idle_since):
+                return conn
+            with self._cond:
+                self.stats["failed_checks"] += 1
+                self._discard(conn)
+
+        try:
+            conn = connect()
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.stats["created"] += 1
+        return conn
+
+    def putconn(self, conn):
+        reusable = not conn.closed
+        if reusable:
+            try:
+                if conn.info.transaction_status != 0:
+                    conn.rollback()
+            except Exception:
+                reusable = False
+        with self._cond:
+            if reusable:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._discard(conn)
+            self._cond.notify()
+
+    def discard(self, conn):
+        with self._cond:
+            self._discard(conn)
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.popleft()[0])
+
+    def _is_usable(self, conn, idle_since):
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.check_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            if not conn.autocommit:
+                conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.max_idle:
+            self._discard(self._idle.popleft()[0])
+            self.stats["evicted"] += 1
+
+    def _discard(self, conn):
+        self._size -= 1
+        self.stats["closed"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                **self.stats,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, options):
+    """
+    Return the pool for a connection key, creating it on first use in this process.
+    A pool inherited through fork is dropped without closing its sockets, which the
+    parent process still uses.
+    :param key: Tuple starting with the database alias, followed by whatever identifies the
+        server and database, so a changed NAME (e.g. the test database) never reuses a
+        connection to the old one
+    :param options: Keyword arguments for ConnectionPool
+    """
+    pool = _pools.get(key)
+    if pool is None or pool.pid != os.getpid():
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None or pool.pid != os.getpid():
+                pool = ConnectionPool(**options)
+                _pools[key] = pool
+    return pool
+
+
+def close_pools(alias):
+    for key, pool in list(_pools.items()):
+        if key[0] == alias and pool.pid == os.getpid():
+            pool.close_all()
+
+
+def pool_stats():
+    return {
+        ":".join(str(part) for part in key[:2]): pool.snapshot()
+        for key, pool in _pools.items()
+        if pool.pid == os.getpid()
+    }
@@ -0,0 +1,112 @@
+import contextvars
+import random
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.decorators import sync_and_async_middleware
+
+PIN_COOKIE = "db_primary_pin"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class RoutingState:
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.pinned = False
+
+
+_state = contextvars.ContextVar("db_routing_state", default=None)
+
+
+def read_alias():
+    """
+    The alias reads should go to right now: a replica while the current context allows it,
+    the primary once anything was written in it, inside transactions, or when no replica
+    is configured.
+    """
+    state = _state.get()
+    if (
+        not settings.DATABASE_REPLICAS
+        or state is None
+        or not state.use_replica
+        or state.pinned
+        or connections[DEFAULT_DB_ALIAS].in_atomic_block
+    ):
+        return DEFAULT_DB_ALIAS
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+@contextmanager
+def replica_reads():
+    """Send reads to a replica outside a request, e.g. in reporting commands."""
+    token = _state.set(RoutingState(use_replica=True))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Route reads to a replica only in contexts marked safe by ReplicaRoutingMiddleware or
+    replica_reads(); everything else, and every read after a write in the same context,
+    stays on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+@sync_and_async_middleware
+def ReplicaRoutingMiddleware(get_response):
+    """
+    Let safe requests read from a replica. A request that writes pins the client to the
+    primary for REPLICA_LAG_WINDOW seconds through a cookie, so it reads its own writes
+    even while the replicas lag behind.
+    """
+
+    def begin(request):
+        use_replica = request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES
+        state = RoutingState(use_replica)
+        return state, _state.set(state)
+
+    def pin(response, state):
+        if state.pinned:
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=settings.REPLICA_LAG_WINDOW, httponly=True, samesite="Lax"
+            )
+        return response
+
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            state, token = begin(request)
+            try:
+                return pin(await get_response(request), state)
+            finally:
+                _state.reset(token)
+
+    else:
+
+        def middleware(request):
+            state, token = begin(request)
+            try:
+                return pin(get_response(request), state)
+            finally:
+                _state.reset(token)
+
+    return middleware
@@ -0,0 +1,135 @@
+import csv
+import datetime
+import json
+import uuid
+import zlib
+
+from django.apps import apps
+from django.core.exceptions import ValidationError
+
+# name -> (model label, exported fields). Rows are exported in primary key order, so
+# the id of the last row received is the cursor an interrupted export resumes from.
+DATASETS = {
+    "users": (
+        "authentication.User",
+        (
+            "id", "email", "username", "name", "phone", "gender", "user_type", "country",
+            "is_verified", "is_active", "date_joined", "last_login",
+        ),
+    ),
+    "talents": (
+        "talents.Talent",
+        ("id", "name", "country", "skill_set", "level", "gender", "portfolio", "image", "date_created", "last_modified"),
+    ),
+    "talent-requests": (
+        "talents.TalentRequest",
+        ("id", "client_name", "country", "skill_set", "level", "gender", "date_created", "last_modified"),
+    ),
+}
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class ExportError(Exception):
+    pass
+
+
+def encode_value(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+# Leading characters that make spreadsheet apps evaluate a cell as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def csv_value(value):
+    """
+    Format a value for a CSV cell. Text that a spreadsheet would evaluate as a formula is
+    prefixed with a quote, which shows it as text, e.g. a phone number "+234..." as "'+234..."
+    """
+    if isinstance(value, list):
+        return json.dumps(value)
+    value = encode_value(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Line:
+    """File-like target for csv.writer that hands back each formatted line"""
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(fields, rows, header=True):
+    writer = csv.writer(_Line())
+    if header:
+        yield writer.writerow(fields)
+    for chunk in rows:
+        yield "".join(writer.writerow([csv_value(value) for value in row]) for row in chunk)
+
+
+def ndjson_chunks(fields, rows, header=True):
+    dumps = json.JSONEncoder(default=encode_value, separators=(",", ":")).encode
+    for chunk in rows:
+        yield "".join(dumps(dict(zip(fields, row))) + "\n" for row in chunk)
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_rows(dataset, file_format="csv", after=None, chunk_size=2000, gzip=False, using=None):
+    """
+    Stream a dataset as CSV or NDJSON, chunk by chunk, in constant memory.
+    Rows come from a server-side cursor as plain tuples (no model instances or
+    serializers), and each yielded chunk holds up to `chunk_size` formatted rows.
+    :param dataset: A key of DATASETS
+    :param after: Primary key of the last row already received; the export continues after
+        it, without repeating the CSV header
+    :param gzip: Yield gzip-compressed bytes instead of text
+    :raises ExportError: for an unknown dataset or format, or an invalid `after`
+    """
+    if dataset not in DATASETS:
+        raise ExportError(f"Unknown dataset {dataset}. Choose from {', '.join(DATASETS)}")
+    if file_format not in FORMATS:
+        raise ExportError(f"Unknown format {file_format}. Choose from {', '.join(FORMATS)}")
+
+    label, fields = DATASETS[dataset]
+    model = apps.get_model(label)
+    queryset = model._default_manager.using(using).order_by("pk")
+    if after:
+        try:
+            queryset = queryset.filter(pk__gt=model._meta.pk.to_python(after))
+        except ValidationError:
+            raise ExportError(f"Invalid cursor {after}")
+
+    def rows():
+        chunk = []
+        for row in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    formatter = csv_chunks if file_format == "csv" else ndjson_chunks
+    chunks = formatter(fields, rows(), header=not after)
+    return gzip_chunks(chunks) if gzip else chunks
+
+
+def export_filename(dataset, file_format, gzip=False):
+    return f"{dataset}-{datetime.date.today().isoformat()}.{file_format}{'.gz' if gzip else ''}"
@@ -0,0 +1,208 @@
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopFutureHandlers
+from django.db import connection, transaction
+
+from .models import BaseModel
+from .storage import StorageError, get_image_storage, get_upload_queue
+from .utils import error_400, error_503
+
+logger = logging.getLogger(__name__)
+
+# Resized copies made of every uploaded image, in the format of CloudinaryStorage eager transformations
+VARIANTS = {
+    "thumbnail": {"width": 200, "height": 200, "crop": "fill"},
+    "carousel": {"width": 1200, "height": 800, "crop": "limit"},
+}
+
+SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+def sniff_image_type(data):
+    """Content type of an image from its first bytes, or None if it is not a supported image"""
+    for signature, content_type in SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+class StoredImage:
+    """What request.FILES holds for an image streamed to storage: where it went, not its bytes"""
+
+    def __init__(self, name, key, url, size, content_type):
+        self.name = name
+        self.key = key
+        self.url = url
+        self.size = size
+        self.content_type = content_type
+
+    def close(self):
+        pass
+
+
+class ImageStreamHandler(FileUploadHandler):
+    """
+    Upload handler that passes the `field_name` file to the image storage chunk by chunk as
+    the request body is read, instead of buffering it in memory or a temporary file.
+    The type is checked on the first chunk and the size on every one; a file failing either,
+    or any other file field, is skipped and the reason left in `error`.
+    """
+
+    chunk_size = 64 * 2**10
+
+    def __init__(self, request=None, field_name="image", name_prefix="image", max_size=10 * 2**20):
+        super().__init__(request)
+        self.field_name = field_name
+        self.name_prefix = name_prefix
+        self.max_size = max_size
+        self.error = None
+        self.storage_failed = False
+        self._stream = None
+        self._content_type = None
+
+    def new_file(self, field_name, *args, **kwargs):
+        if field_name != self.field_name:
+            raise SkipFile()
+        super().new_file(field_name, *args, **kwargs)
+        self._stream = None
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self._stream is None:
+            self._content_type = sniff_image_type(raw_data)
+            if self._content_type is None:
+                self.error = f"{self.field_name} must be a JPEG, PNG, GIF or WebP image"
+                raise SkipFile()
+            # A new name per upload, so CDN copies of a replaced image are never served for it
+            self._stream = self.call_storage(
+                get_image_storage().open_stream,
+                f"{self.name_prefix}-{uuid.uuid4().hex[:12]}",
+                self._content_type,
+            )
+        if start + len(raw_data) > self.max_size:
+            self.abort()
+            self.error = f"{self.field_name} is larger than {self.max_size // 2**20} MB"
+            raise SkipFile()
+        self.call_storage(self._stream.write, raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self._stream is None:
+            return None
+        key, url = self.call_storage(self._stream.close)
+        self._stream = None
+        return StoredImage(self.file_name, key, url, file_size, self._content_type)
+
+    def upload_interrupted(self):
+        self.abort()
+
+    def abort(self):
+        if self._stream is not None:
+            self._stream.abort()
+            self._stream = None
+
+    def call_storage(self, method, *args):
+        try:
+            return method(*args)
+        except StorageError:
+            logger.exception("Image upload to storage failed")
+            self.abort()
+            self.error = "Image storage is unavailable"
+            self.storage_failed = True
+            raise SkipFile()
+
+
+def generate_variants(model, pk, image_field, variants_field, url, key):
+    """
+    Create the VARIANTS of a stored image and record their URLs on the instance, unless its
+    image was replaced in the meantime
+    """
+    try:
+        variants = get_image_storage().create_variants(key, VARIANTS)
+        with transaction.atomic():
+            instance = model._default_manager.select_for_update().filter(pk=pk).first()
+            if instance is None or getattr(instance, image_field) != url:
+                return
+            setattr(instance, variants_field, variants)
+            if isinstance(instance, BaseModel):
+                instance.save_dirty()
+            else:
+                instance.save(update_fields=[variants_field])
+    except Exception:
+        logger.exception("Variants of %s were not generated", key)
+    finally:
+        # Idle background threads should not each hold a database connection
+        connection.close()
+
+
+def schedule_variants(instance, image_field, variants_field, image):
+    """Queue generate_variants for a StoredImage once the current transaction commits"""
+    transaction.on_commit(
+        lambda: get_upload_queue().submit(
+            generate_variants, type(instance), instance.pk, image_field, variants_field, image.url, image.key
+        )
+    )
+
+
+def delete_stored_image(url):
+    """Delete an image and its variants if this storage holds it; URLs of images stored elsewhere are left alone"""
+    storage = get_image_storage()
+    key = storage.key_for_url(url)
+    if key is None:
+        return
+    try:
+        storage.delete(key)
+    except Exception:
+        logger.exception("Image %s was not deleted", key)
+
+
+def schedule_delete(url):
+    """Queue delete_stored_image once the current transaction commits, or now outside one"""
+    if url:
+        transaction.on_commit(lambda: get_upload_queue().submit(delete_stored_image, url))
+
+
+class ImageUploadMixin:
+    """
+    For API views that take an image file in a multipart body. The `image_field` file is
+    streamed to the image storage while the body is parsed, which happens only after
+    authentication and permission checks, and request data then carries its URL.
+    """
+
+    image_field = "image"
+    image_name_prefix = "image"
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = [
+            ImageStreamHandler(
+                request,
+                field_name=self.image_field,
+                name_prefix=self.image_name_prefix,
+                max_size=settings.IMAGE_UPLOAD_MAX_SIZE,
+            )
+        ]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def get_image_data(self, request):
+        """
+        :return: (data, StoredImage or None, error response or None). In data the image file is
+            replaced by its URL
+        """
+        data = request.data
+        handler = request.upload_handlers[0]
+        if handler.error:
+            return None, None, (error_503 if handler.storage_failed else error_400)(handler.error)
+        image = request.FILES.get(self.image_field)
+        if image is not None:
+            data = data.copy()
+            data[self.image_field] = image.url
+        return data, image, None
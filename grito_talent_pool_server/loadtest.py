@@ -0,0 +1,246 @@
+import itertools
+import random
+import statistics
+import threading
+import time
+import uuid
+
+import requests
+from django.db import connections
+
+from authentication.models import User
+from authentication.otp import generate_otp
+
+COUNTRIES = ["Nigeria", "Ghana", "Kenya", "South Africa", "Egypt", "Rwanda"]
+LEVELS = ["Junior", "Intermediate", "Senior", "Expert"]
+GENDERS = ["Male", "Female"]
+SKILLS = ["Python", "Django", "React", "Nodejs", "MongoDB", "Java", "Go", "Figma"]
+PASSWORD = "Passw0rd!x"
+
+
+class Recorder:
+    """Latencies and failures per endpoint, shared by every virtual user"""
+
+    def __init__(self):
+        self._latencies = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, ok):
+        with self._lock:
+            self._latencies.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+
+    def summary(self, elapsed):
+        """
+        :return: {endpoint: stats}, with an "all" entry over every request. Latencies are in
+            milliseconds, throughput in requests per second over the whole run
+        """
+        with self._lock:
+            latencies = {endpoint: list(values) for endpoint, values in self._latencies.items()}
+            errors = dict(self._errors)
+        latencies["all"] = [value for values in latencies.values() for value in values]
+        errors["all"] = sum(errors.values())
+        summary = {}
+        for endpoint, values in latencies.items():
+            if not values:
+                continue
+            if len(values) > 1:
+                percentiles = statistics.quantiles(values, n=100, method="inclusive")
+            else:
+                # A single sample is every percentile
+                percentiles = values * 99
+            summary[endpoint] = {
+                "requests": len(values),
+                "errors": errors.get(endpoint, 0),
+                "errorRate": round(errors.get(endpoint, 0) / len(values), 4),
+                "throughput": round(len(values) / elapsed, 2),
+                "p50Ms": round(percentiles[49] * 1000, 2),
+                "p95Ms": round(percentiles[94] * 1000, 2),
+                "p99Ms": round(percentiles[98] * 1000, 2),
+            }
+        return summary
+
+
+class LoadTestError(Exception):
+    pass
+
+
+def activate_user(email):
+    """
+    Activate a signed-up user, as an operator would before it can log in. This writes to
+    the database of the current settings, which must be the target's.
+    :raises LoadTestError: when the user is not in that database
+    """
+    if not User.objects.filter(email=email).update(is_active=True):
+        raise LoadTestError(
+            f"{email} signed up but is not in this database; activating users needs the load "
+            "generator's settings to point at the target's database"
+        )
+
+
+class VirtualUser:
+    """
+    Walks one synthetic user through sign-up, activation, OTP confirmation and login, then
+    mixes authenticated admin calls with public listing traffic, and logs out.
+    OTP codes are derived locally and users are activated in the database directly, so the
+    target must run with the same SECRET_KEY and database.
+    """
+
+    def __init__(
+        self,
+        base_url,
+        recorder,
+        rng,
+        session_requests=10,
+        public_share=0.5,
+        think_time=0.0,
+        talents=True,
+        timeout=30.0,
+        activate=activate_user,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.rng = rng
+        self.session_requests = session_requests
+        self.public_share = public_share
+        self.think_time = think_time
+        self.talents = talents
+        self.timeout = timeout
+        self.activate = activate
+        self.http = requests.Session()
+        # URL -> ETag of its last response, revalidated like a browser would
+        self.etags = {}
+
+    def call(self, endpoint, method, path, expected=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.http.request(method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+        except requests.RequestException:
+            self.recorder.record(endpoint, time.perf_counter() - started, False)
+            return None
+        ok = response.status_code in expected
+        self.recorder.record(endpoint, time.perf_counter() - started, ok)
+        return response if ok else None
+
+    def pause(self):
+        if self.think_time:
+            time.sleep(self.rng.uniform(0, 2 * self.think_time))
+
+    def run_session(self):
+        email = f"loadtest-{uuid.uuid4().hex[:16]}@example.com"
+        signed_up = self.call(
+            "sign-up",
+            "POST",
+            "/auth/v1/admin/sign-up",
+            expected=(201,),
+            json={"name": "Load Test", "username": email.split("@")[0], "email": email, "password": PASSWORD},
+        )
+        if signed_up is None:
+            return
+        self.activate(email)
+        self.pause()
+        confirmed = self.call(
+            "confirm-otp", "POST", "/auth/v1/confirm/otp/", json={"email": email, "otp_code": generate_otp(email)}
+        )
+        if confirmed is None:
+            return
+        self.pause()
+        logged_in = self.call("login", "POST", "/auth/v1/login/admin/", json={"email": email, "password": PASSWORD})
+        if logged_in is None:
+            return
+        tokens = logged_in.json()
+        headers = {"Authorization": f"Bearer {tokens['access']}"}
+
+        if self.talents:
+            for _ in range(self.session_requests):
+                self.pause()
+                if self.rng.random() < self.public_share:
+                    self.public_call()
+                else:
+                    self.admin_call(headers)
+        self.pause()
+        self.call("logout", "POST", "/auth/v1/logout/", headers=headers, json={"refresh": tokens["refresh"]})
+
+    def admin_call(self, headers):
+        if self.rng.random() < 0.5:
+            self.call("admin-talents", "GET", "/api/v1/admin/talents", headers=headers)
+        else:
+            self.call(
+                "admin-talents-filtered",
+                "GET",
+                "/api/v1/admin/talents",
+                headers=headers,
+                params={"country": self.rng.choice(COUNTRIES), "level": self.rng.choice(LEVELS)},
+            )
+
+    def public_call(self):
+        choice = self.rng.random()
+        if choice < 0.5:
+            self.listing("talents", {})
+        elif choice < 0.9:
+            self.listing("talents-filtered", {"level": self.rng.choice(LEVELS), "gender": self.rng.choice(GENDERS)})
+        else:
+            self.call(
+                "talent-request",
+                "POST",
+                "/api/v1/talent-request",
+                expected=(201,),
+                json={
+                    "clientName": "Load Test",
+                    "country": self.rng.choice(COUNTRIES),
+                    "skillSet": self.rng.sample(SKILLS, 2),
+                    "level": self.rng.choice(LEVELS),
+                    "gender": self.rng.choice(GENDERS),
+                },
+            )
+
+    def listing(self, endpoint, params):
+        path = "/api/v1/talents"
+        key = (path, tuple(sorted(params.items())))
+        headers = {"If-None-Match": self.etags[key]} if key in self.etags else {}
+        response = self.call(endpoint, "GET", path, expected=(200, 304), params=params, headers=headers)
+        if response is not None and "ETag" in response.headers:
+            self.etags[key] = response.headers["ETag"]
+
+
+def run_load(base_url, concurrency=8, duration=30.0, sessions=0, seed=0, **user_options):
+    """
+    Run `concurrency` virtual users, each starting a new session as soon as its last one
+    ends, until `duration` seconds have passed or `sessions` sessions were started
+    :param user_options: Passed to VirtualUser
+    :return: (Recorder, elapsed seconds, sessions started)
+    :raises LoadTestError: when a session cannot be set up; every user stops then
+    """
+    recorder = Recorder()
+    counter = itertools.count(1)
+    deadline = time.monotonic() + duration
+    started_sessions = []
+    failures = []
+    stop = threading.Event()
+
+    def worker(index):
+        user = VirtualUser(base_url, recorder, random.Random(seed * 1000 + index), **user_options)
+        try:
+            while time.monotonic() < deadline and not stop.is_set():
+                number = next(counter)
+                if sessions and number > sessions:
+                    break
+                started_sessions.append(number)
+                user.run_session()
+        except LoadTestError as error:
+            failures.append(error)
+            stop.set()
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if failures:
+        raise failures[0]
+    return recorder, time.perf_counter() - started, len(started_sessions)
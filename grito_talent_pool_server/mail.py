@@ -0,0 +1,225 @@
+import json
+import threading
+import time
+
+import requests
+from decouple import config
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .metrics import observe_outbound, outbound_hook
+
+
+class MailError(Exception):
+    pass
+
+
+class CircuitOpenError(MailError):
+    pass
+
+
+class MailRejected(MailError):
+    """The provider refused the request itself (4xx other than 429); sending it again cannot help"""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitBreaker:
+    """
+    Fail fast while the mail provider is down.
+    After `failure_threshold` consecutive failures the breaker opens and every call
+    is rejected until `reset_timeout` seconds have passed; then a single call is let
+    through as a probe, which closes the breaker again if it succeeds and reopens it if
+    it fails. Other calls are rejected while the probe runs, or until `reset_timeout`
+    passes without it reporting back.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probe_started_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_timeout:
+                return False
+            if self._probe_started_at is not None and now - self._probe_started_at < self.reset_timeout:
+                return False
+            self._probe_started_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold or self._probe_started_at is not None:
+                self._opened_at = time.monotonic()
+            self._probe_started_at = None
+
+
+class ZeptoMailClient:
+    """
+    Thin ZeptoMail client that keeps one pooled keep-alive session per process.
+    Only connection failures and 429/5xx answers are retried: a read timeout means the
+    provider may already have accepted the email, so it is never replayed.
+    """
+
+    BATCH_LIMIT = 500
+    # Label of this provider's calls in the outbound request metrics
+    service = "zeptomail"
+
+    def __init__(
+        self,
+        api_key,
+        base_url="https://api.zeptomail.com/v1.1",
+        from_address="support@grito.africa",
+        connect_timeout=3.05,
+        read_timeout=10.0,
+        max_retries=2,
+        backoff_factor=0.3,
+        pool_size=10,
+        breaker=None,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.from_address = from_address
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker()
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=max_retries,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"POST"}),
+            backoff_factor=backoff_factor,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.hooks["response"].append(outbound_hook(self.service))
+        self.session.headers.update(
+            {
+                "accept": "application/json",
+                "content-type": "application/json",
+                "authorization": api_key,
+            }
+        )
+
+    def _post(self, path, payload):
+        if not self.breaker.allow():
+            raise CircuitOpenError("Mail provider circuit is open")
+
+        started = time.perf_counter()
+        try:
+            response = self.session.post(
+                f"{self.base_url}{path}", data=json.dumps(payload), timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            observe_outbound(self.service, time.perf_counter() - started, "error")
+            self.breaker.record_failure()
+            raise MailError(str(e)) from e
+
+        if response.status_code >= 500 or response.status_code == 429:
+            self.breaker.record_failure()
+            raise MailError(f"Mail provider returned {response.status_code}: {response.text}")
+
+        self.breaker.record_success()
+        if response.status_code >= 400:
+            raise MailRejected(
+                f"Mail provider rejected the request ({response.status_code}): {response.text}", response.status_code
+            )
+        return response
+
+    def send_template(self, template_key, email, name, merge_info):
+        payload = {
+            "merge_info": merge_info,
+            "template_key": template_key,
+            "from": {"address": self.from_address},
+            "to": [{"email_address": {"address": email, "name": name}}],
+        }
+        return self._post("/email/template", payload).text
+
+    def send_batch_template(self, template_key, recipients):
+        """
+        Send one template to many recipients using the batch endpoint
+        :param template_key: The ZeptoMail template key
+        :param recipients: Iterable of (email, name, merge_info) tuples
+        :return: A list with the provider response body of each batch
+        """
+        recipients = list(recipients)
+        responses = []
+        for start in range(0, len(recipients), self.BATCH_LIMIT):
+            payload = {
+                "template_key": template_key,
+                "from": {"address": self.from_address},
+                "to": [
+                    {
+                        "email_address": {"address": email, "name": name},
+                        "merge_info": merge_info,
+                    }
+                    for email, name, merge_info in recipients[start:start + self.BATCH_LIMIT]
+                ],
+            }
+            responses.append(self._post("/email/template/batch", payload).text)
+        return responses
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_mail_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ZeptoMailClient(
+                    api_key=config("ZEPTO_API_KEY"),
+                    base_url=config("ZEPTO_API_URL", default="https://api.zeptomail.com/v1.1"),
+                    from_address=config("MAIL_FROM_ADDRESS", default="support@grito.africa"),
+                    connect_timeout=config("MAIL_CONNECT_TIMEOUT", default=3.05, cast=float),
+                    read_timeout=config("MAIL_READ_TIMEOUT", default=10.0, cast=float),
+                    max_retries=config("MAIL_MAX_RETRIES", default=2, cast=int),
+                    backoff_factor=config("MAIL_BACKOFF_FACTOR", default=0.3, cast=float),
+                    pool_size=config("MAIL_POOL_SIZE", default=10, cast=int),
+                    breaker=CircuitBreaker(
+                        failure_threshold=config("MAIL_BREAKER_THRESHOLD", default=5, cast=int),
+                        reset_timeout=config("MAIL_BREAKER_RESET", default=30.0, cast=float),
+                    ),
+                )
+    return _client
@@ -0,0 +1,92 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ZeptoStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("content-length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        with server.lock:
+            server.requests_received += 1
+
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if random.random() < server.failure_rate:
+            self._reply(503, {"error": {"code": "SERVICE_UNAVAILABLE"}})
+            return
+
+        addresses = [recipient["email_address"]["address"] for recipient in body.get("to", [])]
+        if server.rejected.intersection(addresses):
+            self._reply(422, {"error": {"code": "TM_3201", "message": "Invalid recipient address"}})
+            return
+
+        recipients = len(addresses)
+        with server.lock:
+            server.requests_served += 1
+            server.emails_accepted += recipients
+        self._reply(201, {"data": [{"code": "EM_104", "message": "Email request received"}]})
+
+    def _reply(self, code, payload):
+        data = json.dumps(payload).encode()
+        try:
+            self.send_response(code)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client timed out and went away, as clients under test are meant to
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ZeptoStubServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the ZeptoMail API used to benchmark mail delivery offline.
+    Every POST is accepted after `latency` (+ up to `jitter`) seconds, except for a
+    `failure_rate` share of requests which get a 503, and requests to any of the `rejected`
+    addresses, which get a 422.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, failure_rate=0.0, rejected=(), verbose=False
+    ):
+        super().__init__((host, port), ZeptoStubHandler)
+        self.rejected = set(rejected)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        # Every POST, and those answered with a 201
+        self.requests_received = 0
+        self.requests_served = 0
+        self.emails_accepted = 0
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1.1"
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
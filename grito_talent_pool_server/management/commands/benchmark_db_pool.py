@@ -0,0 +1,54 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.utils import load_backend
+
+from grito_talent_pool_server.db.pool import pool_stats
+
+POOLED_ENGINE = "grito_talent_pool_server.db.backends.postgresql_pool"
+PLAIN_ENGINE = "django.db.backends.postgresql"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-request database latency with pooled and unpooled PostgreSQL connections. "
+        "Each simulated request connects, runs one query and closes the connection, as a "
+        "request does with CONN_MAX_AGE=0."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=4)
+
+    def handle(self, *args, **options):
+        settings_dict = settings.DATABASES[options["database"]]
+        for label, engine in (("pooling off", PLAIN_ENGINE), ("pooling on", POOLED_ENGINE)):
+            latencies, wall = self.run({**settings_dict, "ENGINE": engine}, options)
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            self.stdout.write(
+                f"{label}: {len(latencies) / wall:.1f} req/s, "
+                f"p50 {statistics.median(latencies) * 1000:.2f} ms, p95 {p95 * 1000:.2f} ms"
+            )
+        for name, stats in pool_stats().items():
+            self.stdout.write(f"pool {name}: {stats}")
+
+    @staticmethod
+    def run(settings_dict, options):
+        backend = load_backend(settings_dict["ENGINE"])
+
+        def simulated_request(_):
+            connection = backend.DatabaseWrapper(settings_dict, alias="benchmark")
+            started = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.close()
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            latencies = sorted(executor.map(simulated_request, range(options["requests"])))
+        return latencies, time.perf_counter() - started
@@ -0,0 +1,90 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+
+from grito_talent_pool_server.mail import ZeptoMailClient, CircuitBreaker, MailError
+from grito_talent_pool_server.mail_stub import ZeptoStubServer
+
+
+class Command(BaseCommand):
+    help = "Benchmark the pooled mail client against the local ZeptoMail stub"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--latency", type=float, default=0.02)
+        parser.add_argument("--jitter", type=float, default=0.0)
+        parser.add_argument("--failure-rate", type=float, default=0.0)
+        parser.add_argument("--batch-size", type=int, default=0, help="Also time one batch call of this many recipients")
+
+    def handle(self, *args, **options):
+        server = ZeptoStubServer(
+            latency=options["latency"],
+            jitter=options["jitter"],
+            failure_rate=options["failure_rate"],
+        ).start()
+        try:
+            client = ZeptoMailClient(
+                "stub-key",
+                base_url=server.url,
+                pool_size=options["concurrency"],
+                breaker=CircuitBreaker(failure_threshold=options["requests"] + 1),
+            )
+
+            def pooled(i):
+                client.send_template("otp", f"user{i}@example.com", "User", {"OTP": "123456"})
+
+            def unpooled(i):
+                response = requests.request(
+                    "POST",
+                    f"{server.url}/email/template",
+                    json={"to": [{"email_address": {"address": f"user{i}@example.com"}}]},
+                    timeout=client.timeout,
+                )
+                response.raise_for_status()
+
+            self.report("fresh connection per email", self.run(unpooled, options))
+            self.report("pooled client", self.run(pooled, options))
+
+            if options["batch_size"]:
+                recipients = [
+                    (f"user{i}@example.com", "User", {"OTP": "123456"})
+                    for i in range(options["batch_size"])
+                ]
+                started = time.perf_counter()
+                client.send_batch_template("otp", recipients)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"batch of {len(recipients)} recipients: {elapsed * 1000:.1f} ms")
+            client.close()
+        finally:
+            server.stop()
+
+    @staticmethod
+    def run(func, options):
+        def timed(i):
+            started = time.perf_counter()
+            try:
+                func(i)
+                ok = True
+            except (MailError, requests.RequestException):
+                ok = False
+            return time.perf_counter() - started, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            results = list(pool.map(timed, range(options["requests"])))
+        return results, time.perf_counter() - started
+
+    def report(self, label, outcome):
+        results, wall = outcome
+        latencies = sorted(duration for duration, _ in results)
+        failures = sum(1 for _, ok in results if not ok)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(
+            f"{label}: {len(results) / wall:.1f} req/s, "
+            f"p50 {statistics.median(latencies) * 1000:.1f} ms, "
+            f"p95 {p95 * 1000:.1f} ms, failures {failures}"
+        )
@@ -0,0 +1,84 @@
+import statistics
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.pagination import Cursor, PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from grito_talent_pool_server.pagination import KeysetPagination
+
+ROW_FIELDS = {
+    "talents.Talent": lambda i: {
+        "name": f"Talent {i}",
+        "country": ("Nigeria", "Ghana", "Kenya")[i % 3],
+        "skill_set": ["Python", "Django"],
+        "level": ("Junior", "Intermediate", "Senior")[i % 3],
+        "gender": ("Male", "Female")[i % 2],
+        "portfolio": f"https://portfolio.example.com/{i}",
+    },
+    "authentication.OutboxEmail": lambda i: {"email": f"bench-{i}@example.com", "name": "Bench"},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare keyset and page-number pagination latency on the first and a deep page. "
+        "Runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", default="talents.Talent", choices=sorted(ROW_FIELDS))
+        parser.add_argument("--page", type=int, default=10000, help="Deep page to compare with page 1")
+        parser.add_argument("--page-size", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(apps.get_model(options["model"]), options)
+            transaction.set_rollback(True)
+
+    def run(self, model, options):
+        page_size, deep_page = options["page_size"], options["page"]
+        rows = page_size * deep_page
+        fields = ROW_FIELDS[model._meta.label]
+        for start in range(0, rows, 10000):
+            model.objects.bulk_create([model(**fields(i)) for i in range(start, min(start + 10000, rows))])
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+        self.stdout.write(f"{rows} {model._meta.label} rows, {page_size} per page")
+
+        queryset = model.objects.all()
+        factory = APIRequestFactory()
+
+        def timed(paginator, url):
+            request = Request(factory.get(url))
+            latencies = []
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                list(paginator.paginate_queryset(queryset, request))
+                if isinstance(paginator, PageNumberPagination):
+                    paginator.get_paginated_response([])
+                latencies.append((time.perf_counter() - started) * 1000)
+            return statistics.median(latencies)
+
+        keyset = KeysetPagination()
+        keyset.page_size = page_size
+        keyset.paginate_queryset(queryset, Request(factory.get("/")))
+        # The cursor a client holds after paging to deep_page - 1 (looked up directly, not timed)
+        boundary = queryset.order_by(*keyset.ordering)[(deep_page - 1) * page_size - 1]
+        cursor_url = keyset.encode_cursor(Cursor(offset=0, reverse=False, position=keyset.get_position(boundary)))
+
+        offset = PageNumberPagination()
+        offset.page_size = page_size
+        results = {
+            "keyset": (timed(keyset, "/"), timed(keyset, cursor_url)),
+            "page number": (timed(offset, "/"), timed(offset, f"/?page={deep_page}")),
+        }
+        for name, (first, deep) in results.items():
+            self.stdout.write(
+                f"{name:>11}: page 1 {first:.2f} ms, page {deep_page} {deep:.2f} ms (median of {options['repeat']})"
+            )
@@ -0,0 +1,43 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from grito_talent_pool_server.export import DATASETS, FORMATS, ExportError, export_rows
+
+
+class Command(BaseCommand):
+    help = "Stream a dataset to a CSV or NDJSON file in constant memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=sorted(DATASETS))
+        parser.add_argument("--format", dest="file_format", choices=sorted(FORMATS), default="csv")
+        parser.add_argument("--output", "-o", default="-", help="File path, or - for stdout")
+        parser.add_argument("--after", help="Resume after the row with this id")
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--chunk-size", type=int, default=settings.EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            chunks = export_rows(
+                options["dataset"],
+                options["file_format"],
+                after=options["after"],
+                chunk_size=options["chunk_size"],
+                gzip=options["gzip"],
+            )
+        except ExportError as e:
+            raise CommandError(str(e))
+
+        if options["output"] == "-":
+            output = sys.stdout.buffer if options["gzip"] else sys.stdout
+            for chunk in chunks:
+                output.write(chunk)
+            output.flush()
+        else:
+            # A resumed export (--after) continues the file it was interrupted in
+            mode = ("a" if options["after"] else "w") + ("b" if options["gzip"] else "")
+            text = {} if options["gzip"] else {"encoding": "utf-8", "newline": ""}
+            with open(options["output"], mode, **text) as output:
+                for chunk in chunks:
+                    output.write(chunk)
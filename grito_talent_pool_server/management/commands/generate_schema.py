@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from grito_talent_pool_server.schema import RENDERERS, schema_cache, schema_version
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the OpenAPI schema for the current code version into SCHEMA_CACHE_DIR, "
+        "where the API serves it from. Run at deploy time."
+    )
+
+    def handle(self, *args, **options):
+        version = schema_version()
+        schema_cache.generate(version)
+        for file_format in RENDERERS:
+            self.stdout.write(f"wrote {schema_cache.path(version, file_format)} (+ .gz)")
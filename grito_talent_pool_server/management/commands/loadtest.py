@@ -0,0 +1,160 @@
+import json
+import random
+import threading
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from authentication.outbox import drain_outbox
+from grito_talent_pool_server import mail
+from grito_talent_pool_server.loadtest import COUNTRIES, GENDERS, LEVELS, SKILLS, LoadTestError, run_load
+from grito_talent_pool_server.mail import CircuitBreaker, ZeptoMailClient
+from grito_talent_pool_server.mail_stub import ZeptoStubServer
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive mixed traffic (sign-up, activation, OTP confirmation, login, admin calls, public listings, "
+        "logout) at a given concurrency and report throughput, p50/p95/p99 latency and error "
+        "rate per endpoint. Without --url the app is served in this process from a throwaway "
+        "test database, with the outbox delivering to a local ZeptoMail stub; since the load "
+        "generator then shares the process, size workers with --url against a real deployment "
+        "running the same SECRET_KEY, and ZEPTO_API_URL pointed at the mail_stub command. Signed-up "
+        "users are activated by writing to the database, so --url also needs --activate-via-db and "
+        "this command's settings pointing at the deployment's database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", help="Base URL of a running deployment, e.g. http://127.0.0.1:8000")
+        parser.add_argument(
+            "--activate-via-db",
+            action="store_true",
+            help="With --url, activate signed-up users in the database of these settings, which the deployment must share",
+        )
+        parser.add_argument("--concurrency", type=int, default=8, help="Virtual users running at once")
+        parser.add_argument("--duration", type=float, default=30.0, help="Seconds during which sessions start")
+        parser.add_argument("--sessions", type=int, default=0, help="Stop after this many sessions; 0 for no limit")
+        parser.add_argument("--session-requests", type=int, default=10, help="Calls per session after login")
+        parser.add_argument("--public-share", type=float, default=0.5, help="Share of those calls to public listings")
+        parser.add_argument("--think-time", type=float, default=0.0, help="Mean seconds between a user's calls")
+        parser.add_argument("--no-talents", action="store_true", help="Only the auth flow")
+        parser.add_argument("--seed-talents", type=int, default=500, help="Talents created in the test database")
+        parser.add_argument("--mail-latency", type=float, default=0.05, help="Seconds the ZeptoMail stub takes")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Also write the results to this JSON file")
+
+    def handle(self, *args, **options):
+        load_options = {
+            "concurrency": options["concurrency"],
+            "duration": options["duration"],
+            "sessions": options["sessions"],
+            "seed": options["seed"],
+            "session_requests": options["session_requests"],
+            "public_share": options["public_share"],
+            "think_time": options["think_time"],
+            "talents": not options["no_talents"],
+        }
+        try:
+            if options["url"]:
+                if not options["activate_via_db"]:
+                    raise CommandError(
+                        "--url needs --activate-via-db: users are activated in the database of these "
+                        "settings, which must be the deployment's"
+                    )
+                recorder, elapsed, sessions = run_load(options["url"], **load_options)
+                mail_stats = None
+            else:
+                recorder, elapsed, sessions, mail_stats = self.run_in_process(options, load_options)
+        except LoadTestError as e:
+            raise CommandError(str(e))
+
+        summary = recorder.summary(elapsed)
+        if not summary:
+            raise CommandError("No request was made")
+        self.stdout.write(
+            f"{sessions} sessions by {options['concurrency']} concurrent users in {elapsed:.1f} s\n"
+            f"{'endpoint':<24}{'requests':>9}{'req/s':>9}{'errors':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        )
+        for endpoint, stats in summary.items():
+            self.stdout.write(
+                f"{endpoint:<24}{stats['requests']:>9}{stats['throughput']:>9.1f}{stats['errorRate']:>8.1%} "
+                f"{stats['p50Ms']:>8.1f} {stats['p95Ms']:>8.1f} {stats['p99Ms']:>8.1f}"
+            )
+        if mail_stats is not None:
+            self.stdout.write(f"Mail stub: {mail_stats['requests']} requests, {mail_stats['emails']} emails accepted")
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(
+                    {"sessions": sessions, "seconds": round(elapsed, 3), "options": load_options, "endpoints": summary},
+                    file,
+                    indent=2,
+                )
+                file.write("\n")
+
+    def run_in_process(self, options, load_options):
+        stub = ZeptoStubServer(latency=options["mail_latency"]).start()
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, serialized_aliases=())
+        server = None
+        stop = threading.Event()
+        try:
+            if load_options["talents"]:
+                self.seed_talents(options["seed_talents"], options["seed"])
+            client = ZeptoMailClient("stub-key", base_url=stub.url, breaker=CircuitBreaker())
+            with mock.patch.object(mail, "_client", client):
+                server = ThreadedWSGIServer(("127.0.0.1", 0), QuietRequestHandler, allow_reuse_address=False)
+                server.daemon_threads = True
+                server.set_app(get_wsgi_application())
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                outbox = threading.Thread(target=self.deliver_outbox, args=(client, stop), daemon=True)
+                outbox.start()
+                host, port = server.server_address[:2]
+                recorder, elapsed, sessions = run_load(f"http://{host}:{port}", **load_options)
+                stop.set()
+                outbox.join()
+        finally:
+            stop.set()
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+            stub.stop()
+        return recorder, elapsed, sessions, {"requests": stub.requests_served, "emails": stub.emails_accepted}
+
+    @staticmethod
+    def deliver_outbox(client, stop):
+        # What the send_outbox worker does next to a deployment
+        while not stop.is_set():
+            if not drain_outbox(client=client):
+                stop.wait(0.2)
+        drain_outbox(client=client)
+        connection.close()
+
+    def seed_talents(self, count, seed):
+        from talents.models import Talent
+
+        rng = random.Random(seed)
+        Talent.objects.bulk_create(
+            [
+                Talent(
+                    name=f"Load test talent {i}",
+                    country=rng.choice(COUNTRIES),
+                    skill_set=rng.sample(SKILLS, rng.randint(1, 4)),
+                    level=rng.choice(LEVELS),
+                    gender=rng.choice(GENDERS),
+                    portfolio=f"https://portfolio.example.com/loadtest-{i}",
+                )
+                for i in range(count)
+            ],
+            batch_size=1000,
+        )
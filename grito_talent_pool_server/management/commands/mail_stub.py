@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from grito_talent_pool_server.mail_stub import ZeptoStubServer
+
+
+class Command(BaseCommand):
+    help = "Run a local ZeptoMail stand-in. Point ZEPTO_API_URL at the printed url."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8025)
+        parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+        parser.add_argument("--jitter", type=float, default=0.0, help="Random extra seconds, up to this value")
+        parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests answered with 503")
+        parser.add_argument("--verbose", action="store_true")
+
+    def handle(self, *args, **options):
+        server = ZeptoStubServer(
+            host=options["host"],
+            port=options["port"],
+            latency=options["latency"],
+            jitter=options["jitter"],
+            failure_rate=options["failure_rate"],
+            verbose=options["verbose"],
+        )
+        self.stdout.write(f"ZeptoMail stub listening on {server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(
+                f"Served {server.requests_served} requests, {server.emails_accepted} emails accepted"
+            )
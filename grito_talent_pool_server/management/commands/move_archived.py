@@ -0,0 +1,37 @@
+import datetime
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from grito_talent_pool_server.models import BaseModel
+from grito_talent_pool_server.retention import archivable_models, cold_table_name, move_archived
+
+
+class Command(BaseCommand):
+    help = "Move rows archived more than --days ago into their cold tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.ARCHIVE_RETENTION_DAYS)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--model", action="append", help="app_label.ModelName; repeat for several. Default: all")
+
+    def handle(self, *args, **options):
+        if options["model"]:
+            models = []
+            for label in options["model"]:
+                try:
+                    model = apps.get_model(label)
+                except (LookupError, ValueError) as e:
+                    raise CommandError(str(e))
+                if not issubclass(model, BaseModel):
+                    raise CommandError(f"{label} is not a BaseModel")
+                models.append(model)
+        else:
+            models = archivable_models()
+
+        archived_before = timezone.now() - datetime.timedelta(days=options["days"])
+        for model in models:
+            moved = move_archived(model, archived_before, batch_size=options["batch_size"])
+            self.stdout.write(f"{model._meta.label}: moved {moved} rows to {cold_table_name(model)}")
@@ -0,0 +1,317 @@
+import bisect
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.decorators import sync_and_async_middleware
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# SQL statements kept per request for its trace: the slowest ones
+TRACE_STATEMENTS = 5
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}"
+
+
+def url_name(request):
+    """Name of the URL pattern a request resolved to, the label requests are grouped by"""
+    match = getattr(request, "resolver_match", None)
+    return (match.url_name or match.view_name) if match is not None else "unmatched"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{format_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    """Cumulative histogram over fixed buckets, one series per label values tuple"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            values = [(labels, list(series)) for labels, series in self._values.items()]
+        for labels, series in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series):
+                cumulative += count
+                yield f"{self.name}_bucket{format_labels(self.labelnames, labels, [('le', bound)])} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labelnames, labels)} {series[-1]}"
+            yield f"{self.name}_count{format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+http_requests = registry.register(
+    Counter("http_requests_total", "Requests by URL name, method and status", ("view", "method", "status"))
+)
+http_request_duration = registry.register(
+    Histogram("http_request_duration_seconds", "Request latency by URL name", ("view", "method"))
+)
+http_request_queries = registry.register(
+    Histogram(
+        "http_request_db_queries", "SQL queries per request by URL name", ("view",), buckets=QUERY_COUNT_BUCKETS
+    )
+)
+http_request_db_duration = registry.register(
+    Histogram("http_request_db_seconds", "Time per request spent in SQL queries, by URL name", ("view",))
+)
+http_request_hash_duration = registry.register(
+    Counter(
+        "http_request_password_hash_seconds_total", "Time spent hashing passwords for requests, by URL name", ("view",)
+    )
+)
+password_hash_duration = registry.register(
+    Histogram("password_hash_duration_seconds", "Password hashing and verification time", ("operation",))
+)
+outbound_duration = registry.register(
+    Histogram(
+        "outbound_request_duration_seconds",
+        "Latency of calls to external services, by service and status",
+        ("service", "status"),
+    )
+)
+
+
+class RequestStats:
+    __slots__ = ("request", "queries", "db_time", "hash_time", "outbound", "statements", "_sequence")
+
+    def __init__(self, request):
+        self.request = request
+        self.queries = 0
+        self.db_time = 0.0
+        self.hash_time = 0.0
+        self.outbound = []
+        # Min-heap of the slowest (duration, sequence, sql) statements
+        self.statements = []
+        self._sequence = itertools.count()
+
+    @property
+    def view(self):
+        return url_name(self.request)
+
+    def record_query(self, sql, duration, keep_statement):
+        self.queries += 1
+        self.db_time += duration
+        if keep_statement:
+            entry = (duration, next(self._sequence), sql[:1000])
+            if len(self.statements) < TRACE_STATEMENTS:
+                heapq.heappush(self.statements, entry)
+            else:
+                heapq.heappushpop(self.statements, entry)
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+def current_request():
+    """RequestStats of the request being served in this context, or None"""
+    return _current.get()
+
+
+class SlowRequestLog:
+    """The `size` slowest requests this process has served, with what they spent their time on"""
+
+    def __init__(self, size):
+        self.size = size
+        self._heap = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def threshold(self):
+        """Duration a request must exceed to be kept"""
+        heap = self._heap
+        return heap[0][0] if len(heap) >= self.size else 0.0
+
+    def offer(self, duration, build_trace):
+        if not self.size or duration <= self.threshold():
+            return
+        entry = (duration, next(self._sequence), build_trace())
+        with self._lock:
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, entry)
+            elif duration > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def traces(self):
+        with self._lock:
+            entries = sorted(self._heap, reverse=True)
+        return [trace for _, _, trace in entries]
+
+
+slow_requests = SlowRequestLog(settings.METRICS_SLOW_REQUESTS)
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record_query(sql, time.perf_counter() - started, bool(slow_requests.size))
+
+
+@receiver(connection_created)
+def install_sql_wrapper(sender, connection, **kwargs):
+    # The wrapper stays on the connection object, which outlives the database connections it opens
+    if settings.METRICS_ENABLED and sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_wrapper)
+
+
+def observe_password_hash(operation, duration, stats=None):
+    password_hash_duration.observe(duration, (operation,))
+    if stats is not None:
+        stats.hash_time += duration
+
+
+def outbound_hook(service):
+    """requests response hook recording the latency of each call to `service`"""
+
+    def hook(response, *args, **kwargs):
+        observe_outbound(service, response.elapsed.total_seconds(), response.status_code)
+
+    return hook
+
+
+def observe_outbound(service, duration, status):
+    outbound_duration.observe(duration, (service, str(status)))
+    stats = _current.get()
+    if stats is not None:
+        stats.outbound.append({"service": service, "status": status, "seconds": round(duration, 6)})
+
+
+def record_request(stats, request, status, duration):
+    view = stats.view
+    http_requests.inc((view, request.method, str(status)))
+    http_request_duration.observe(duration, (view, request.method))
+    http_request_queries.observe(stats.queries, (view,))
+    http_request_db_duration.observe(stats.db_time, (view,))
+    if stats.hash_time:
+        http_request_hash_duration.inc((view,), stats.hash_time)
+    slow_requests.offer(
+        duration,
+        lambda: {
+            "view": view,
+            "method": request.method,
+            "path": request.path,
+            "status": status,
+            "seconds": round(duration, 6),
+            "db": {"queries": stats.queries, "seconds": round(stats.db_time, 6)},
+            "slowestQueries": [
+                {"seconds": round(d, 6), "sql": sql} for d, _, sql in sorted(stats.statements, reverse=True)
+            ],
+            "passwordHashSeconds": round(stats.hash_time, 6),
+            "outbound": stats.outbound,
+            "at": time.time(),
+        },
+    )
+
+
+@sync_and_async_middleware
+def MetricsMiddleware(get_response):
+    """
+    Time every request and count its SQL queries, SQL time, password hashing and outbound
+    calls, labelled with the URL name it resolved to. Place first, so the rest of the stack
+    is included.
+    """
+    if not settings.METRICS_ENABLED:
+        raise MiddlewareNotUsed()
+
+    def begin(request):
+        stats = RequestStats(request)
+        return stats, _current.set(stats), time.perf_counter()
+
+    def finish(stats, request, response, started):
+        record_request(stats, request, response.status_code, time.perf_counter() - started)
+        return response
+
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            stats, token, started = begin(request)
+            try:
+                return finish(stats, request, await get_response(request), started)
+            finally:
+                _current.reset(token)
+
+    else:
+
+        def middleware(request):
+            stats, token, started = begin(request)
+            try:
+                return finish(stats, request, get_response(request), started)
+            finally:
+                _current.reset(token)
+
+    return middleware
@@ -1,45 +1,114 @@
+import functools
+
 from django.db import models
+from django.dispatch import Signal
+from django.db.models import Q
 from django.db.models.fields.related import ForeignObjectRel, RelatedField
 from django.utils import timezone
 
 
+# Sent with sender=model after BaseModelQuerySet writes that bypass save() and post_save
+rows_updated = Signal()
+
+
+@functools.cache
+def editable_field_names(model):
+    """Names of the fields update_from_dict may set on a model, computed once per model"""
+    return frozenset(
+        f.name for f in model._meta.get_fields() if DictUpdateMixin.is_simple_editable_field(f)
+    )
+
+
 class DictUpdateMixin:
-    def is_simple_editable_field(self, field):
+    @staticmethod
+    def is_simple_editable_field(field):
         return (
             field.editable
             and not field.primary_key
             and not isinstance(field, (ForeignObjectRel, RelatedField))
         )
 
-    def update_from_dict(self, attrs, excluded_field_names=[], commit=True):
+    def update_from_dict(self, attrs, excluded_field_names=(), commit=True):
         """
         Update method for Django model
         :param attrs: The dict containing the field and values to be updaed
         :param excluded_field_names: A list of field names to exclude from being updates
-        :param commit: Boolean. Do you want to save the values?
-        :return: void
+        :param commit: Boolean. Save the changed fields; nothing is written if none changed
+        :return: The names of the fields that differ from the database
         """
-        allowed_field_names = [
-            f.name for f in self._meta.get_fields() if self.is_simple_editable_field(f)
-        ]
-
-        set1 = set(allowed_field_names)
-        set2 = set(excluded_field_names)
-        allowed_field_names = list(set1 - set2)
+        allowed_field_names = editable_field_names(type(self)).difference(excluded_field_names)
 
         for attr, val in attrs.items():
             if attr in allowed_field_names:
                 setattr(self, attr, val)
 
+        changed = self.get_dirty_fields()
+        if commit:
+            self.save_dirty()
+        return changed
+
+
+class BaseModelQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if objs:
+            rows_updated.send(sender=self.model)
+        return objs
+
+    def archive(self):
+        """
+        Archive every live row in the queryset with a single UPDATE
+        :return: The number of rows archived
+        """
+        now = timezone.now()
+        archived = self.filter(archived__isnull=True).update(archived=now, last_modified=now)
+        if archived:
+            rows_updated.send(sender=self.model)
+        return archived
+
+    def update_from_dicts(self, rows, excluded_field_names=(), batch_size=500):
+        """
+        Bulk version of update_from_dict. Rows are loaded and written back batch by batch,
+        one SELECT and one bulk UPDATE each; unchanged rows are skipped, and only the fields
+        changed somewhere in the batch are written.
+        :param rows: Iterable of dicts, each holding the primary key under the pk field name
+        :param excluded_field_names: A list of field names to exclude from being updates
+        :param batch_size: Rows per batch
+        :return: The number of rows updated
+        """
+        pk_field = self.model._meta.pk
+        allowed_field_names = editable_field_names(self.model).difference(excluded_field_names)
+        rows = list(rows)
+        updated = 0
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start : start + batch_size]
+            instances = self.in_bulk([pk_field.to_python(row[pk_field.name]) for row in batch])
+            now = timezone.now()
+            changed_instances, changed_fields = [], set()
+            for row in batch:
+                instance = instances.get(pk_field.to_python(row[pk_field.name]))
+                if instance is None:
+                    continue
+                for attr, val in row.items():
+                    if attr in allowed_field_names:
+                        setattr(instance, attr, val)
+                dirty = instance.get_dirty_fields()
+                if dirty:
+                    instance.last_modified = now
+                    changed_instances.append(instance)
+                    changed_fields.update(dirty)
+            if changed_instances:
+                updated += self.bulk_update(changed_instances, [*changed_fields, "last_modified"])
+                for instance in changed_instances:
+                    instance._snapshot_loaded_values()
+        if updated:
+            rows_updated.send(sender=self.model)
+        return updated
+
 
-class BaseModelManager(models.Manager):
+class BaseModelManager(models.Manager.from_queryset(BaseModelQuerySet)):
     def get_queryset(self):
-        return (
-            super(BaseModelManager, self)
-            .get_queryset()
-            .filter(archived__isnull=True)
-            .filter(archived=None)
-        )
+        return super(BaseModelManager, self).get_queryset().filter(archived__isnull=True)
 
 
 class BaseModel(models.Model, DictUpdateMixin):
@@ -48,12 +117,80 @@ class BaseModel(models.Model, DictUpdateMixin):
     date_created = models.DateTimeField(auto_now_add=True)
 
     objects = BaseModelManager()
-    super_objects = models.Manager()
+    super_objects = BaseModelQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(BaseModel, cls).from_db(db, field_names, values)
+        instance._snapshot_loaded_values()
+        return instance
+
+    def _snapshot_loaded_values(self, field_names=None):
+        # Values as last read from or written to the database, for get_dirty_fields
+        loaded = self.__dict__.setdefault("_loaded_values", {})
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            if field_names is not None and field.name not in field_names and field.attname not in field_names:
+                continue
+            value = self.__dict__[field.attname]
+            # Copy containers so in-place changes (e.g. appending to a list) still show up as dirty
+            loaded[field.attname] = value.copy() if isinstance(value, (list, dict, set)) else value
+
+    def get_dirty_fields(self):
+        """
+        Names of the fields whose values differ from the database. Every field of an
+        unsaved instance is dirty; deferred fields that were never loaded are not.
+        """
+        loaded = self.__dict__.get("_loaded_values")
+        fields = [f for f in self._meta.concrete_fields if not f.primary_key]
+        if self._state.adding or loaded is None:
+            return [f.name for f in fields]
+        return [
+            f.name
+            for f in fields
+            if f.attname in self.__dict__
+            and (f.attname not in loaded or loaded[f.attname] != self.__dict__[f.attname])
+        ]
+
+    def save_dirty(self, using=None):
+        """
+        Save only the fields that changed since the instance was loaded, plus last_modified
+        :return: Whether anything was written
+        """
+        if self._state.adding:
+            self.save(using=using)
+            return True
+        changed = self.get_dirty_fields()
+        if not changed:
+            return False
+        self.save(using=using, update_fields=[*changed, "last_modified"])
+        return True
+
+    def save(self, *args, **kwargs):
+        super(BaseModel, self).save(*args, **kwargs)
+        self._snapshot_loaded_values(kwargs.get("update_fields"))
 
     def archive(self, using=None, keep_parents=False):
         self.archived = timezone.now()
-        super(BaseModel, self).save(using=using)
+        self.save(using=using, update_fields=["archived", "last_modified"])
 
     class Meta:
         abstract = True
-        ordering = ["-last_modified"]
+        # The id makes the order total, which keyset pagination relies on
+        ordering = ["-last_modified", "-id"]
+        # Subclasses declaring their own indexes must keep this one: *BaseModel.Meta.indexes
+        indexes = [
+            # Live rows in default order; archived rows never enter it, so it stays small
+            models.Index(
+                fields=["-last_modified", "-id"],
+                condition=Q(archived__isnull=True),
+                name="%(class)s_live_idx",
+            ),
+            # Only archived rows, for the retention job
+            models.Index(
+                fields=["archived"],
+                condition=Q(archived__isnull=False),
+                name="%(class)s_archived_idx",
+            ),
+        ]
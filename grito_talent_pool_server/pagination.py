@@ -0,0 +1,171 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, _reverse_ordering
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def approximate_count(queryset):
+    """
+    Row count estimated by the PostgreSQL planner from table statistics, without scanning.
+    Other backends have no such estimate and get an exact count.
+    """
+    if connections[queryset.db].vendor != "postgresql":
+        return queryset.count()
+    plan = json.loads(queryset.order_by().explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination on the full sort key.
+    Rows are ordered by the view's `ordering` or else the model's Meta.ordering (for
+    BaseModel: -last_modified, -id), with the primary key appended when missing so the key
+    is unique. A cursor holds the key of the row it continues from, and each page is one
+    range scan on the matching index, as fast at page 10,000 as at page 1. There is no
+    total count unless the client asks for one with ?count=1, and that is a planner
+    estimate.
+    """
+
+    page_size_query_param = "page_size"
+    max_page_size = settings.MAX_PAGE_SIZE
+    count_query_param = "count"
+    count_query_description = "Set to 1 to include an approximate total count."
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, "ordering", None) or queryset.model._meta.ordering or ("-pk",)
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        names = [name.lstrip("-") for name in ordering]
+        if "pk" not in names and queryset.model._meta.pk.name not in names:
+            ordering = (*ordering, "-pk" if ordering[-1].startswith("-") else "pk")
+        return tuple(ordering)
+
+    def get_field(self, name):
+        opts = self.model._meta
+        return opts.pk if name == "pk" else opts.get_field(name)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ("1", "true"):
+            self.count = approximate_count(queryset)
+
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor is not None else None
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(ordering, position))
+
+        results = list(queryset[: self.page_size + 1])
+        self.page = results[: self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    @staticmethod
+    def get_keyset_filter(ordering, position):
+        """
+        Rows strictly after `position` in `ordering`. The redundant bound on the first key
+        lets the database turn the expanded tuple comparison into an index range.
+        """
+        after = Q()
+        equal = {}
+        for order, value in zip(ordering, position):
+            name = order.lstrip("-")
+            lookup = "lt" if order.startswith("-") else "gt"
+            after |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+        first = ordering[0]
+        bound = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": position[0]})
+        return bound & after
+
+    def get_position(self, instance):
+        position = []
+        for order in self.ordering:
+            name = order.lstrip("-")
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            position.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        return position
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            tokens = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            values = tokens["p"]
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = tuple(
+                self.get_field(order.lstrip("-")).to_python(value)
+                for order, value in zip(self.ordering, values)
+            )
+            return Cursor(offset=0, reverse=bool(tokens.get("r")), position=position)
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, cursor):
+        tokens = {"p": cursor.position}
+        if cursor.reverse:
+            tokens["r"] = 1
+        encoded = urlsafe_b64encode(json.dumps(tokens, separators=(",", ":")).encode()).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Paged backwards past the first row: start over
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.get_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.get_position(self.page[0])))
+
+    def get_paginated_response(self, data):
+        body = {"next": self.get_next_link(), "previous": self.get_previous_link()}
+        if self.count is not None:
+            body["count"] = self.count
+        body["results"] = data
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["count"] = {"type": "integer", "example": 123}
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            *super().get_schema_operation_parameters(view),
+            {
+                "name": self.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": self.count_query_description,
+                "schema": {"type": "integer", "enum": [0, 1]},
+            },
+        ]
@@ -0,0 +1,81 @@
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .models import BaseModel
+
+
+def archivable_models():
+    return [model for model in apps.get_models() if issubclass(model, BaseModel)]
+
+
+def cold_table_name(model):
+    return f"{model._meta.db_table}_archive"
+
+
+def ensure_cold_table(model, using=DEFAULT_DB_ALIAS):
+    """
+    Create the model's cold table if missing, with the live table's columns and none of
+    its indexes or constraints. Fields added to the model since are added to an existing
+    cold table as nullable columns; columns the model dropped are kept for older rows.
+    """
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    cold_table = cold_table_name(model)
+    with connection.cursor() as cursor:
+        if cold_table not in connection.introspection.table_names(cursor):
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {quote_name(cold_table)} AS "
+                f"SELECT * FROM {quote_name(model._meta.db_table)} WHERE 1 = 0"
+            )
+            return
+        columns = {column.name for column in connection.introspection.get_table_description(cursor, cold_table)}
+        for field in model._meta.concrete_fields:
+            if field.column not in columns:
+                cursor.execute(
+                    f"ALTER TABLE {quote_name(cold_table)} "
+                    f"ADD COLUMN {quote_name(field.column)} {field.db_type(connection)}"
+                )
+
+
+def move_archived(model, archived_before, batch_size=1000, using=DEFAULT_DB_ALIAS):
+    """
+    Move rows archived before a cutoff from the model's table into its cold table.
+    Each batch is copied and deleted in its own transaction, so locks stay short and an
+    interrupted run loses nothing. Rows are deleted with plain SQL: no signals are sent
+    and nothing cascades, so a row still referenced by a foreign key fails its batch.
+    :param model: A BaseModel subclass
+    :param archived_before: Datetime cutoff
+    :param batch_size: Rows per transaction
+    :return: The number of rows moved
+    """
+    ensure_cold_table(model, using)
+    quote_name = connections[using].ops.quote_name
+    live_table = quote_name(model._meta.db_table)
+    cold_table = quote_name(cold_table_name(model))
+    columns = ", ".join(quote_name(field.column) for field in model._meta.concrete_fields)
+    pk_column = quote_name(model._meta.pk.column)
+
+    moved = 0
+    while True:
+        with transaction.atomic(using=using):
+            ids = list(
+                model.super_objects.using(using)
+                .select_for_update(skip_locked=True)
+                .filter(archived__lt=archived_before)
+                .order_by("archived")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            placeholders = ", ".join(["%s"] * len(ids))
+            with connections[using].cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {cold_table} ({columns}) "
+                    f"SELECT {columns} FROM {live_table} WHERE {pk_column} IN ({placeholders})",
+                    ids,
+                )
+                cursor.execute(f"DELETE FROM {live_table} WHERE {pk_column} IN ({placeholders})", ids)
+        moved += len(ids)
+        if len(ids) < batch_size:
+            break
+    return moved
@@ -0,0 +1,132 @@
+import functools
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import drf_spectacular
+from django.apps import apps
+from django.conf import settings
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+
+logger = logging.getLogger(__name__)
+
+# format -> renderer producing that format's document
+RENDERERS = {"yaml": OpenApiYamlRenderer(), "json": OpenApiJsonRenderer()}
+
+
+@functools.cache
+def schema_version():
+    """
+    Identifies the code a schema is generated from: CODE_VERSION when the deploy sets it
+    (e.g. the commit hash), else a hash of the project's source files. The drf-spectacular
+    version and settings are mixed in, since they change the schema too.
+    """
+    digest = hashlib.sha1()
+    if settings.CODE_VERSION:
+        digest.update(settings.CODE_VERSION.encode())
+    else:
+        base_dir = Path(settings.BASE_DIR).resolve()
+        for app in apps.get_app_configs():
+            app_path = Path(app.path).resolve()
+            if not app_path.is_relative_to(base_dir):
+                continue
+            for path in sorted(app_path.rglob("*.py")):
+                digest.update(str(path.relative_to(base_dir)).encode())
+                digest.update(path.read_bytes())
+    digest.update(drf_spectacular.__version__.encode())
+    digest.update(json.dumps(settings.SPECTACULAR_SETTINGS, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:16]
+
+
+def generate_schema():
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    return generator.get_schema(request=None, public=True)
+
+
+class SchemaDocument:
+    def __init__(self, version, file_format, content, gzip_content=None):
+        self.version = version
+        self.format = file_format
+        self.content = content
+        self.gzip_content = gzip_content if gzip_content is not None else gzip.compress(content, mtime=0)
+        self.etag = f'"{version}-{file_format}"'
+        self.gzip_etag = f'"{version}-{file_format}-gzip"'
+
+
+class SchemaCache:
+    """
+    The rendered OpenAPI schema, generated at most once per schema_version().
+    Documents are kept in memory and written to `directory`, so other workers and later
+    processes running the same code load them instead of generating again. The
+    generate_schema command fills the directory at deploy time.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._documents = {}
+        self._lock = threading.Lock()
+
+    def path(self, version, file_format):
+        return os.path.join(self.directory, f"openapi-{version}.{file_format}")
+
+    def get(self, file_format):
+        version = schema_version()
+        document = self._documents.get((version, file_format))
+        if document is None:
+            with self._lock:
+                document = self._documents.get((version, file_format))
+                if document is None:
+                    documents = self._load(version) or self.generate(version)
+                    self._documents = {(version, d.format): d for d in documents}
+                    document = self._documents[(version, file_format)]
+        return document
+
+    def _load(self, version):
+        documents = []
+        try:
+            for file_format in RENDERERS:
+                path = self.path(version, file_format)
+                with open(path, "rb") as content, open(f"{path}.gz", "rb") as gzip_content:
+                    documents.append(SchemaDocument(version, file_format, content.read(), gzip_content.read()))
+        except FileNotFoundError:
+            return None
+        return documents
+
+    def generate(self, version=None):
+        """Generate and store the documents of every format, replacing those of other versions on disk"""
+        version = version or schema_version()
+        schema = generate_schema()
+        documents = [
+            SchemaDocument(version, file_format, renderer.render(schema, renderer.media_type))
+            for file_format, renderer in RENDERERS.items()
+        ]
+        try:
+            self._store(documents)
+        except OSError:
+            logger.warning("OpenAPI schema not written to %s; it stays in memory only", self.directory, exc_info=True)
+        return documents
+
+    def _store(self, documents):
+        os.makedirs(self.directory, exist_ok=True)
+        for document in documents:
+            path = self.path(document.version, document.format)
+            for target, content in ((path, document.content), (f"{path}.gz", document.gzip_content)):
+                # Written aside and renamed, so a worker never reads a partial file
+                fd, temporary = tempfile.mkstemp(dir=self.directory, prefix=".openapi-")
+                with os.fdopen(fd, "wb") as file:
+                    file.write(content)
+                os.replace(temporary, target)
+
+        current = {os.path.basename(self.path(documents[0].version, file_format)) for file_format in RENDERERS}
+        for name in os.listdir(self.directory):
+            if name.startswith("openapi-") and name.removesuffix(".gz") not in current:
+                os.unlink(os.path.join(self.directory, name))
+
+
+schema_cache = SchemaCache(settings.SCHEMA_CACHE_DIR)
@@ -1,5 +1,7 @@
 
 import datetime
+import os
+import sys
 from pathlib import Path
 from decouple import config
 # from dotenv import load_dotenv
@@ -11,6 +13,8 @@ SECRET_KEY = config("SECRET_KEY")
 
 DEBUG = True
 
+TESTING = len(sys.argv) > 1 and sys.argv[1] == "test"
+
 ALLOWED_HOSTS = ["*"]
 
 # CORS_ORIGIN_WHITELIST = [
@@ -40,17 +44,63 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 
+DB_POOL = config("DB_POOL", default=True, cast=bool)
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql_psycopg2",
+        # With pooling on, closing the connection at the end of a request returns it to the pool
+        "ENGINE": config(
+            "DB_ENGINE",
+            default=(
+                "grito_talent_pool_server.db.backends.postgresql_pool"
+                if DB_POOL
+                else "django.db.backends.postgresql"
+            ),
+        ),
         "NAME": config("DB_NAME"),
         "USER": config("DB_USER"),
         "PASSWORD": config("DB_PASSWORD"),
         "HOST": config("DB_HOST"),
-        "PORT": config("DB_PORT")
+        "PORT": config("DB_PORT"),
+        "CONN_MAX_AGE": 0 if DB_POOL else config("DB_CONN_MAX_AGE", default=60, cast=int),
+        "CONN_HEALTH_CHECKS": True,
+        "POOL": {
+            "min_size": config("DB_POOL_MIN_SIZE", default=1, cast=int),
+            "max_size": config("DB_POOL_MAX_SIZE", default=10, cast=int),
+            "timeout": config("DB_POOL_TIMEOUT", default=5.0, cast=float),
+            "max_idle": config("DB_POOL_MAX_IDLE", default=300.0, cast=float),
+            "check_after": config("DB_POOL_CHECK_AFTER", default=30.0, cast=float),
+        },
     }
 }
 
+# Optional read replica. Reads are routed to it only for safe requests (see ReplicaRoutingMiddleware)
+if config("DB_REPLICA_HOST", default="") or config("DB_REPLICA_NAME", default=""):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": config("DB_REPLICA_NAME", default=DATABASES["default"]["NAME"]),
+        "HOST": config("DB_REPLICA_HOST", default=DATABASES["default"]["HOST"]),
+        "PORT": config("DB_REPLICA_PORT", default=DATABASES["default"]["PORT"]),
+        "POOL": {**DATABASES["default"]["POOL"]},
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["grito_talent_pool_server.db.routers.PrimaryReplicaRouter"]
+REPLICA_LAG_WINDOW = config("REPLICA_LAG_WINDOW", default=5, cast=int)
+
+CACHES = {
+    "default": {
+        "BACKEND": config("CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("CACHE_LOCATION", default=""),
+    }
+}
+# Worker processes serving the app, as gunicorn reads it; more than one needs a shared cache
+WEB_CONCURRENCY = config("WEB_CONCURRENCY", default=1, cast=int)
+
+USER_CACHE_SIZE = config("USER_CACHE_SIZE", default=1024, cast=int)
+USER_CACHE_TIMEOUT = config("USER_CACHE_TIMEOUT", default=300, cast=int)
+
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -64,16 +114,21 @@ INSTALLED_APPS = [
     "rest_framework",
 
     "corsheaders",
+    "grito_talent_pool_server",
     "authentication",
+    "talents",
 ]
 
 MIDDLEWARE = [
+    "grito_talent_pool_server.metrics.MetricsMiddleware",
+    "grito_talent_pool_server.db.inspection.QueryInspectionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
+    "grito_talent_pool_server.db.routers.ReplicaRoutingMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
@@ -101,22 +156,42 @@ WSGI_APPLICATION = 'grito_talent_pool_server.wsgi.application'
 
 AUTH_USER_MODEL = "authentication.user"
 
+AUTHENTICATION_BACKENDS = ["authentication.backends.PooledModelBackend"]
+
+PASSWORD_HASHERS = [
+    "authentication.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+PASSWORD_HASH_ITERATIONS = config("PASSWORD_HASH_ITERATIONS", default=720000, cast=int)
+PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", default=os.cpu_count() or 1, cast=int)
+PASSWORD_HASH_QUEUE = config("PASSWORD_HASH_QUEUE", default=(os.cpu_count() or 1) * 4, cast=int)
+
 REST_FRAMEWORK = {
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "grito_talent_pool_server.pagination.KeysetPagination",
     "PAGE_SIZE": 10,
     "NON_FIELD_ERRORS_KEY": "error",
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "authentication.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
+# Largest page a client may ask for with ?page_size=
+MAX_PAGE_SIZE = config("MAX_PAGE_SIZE", default=100, cast=int)
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": datetime.timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": datetime.timedelta(days=2),
     "USER_AUTHENTICATION_RULE": "rest_framework_simplejwt.authentication.default_user_authentication_rule",
 }
 
+JWT_DENYLIST_ENABLED = config("JWT_DENYLIST_ENABLED", default=True, cast=bool)
+JWT_DENYLIST_CAPACITY = config("JWT_DENYLIST_CAPACITY", default=100000, cast=int)
+JWT_DENYLIST_ERROR_RATE = config("JWT_DENYLIST_ERROR_RATE", default=0.001, cast=float)
+JWT_DENYLIST_SYNC_INTERVAL = config("JWT_DENYLIST_SYNC_INTERVAL", default=5, cast=int)
+JWT_DENYLIST_REBUILD_INTERVAL = config("JWT_DENYLIST_REBUILD_INTERVAL", default=3600, cast=int)
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Grito Talent Pool API",
     "DESCRIPTION": "API for Grito Talent Pool",
@@ -124,8 +199,65 @@ SPECTACULAR_SETTINGS = {
     "SERVE_INCLUDE_SCHEMA": False,
 }
 
+# Identifies the deployed code, e.g. the commit hash; when empty it is hashed from the source files
+CODE_VERSION = config("CODE_VERSION", default="")
+# Where the generated OpenAPI schema is kept between processes (see grito_talent_pool_server.schema)
+SCHEMA_CACHE_DIR = config("SCHEMA_CACHE_DIR", default=str(BASE_DIR / "schema-cache"))
+
+# Request, SQL, password hashing and mail provider metrics, served at /metrics in the Prometheus format
+METRICS_ENABLED = config("METRICS_ENABLED", default=True, cast=bool)
+# /metrics requires "Authorization: Bearer <token>", and is not served while this is unset
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+# Traces of the slowest requests kept per process for /metrics/slow-requests; 0 disables them
+METRICS_SLOW_REQUESTS = config("METRICS_SLOW_REQUESTS", default=20, cast=int)
+
+# Slow query log and N+1 detection (see grito_talent_pool_server.db.inspection)
+QUERY_INSPECTION_ENABLED = config("QUERY_INSPECTION_ENABLED", default=True, cast=bool)
+# Seconds after which a query is logged with its plan; 0 disables the log
+SLOW_QUERY_THRESHOLD = config("SLOW_QUERY_THRESHOLD", default=0.2, cast=float)
+# Log slow queries' parameters and the string literals in their plans; both may hold personal data
+SLOW_QUERY_LOG_PARAMS = config("SLOW_QUERY_LOG_PARAMS", default=False, cast=bool)
+# Times one statement may run in a request before it is reported as a likely N+1
+N_PLUS_ONE_THRESHOLD = config("N_PLUS_ONE_THRESHOLD", default=10, cast=int)
+# Raise instead of logging when a request runs more queries than its view's query_budget
+QUERY_BUDGET_RAISE = config("QUERY_BUDGET_RAISE", default=TESTING, cast=bool)
+
 PASSWORD_RESET_TIMEOUT = 1800
 OTP_TIMEOUT = 1800
+OTP_CACHE_SIZE = config("OTP_CACHE_SIZE", default=4096, cast=int)
+OTP_RESEND_COOLDOWN = config("OTP_RESEND_COOLDOWN", default=30, cast=int)
+
+OUTBOX_MAX_ATTEMPTS = config("OUTBOX_MAX_ATTEMPTS", default=5, cast=int)
+OUTBOX_RETRY_DELAY = config("OUTBOX_RETRY_DELAY", default=10, cast=int)
+OUTBOX_SENDING_LEASE = config("OUTBOX_SENDING_LEASE", default=300, cast=int)
+
+TALENT_MATCHER_PRELOAD = config("TALENT_MATCHER_PRELOAD", default=True, cast=bool)
+TALENT_MATCHER_SYNC_INTERVAL = config("TALENT_MATCHER_SYNC_INTERVAL", default=5, cast=int)
+TALENT_MATCH_LIMIT = config("TALENT_MATCH_LIMIT", default=10, cast=int)
+TALENT_LISTING_CACHE_TIMEOUT = config("TALENT_LISTING_CACHE_TIMEOUT", default=3600, cast=int)
+# Seconds a request waits for another process to build the same listing page
+TALENT_LISTING_CACHE_WAIT = config("TALENT_LISTING_CACHE_WAIT", default=2.0, cast=float)
+
+# Rows fetched per server-side cursor round trip, and per streamed chunk, by exports
+EXPORT_CHUNK_SIZE = config("EXPORT_CHUNK_SIZE", default=2000, cast=int)
+
+# Rows validated and inserted per transaction by talent imports
+TALENT_IMPORT_BATCH_SIZE = config("TALENT_IMPORT_BATCH_SIZE", default=1000, cast=int)
+# Row errors listed in an import report; the rest are only counted
+TALENT_IMPORT_MAX_ERRORS = config("TALENT_IMPORT_MAX_ERRORS", default=1000, cast=int)
+
+# "cloudinary" (configured from CLOUDINARY_URL), "local" (files in MEDIA_ROOT) or "stub"
+IMAGE_STORAGE = config("IMAGE_STORAGE", default="cloudinary")
+# Threads that upload images and generate their variants in the background
+IMAGE_UPLOAD_WORKERS = config("IMAGE_UPLOAD_WORKERS", default=4, cast=int)
+IMAGE_UPLOAD_QUEUE = config("IMAGE_UPLOAD_QUEUE", default=1000, cast=int)
+IMAGE_UPLOAD_MAX_SIZE = config("IMAGE_UPLOAD_MAX_SIZE", default=10 * 2**20, cast=int)
+# Where zips of imported images are kept until their images are uploaded. Uploads a restart
+# interrupts are resumed from there, so it should outlive a restart; empty is the system temp directory
+IMAGE_IMPORT_DIR = config("IMAGE_IMPORT_DIR", default="")
+
+# Days an archived row stays in its live table before move_archived takes it to the cold table
+ARCHIVE_RETENTION_DAYS = config("ARCHIVE_RETENTION_DAYS", default=90, cast=int)
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -154,4 +286,7 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+MEDIA_URL = config("MEDIA_URL", default="/media/")
+MEDIA_ROOT = config("MEDIA_ROOT", default=str(BASE_DIR / "media"))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -0,0 +1,335 @@
+import glob
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cloudinary.exceptions
+import cloudinary.uploader
+import cloudinary.utils
+from decouple import config
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from PIL import Image, ImageOps
+
+
+class StorageError(Exception):
+    pass
+
+
+class ImageStorage:
+    def open_stream(self, name, content_type=None):
+        """
+        Start storing an image whose bytes arrive in pieces.
+        :param name: Name of the image within the storage folder, without extension; an image
+            already stored under it is replaced
+        :return: A writer with write(bytes), close() -> (key, url) and abort()
+        """
+        raise NotImplementedError
+
+    def upload(self, file, name, content_type=None):
+        """
+        Store a binary file object, read from its current position in bounded chunks
+        :return: (key, url) of the stored image
+        """
+        stream = self.open_stream(name, content_type)
+        try:
+            while chunk := file.read(1 << 16):
+                stream.write(chunk)
+        except BaseException:
+            stream.abort()
+            raise
+        return stream.close()
+
+    def create_variants(self, key, variants):
+        """
+        Store resized copies of an image
+        :param variants: Dict of variant name -> {"width", "height", "crop"}; crop is "fill"
+            (cover the box, cropping the overflow) or "limit" (fit within the box, never upscaled)
+        :return: Dict of variant name -> url
+        """
+        raise NotImplementedError
+
+    def key_for_url(self, url):
+        """Key of the image stored here under `url`, or None for an image stored elsewhere"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Delete a stored image and its variants"""
+        raise NotImplementedError
+
+
+def key_under(url, base_url, folder):
+    """Key of a URL under `base_url` whose key is in `folder`, or None"""
+    if not url or not url.startswith(base_url):
+        return None
+    key = url[len(base_url) :]
+    return key if key.startswith(f"{folder}/") else None
+
+
+class CloudinaryStream:
+    """
+    Chunked upload to Cloudinary of an image whose size is not known in advance.
+    At most `chunk_size` bytes are held at a time. Every part but the last goes out with
+    an open-ended Content-Range, so a part is held back until more data, or close(), shows
+    whether it is the last.
+    """
+
+    def __init__(self, public_id, chunk_size):
+        self.chunk_size = chunk_size
+        self._options = {"public_id": public_id, "overwrite": True, "resource_type": "image"}
+        self._upload_id = cloudinary.utils.random_public_id()
+        self._buffer = bytearray()
+        self._sent = 0
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) > self.chunk_size:
+            self._send(bytes(self._buffer[: self.chunk_size]), total="-1")
+            del self._buffer[: self.chunk_size]
+
+    def close(self):
+        result = self._send(bytes(self._buffer), total=self._sent + len(self._buffer))
+        self._buffer = bytearray()
+        return result["public_id"], result["secure_url"]
+
+    def abort(self):
+        # Cloudinary discards chunked uploads that are never completed
+        self._buffer = bytearray()
+
+    def _send(self, chunk, total):
+        headers = {
+            "Content-Range": f"bytes {self._sent}-{self._sent + len(chunk) - 1}/{total}",
+            "X-Unique-Upload-Id": self._upload_id,
+        }
+        try:
+            result = cloudinary.uploader.upload_large_part(("image", chunk), http_headers=headers, **self._options)
+        except cloudinary.exceptions.Error as e:
+            raise StorageError(str(e)) from e
+        self._sent += len(chunk)
+        return result
+
+
+class CloudinaryStorage(ImageStorage):
+    """Images on Cloudinary, with credentials taken from CLOUDINARY_URL. Variants are eager transformations"""
+
+    # Cloudinary takes chunks of 5 MB or more
+    CHUNK_SIZE = 6 * 2**20
+    # Delivery URL of an upload, as returned by it: .../image/upload/v<version>/<public id>.<format>
+    URL = re.compile(r"^https://res\.cloudinary\.com/[^/]+/image/upload/(?:v\d+/)?(?P<key>.+?)(?:\.\w+)?$")
+
+    def __init__(self, folder="talents"):
+        self.folder = folder
+
+    def open_stream(self, name, content_type=None):
+        return CloudinaryStream(f"{self.folder}/{name}", self.CHUNK_SIZE)
+
+    def create_variants(self, key, variants):
+        try:
+            result = cloudinary.uploader.explicit(
+                key, type="upload", resource_type="image", eager=list(variants.values())
+            )
+        except cloudinary.exceptions.Error as e:
+            raise StorageError(str(e)) from e
+        return {name: eager["secure_url"] for name, eager in zip(variants, result["eager"])}
+
+    def key_for_url(self, url):
+        match = self.URL.match(url or "")
+        if match is None or not match["key"].startswith(f"{self.folder}/"):
+            return None
+        return match["key"]
+
+    def delete(self, key):
+        # Derived images, the eager variants among them, go with the original
+        try:
+            cloudinary.uploader.destroy(key, resource_type="image", invalidate=True)
+        except cloudinary.exceptions.Error as e:
+            raise StorageError(str(e)) from e
+
+
+class LocalStream:
+    def __init__(self, path, key, url):
+        self.key = key
+        self.url = url
+        self._path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(f"{path}.part", "wb")
+
+    def write(self, data):
+        self._file.write(data)
+
+    def close(self):
+        self._file.close()
+        os.replace(f"{self._path}.part", self._path)
+        return self.key, self.url
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.unlink(f"{self._path}.part")
+        except FileNotFoundError:
+            pass
+
+
+class LocalStorage(ImageStorage):
+    """
+    Images in a directory served under `base_url` (MEDIA_ROOT and MEDIA_URL), standing in
+    for Cloudinary in development. Variants are resized with Pillow.
+    """
+
+    EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/gif": ".gif", "image/webp": ".webp"}
+
+    def __init__(self, root, base_url, folder="talents"):
+        self.root = root
+        self.base_url = base_url
+        self.folder = folder
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def url(self, key):
+        return f"{self.base_url.rstrip('/')}/{key}"
+
+    def open_stream(self, name, content_type=None):
+        key = f"{self.folder}/{name}{self.EXTENSIONS.get(content_type, '')}"
+        return LocalStream(self.path(key), key, self.url(key))
+
+    def create_variants(self, key, variants):
+        stem, extension = os.path.splitext(key)
+        urls = {}
+        with Image.open(self.path(key)) as image:
+            for name, spec in variants.items():
+                size = (spec["width"], spec["height"])
+                if spec["crop"] == "fill":
+                    variant = ImageOps.fit(image, size)
+                else:
+                    variant = image.copy()
+                    variant.thumbnail(size)
+                variant_key = f"{stem}-{name}{extension}"
+                variant.save(self.path(variant_key), format=image.format)
+                urls[name] = self.url(variant_key)
+        return urls
+
+    def key_for_url(self, url):
+        return key_under(url, f"{self.base_url.rstrip('/')}/", self.folder)
+
+    def delete(self, key):
+        stem, extension = os.path.splitext(self.path(key))
+        for path in [self.path(key), *glob.glob(f"{glob.escape(stem)}-*{glob.escape(extension)}")]:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+
+class StubStream:
+    def __init__(self, key, url):
+        self.key = key
+        self.url = url
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+
+    def close(self):
+        return self.key, self.url
+
+    def abort(self):
+        pass
+
+
+class StubStorage(ImageStorage):
+    """
+    Counts the bytes it is sent and keeps none of them, returning made-up URLs after
+    `latency` seconds. For benchmarks and tests without a storage account.
+    """
+
+    def __init__(self, base_url="https://images.invalid", folder="talents", latency=0.0):
+        self.base_url = base_url
+        self.folder = folder
+        self.latency = latency
+
+    def open_stream(self, name, content_type=None):
+        if self.latency:
+            time.sleep(self.latency)
+        key = f"{self.folder}/{name}"
+        return StubStream(key, f"{self.base_url}/{key}")
+
+    def create_variants(self, key, variants):
+        if self.latency:
+            time.sleep(self.latency)
+        return {name: f"{self.base_url}/{key}-{name}" for name in variants}
+
+    def key_for_url(self, url):
+        return key_under(url, f"{self.base_url}/", self.folder)
+
+    def delete(self, key):
+        pass
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_image_storage():
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                folder = config("IMAGE_STORAGE_FOLDER", default="talents")
+                if settings.IMAGE_STORAGE == "cloudinary":
+                    _storage = CloudinaryStorage(folder=folder)
+                elif settings.IMAGE_STORAGE == "local":
+                    _storage = LocalStorage(settings.MEDIA_ROOT, settings.MEDIA_URL, folder=folder)
+                elif settings.IMAGE_STORAGE == "stub":
+                    _storage = StubStorage(
+                        folder=folder, latency=config("IMAGE_STORAGE_STUB_LATENCY", default=0.0, cast=float)
+                    )
+                else:
+                    raise ImproperlyConfigured(f"Unknown IMAGE_STORAGE {settings.IMAGE_STORAGE}")
+    return _storage
+
+
+class UploadQueue:
+    """
+    Background threads for image uploads and processing a request should not wait for.
+    At most `max_workers + max_pending` jobs are accepted at once; beyond that submit()
+    blocks, so a producer slows down to the pace of the storage backend instead of
+    queueing without bound.
+    """
+
+    def __init__(self, max_workers, max_pending):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-upload")
+        self._capacity = max_workers + max_pending
+        self._slots = threading.BoundedSemaphore(self._capacity)
+
+    def submit(self, fn, *args):
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def join(self):
+        """Wait until every job submitted so far has finished"""
+        for _ in range(self._capacity):
+            self._slots.acquire()
+        for _ in range(self._capacity):
+            self._slots.release()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_upload_queue():
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = UploadQueue(settings.IMAGE_UPLOAD_WORKERS, settings.IMAGE_UPLOAD_QUEUE)
+    return _queue
@@ -0,0 +1,918 @@
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.test import (
+    Client,
+    LiveServerTestCase,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import ResolverMatch, reverse
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from PIL import Image
+from rest_framework.test import APIClient, APIRequestFactory
+
+from authentication.denylist import BloomFilter, TokenDenylist
+from authentication.groups import SUPER_ADMIN, clear_group_cache
+from authentication.models import OutboxEmail, RevokedToken, User
+from authentication.tokens import tokens_for_user
+from . import metrics, schema, storage, views
+from .db import pool as db_pool
+from .db.inspection import QueryBudgetExceeded, QueryInspectionMiddleware, normalize_sql
+from .db.routers import PIN_COOKIE, PrimaryReplicaRouter, ReplicaRoutingMiddleware, replica_reads
+from .pagination import KeysetPagination
+from .images import VARIANTS
+from .loadtest import LoadTestError, Recorder, activate_user, run_load
+from .mail import CircuitBreaker, CircuitOpenError, MailError, MailRejected, ZeptoMailClient
+from .mail_stub import ZeptoStubServer
+from .retention import cold_table_name, move_archived
+from .schema import SchemaCache, schema_version
+from .storage import CloudinaryStorage, CloudinaryStream, LocalStorage, get_upload_queue
+
+# A second SQLite file standing in for a replica in ReplicaRoutingDatabaseTests. It is
+# registered on import, so the test runner creates and migrates it like any other alias.
+REPLICA_ALIAS = "routing_replica"
+_replica_directory = tempfile.TemporaryDirectory()
+connections.settings[REPLICA_ALIAS] = connections.configure_settings(
+    {
+        "default": connections.settings["default"],
+        REPLICA_ALIAS: {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.path.join(_replica_directory.name, "replica.sqlite3"),
+            "TEST": {"NAME": os.path.join(_replica_directory.name, "test_replica.sqlite3")},
+        },
+    }
+)[REPLICA_ALIAS]
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], REPLICA_LAG_WINDOW=5)
+class PrimaryReplicaRouterTests(TransactionTestCase):
+    # Not TestCase: its wrapping transaction would keep every read on the primary
+    router = PrimaryReplicaRouter()
+
+    def run_request(self, request, view):
+        return ReplicaRoutingMiddleware(view)(request)
+
+    def test_reads_outside_a_request_use_the_primary(self):
+        self.assertEqual(self.router.db_for_read(User), "default")
+
+    def test_safe_request_reads_from_the_replica(self):
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(User))
+            return HttpResponse()
+
+        response = self.run_request(RequestFactory().get("/talents"), view)
+        self.assertEqual(seen, ["replica"])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_reads_after_a_write_stay_on_the_primary(self):
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(User))
+            self.router.db_for_write(User)
+            seen.append(self.router.db_for_read(User))
+            return HttpResponse()
+
+        response = self.run_request(RequestFactory().get("/talents"), view)
+        self.assertEqual(seen, ["replica", "default"])
+        self.assertEqual(response.cookies[PIN_COOKIE]["max-age"], 5)
+
+    def test_pinned_client_reads_from_the_primary(self):
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(User))
+            return HttpResponse()
+
+        request = RequestFactory().get("/talents")
+        request.COOKIES[PIN_COOKIE] = "1"
+        self.run_request(request, view)
+        self.run_request(RequestFactory().post("/talents"), view)
+        self.assertEqual(seen, ["default", "default"])
+
+    def test_reads_inside_a_transaction_use_the_primary(self):
+        with replica_reads():
+            with transaction.atomic():
+                self.assertEqual(self.router.db_for_read(User), "default")
+
+    def test_replicas_are_never_migrated(self):
+        self.assertFalse(self.router.allow_migrate("replica", "authentication"))
+        self.assertTrue(self.router.allow_migrate("default", "authentication"))
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA_ALIAS], REPLICA_LAG_WINDOW=5)
+class ReplicaRoutingDatabaseTests(TransactionTestCase):
+    """Routing against a second SQLite database standing in for a lagging replica"""
+
+    databases = {"default", REPLICA_ALIAS}
+
+    def request(self, method, pinned=False):
+        """:return: (response, [(alias, user found)] for each read the view made)"""
+        reads = []
+
+        def view(request):
+            users = User.objects.filter(email="ada@grito.africa")
+            reads.append((users.db, users.exists()))
+            if request.method == "POST":
+                users.update(name="Ada")
+                users = User.objects.filter(email="ada@grito.africa")
+                reads.append((users.db, users.exists()))
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)("/users")
+        if pinned:
+            request.COOKIES[PIN_COOKIE] = "1"
+        return ReplicaRoutingMiddleware(view)(request), reads
+
+    def test_reads_follow_the_pin_window(self):
+        User.objects.create(email="ada@grito.africa", username="ada")
+
+        # The replica has not caught up with the insert yet
+        response, reads = self.request("get")
+        self.assertEqual(reads, [(REPLICA_ALIAS, False)])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        response, reads = self.request("post")
+        self.assertEqual(reads, [("default", True), ("default", True)])
+        self.assertEqual(response.cookies[PIN_COOKIE]["max-age"], 5)
+
+        # Within the window the client sends the cookie back and reads its own write
+        _, reads = self.request("get", pinned=True)
+        self.assertEqual(reads, [("default", True)])
+
+        # Once the cookie has expired, reads go to the replica, which has since caught up
+        User.objects.using(REPLICA_ALIAS).create(email="ada@grito.africa", username="ada")
+        _, reads = self.request("get")
+        self.assertEqual(reads, [(REPLICA_ALIAS, True)])
+
+    def test_denylist_syncs_from_the_primary(self):
+        tokens = TokenDenylist(capacity=100)
+        expires_at = timezone.now() + datetime.timedelta(hours=1)
+        tokens.revoke("rebuilt", expires_at)
+        with replica_reads():
+            tokens.sync(force=True)
+        tokens.revoke("pulled", expires_at)
+        # Another process revoked it; only a pull can bring it into this filter
+        tokens._filter = BloomFilter(100)
+        with replica_reads():
+            tokens.sync(force=True)
+            self.assertTrue(tokens.is_revoked("pulled"))
+        self.assertFalse(RevokedToken.objects.using(REPLICA_ALIAS).exists())
+
+
+class NoReplicaRouterTests(SimpleTestCase):
+    def test_everything_uses_the_primary_without_replicas(self):
+        with replica_reads():
+            self.assertEqual(PrimaryReplicaRouter().db_for_read(User), "default")
+
+
+class SoftDeleteTests(TestCase):
+    def setUp(self):
+        self.emails = [OutboxEmail.objects.create(email=f"user{i}@example.com", name="Ada") for i in range(3)]
+
+    def test_queryset_archive_is_a_single_update(self):
+        with self.assertNumQueries(1):
+            archived = OutboxEmail.objects.filter(pk__in=[e.pk for e in self.emails[:2]]).archive()
+        self.assertEqual(archived, 2)
+        self.assertEqual(list(OutboxEmail.objects.all()), [self.emails[2]])
+        self.assertEqual(OutboxEmail.super_objects.filter(archived__isnull=False).count(), 2)
+
+    def test_archive_keeps_existing_timestamps(self):
+        OutboxEmail.objects.filter(pk=self.emails[0].pk).archive()
+        first = OutboxEmail.super_objects.get(pk=self.emails[0].pk).archived
+        self.assertEqual(OutboxEmail.super_objects.all().archive(), 2)
+        self.assertEqual(OutboxEmail.super_objects.get(pk=self.emails[0].pk).archived, first)
+
+    def test_instance_archive_writes_only_timestamps(self):
+        email = self.emails[0]
+        email.name = "Unsaved"
+        email.archive()
+        email = OutboxEmail.super_objects.get(pk=email.pk)
+        self.assertIsNotNone(email.archived)
+        self.assertEqual(email.name, "Ada")
+
+    def test_move_archived_moves_only_old_rows_in_batches(self):
+        old = timezone.now() - datetime.timedelta(days=100)
+        OutboxEmail.objects.filter(pk__in=[e.pk for e in self.emails[:2]]).update(archived=old)
+        OutboxEmail.objects.filter(pk=self.emails[2].pk).archive()
+
+        moved = move_archived(OutboxEmail, timezone.now() - datetime.timedelta(days=90), batch_size=1)
+
+        self.assertEqual(moved, 2)
+        self.assertEqual(list(OutboxEmail.super_objects.values_list("pk", flat=True)), [self.emails[2].pk])
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT id, email FROM {connection.ops.quote_name(cold_table_name(OutboxEmail))} ORDER BY id")
+            self.assertEqual(cursor.fetchall(), [(e.pk, e.email) for e in self.emails[:2]])
+
+    def test_move_archived_adds_new_fields_to_an_existing_cold_table(self):
+        quote_name = connection.ops.quote_name
+        cold_table = quote_name(cold_table_name(OutboxEmail))
+        with connection.cursor() as cursor:
+            # A cold table created before the model gained its other fields
+            cursor.execute(
+                f"CREATE TABLE {cold_table} AS "
+                f"SELECT id, email FROM {quote_name(OutboxEmail._meta.db_table)} WHERE 1 = 0"
+            )
+        OutboxEmail.objects.filter(pk=self.emails[0].pk).update(archived=timezone.now() - datetime.timedelta(days=100))
+
+        self.assertEqual(move_archived(OutboxEmail, timezone.now() - datetime.timedelta(days=90)), 1)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT id, email, name FROM {cold_table}")
+            self.assertEqual(cursor.fetchall(), [(self.emails[0].pk, self.emails[0].email, "Ada")])
+
+
+class DictUpdateTests(TestCase):
+    def setUp(self):
+        OutboxEmail.objects.bulk_create(
+            [OutboxEmail(email=f"user{i}@example.com", name="Ada") for i in range(3)]
+        )
+        self.email = OutboxEmail.objects.get(email="user0@example.com")
+
+    def test_commit_writes_only_changed_fields(self):
+        with self.assertNumQueries(1) as queries:
+            changed = self.email.update_from_dict({"name": "Grace", "email": self.email.email})
+        self.assertEqual(changed, ["name"])
+        sql = queries.captured_queries[0]["sql"]
+        self.assertIn('"name"', sql)
+        self.assertIn('"last_modified"', sql)
+        self.assertNotIn('"email"', sql)
+        self.assertEqual(OutboxEmail.objects.get(pk=self.email.pk).name, "Grace")
+
+    def test_noop_update_skips_the_save(self):
+        with self.assertNumQueries(0):
+            changed = self.email.update_from_dict({"name": "Ada", "archived": timezone.now(), "id": 99})
+        self.assertEqual(changed, [])
+
+    def test_excluded_fields_are_ignored(self):
+        self.email.update_from_dict({"name": "Grace"}, excluded_field_names=["name"])
+        self.assertEqual(self.email.name, "Ada")
+
+    def test_fields_are_clean_after_save(self):
+        self.email.update_from_dict({"name": "Grace"}, commit=False)
+        self.assertEqual(self.email.get_dirty_fields(), ["name"])
+        self.email.save()
+        self.assertEqual(self.email.get_dirty_fields(), [])
+
+    def test_bulk_update_from_dicts(self):
+        pks = list(OutboxEmail.objects.order_by("pk").values_list("pk", flat=True))
+        rows = [
+            {"id": pks[0], "name": "Grace"},
+            {"id": str(pks[1]), "name": "Ada"},
+            {"id": pks[2], "attempts": 3},
+        ]
+        with self.assertNumQueries(4):
+            # Two batches: SELECT + UPDATE each, the unchanged row is not written
+            updated = OutboxEmail.objects.update_from_dicts(rows, batch_size=2)
+        self.assertEqual(updated, 2)
+        self.assertEqual(
+            list(OutboxEmail.objects.order_by("pk").values_list("name", "attempts")),
+            [("Grace", 0), ("Ada", 0), ("Ada", 3)],
+        )
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        OutboxEmail.objects.bulk_create(
+            [OutboxEmail(email=f"user{i}@example.com", name="Ada") for i in range(25)]
+        )
+        # Ties on last_modified must be broken by id
+        same_time = timezone.now()
+        OutboxEmail.objects.filter(pk__in=OutboxEmail.objects.order_by("pk").values("pk")[5:15]).update(
+            last_modified=same_time
+        )
+        cls.ordered = list(OutboxEmail.objects.order_by("-last_modified", "-id").values_list("pk", flat=True))
+
+    def paginate(self, url):
+        paginator = KeysetPagination()
+        request = Request(APIRequestFactory().get(url))
+        page = paginator.paginate_queryset(OutboxEmail.objects.all(), request)
+        return paginator, [email.pk for email in page]
+
+    def test_walks_every_row_once_in_order(self):
+        seen = []
+        url = "/emails?page_size=4"
+        while url:
+            paginator, page = self.paginate(url)
+            seen.extend(page)
+            url = paginator.get_next_link()
+        self.assertEqual(seen, self.ordered)
+
+    def test_previous_link_returns_the_previous_page(self):
+        paginator, first = self.paginate("/emails?page_size=7")
+        paginator, second = self.paginate(paginator.get_next_link())
+        paginator, back = self.paginate(paginator.get_previous_link())
+        self.assertEqual(back, first)
+        self.assertIsNone(paginator.get_previous_link())
+
+    def test_each_page_is_one_query_without_count(self):
+        paginator, _ = self.paginate("/emails")
+        with self.assertNumQueries(1):
+            self.paginate(paginator.get_next_link())
+
+    def test_page_size_is_capped_and_count_is_opt_in(self):
+        paginator, page = self.paginate(f"/emails?page_size={KeysetPagination.max_page_size + 1}&count=1")
+        self.assertEqual(paginator.page_size, KeysetPagination.max_page_size)
+        self.assertEqual(len(page), 25)
+        self.assertEqual(paginator.get_paginated_response([]).data["count"], 25)
+        paginator, _ = self.paginate("/emails")
+        self.assertNotIn("count", paginator.get_paginated_response([]).data)
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(NotFound):
+            self.paginate("/emails?cursor=bm90IGEgY3Vyc29y")
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create(
+                email=f"user{i}@example.com",
+                username=f"user{i}",
+                name=f"User, {i}",
+                is_active=True,
+                is_verified=True,
+            )
+            for i in range(5)
+        ]
+        cls.ids = sorted(str(user.pk) for user in cls.users)
+
+    def setUp(self):
+        self.client = APIClient()
+        token = tokens_for_user(self.users[0], groups=[SUPER_ADMIN]).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def export(self, file_format, **params):
+        response = self.client.get(reverse("export", args=["users", file_format]), params)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content)
+
+    def test_csv_export_in_id_order(self):
+        rows = list(csv.DictReader(io.StringIO(self.export("csv").decode())))
+        self.assertEqual([row["id"] for row in rows], self.ids)
+        self.assertIn("User, 0", [row["name"] for row in rows])
+
+    def test_csv_cells_are_not_formulas(self):
+        User.objects.filter(pk=self.users[0].pk).update(
+            name='=HYPERLINK("http://evil.example")', phone="+2348000000000"
+        )
+        User.objects.filter(pk=self.users[1].pk).update(name="@SUM(A1:A9)", phone="-1")
+        rows = {row["id"]: row for row in csv.DictReader(io.StringIO(self.export("csv").decode()))}
+        first, second = rows[str(self.users[0].pk)], rows[str(self.users[1].pk)]
+        self.assertEqual(first["name"], """'=HYPERLINK("http://evil.example")""")
+        self.assertEqual(first["phone"], "'+2348000000000")
+        self.assertEqual((second["name"], second["phone"]), ("'@SUM(A1:A9)", "'-1"))
+
+        # NDJSON is not opened by spreadsheets and keeps the values as they are
+        lines = [json.loads(line) for line in self.export("ndjson").decode().splitlines()]
+        self.assertIn("@SUM(A1:A9)", [line["name"] for line in lines])
+
+    def test_ndjson_export_resumes_after_cursor(self):
+        lines = self.export("ndjson", after=self.ids[1]).decode().splitlines()
+        self.assertEqual([json.loads(line)["id"] for line in lines], self.ids[2:])
+
+    def test_gzip(self):
+        content = gzip.decompress(self.export("csv", gzip=1)).decode()
+        self.assertEqual(len(content.splitlines()), 6)
+
+    def test_errors(self):
+        self.assertEqual(self.client.get(reverse("export", args=["users", "xml"])).status_code, 400)
+        self.assertEqual(
+            self.client.get(reverse("export", args=["users", "csv"]), {"after": "not-a-uuid"}).status_code, 400
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {tokens_for_user(self.users[1], groups=[]).access_token}"
+        )
+        self.assertEqual(self.client.get(reverse("export", args=["users", "csv"])).status_code, 403)
+
+
+def png_bytes(size=(640, 480)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "teal").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class ImageStorageTests(SimpleTestCase):
+    def test_cloudinary_stream_holds_back_the_last_part_until_close(self):
+        with mock.patch("cloudinary.uploader.upload_large_part") as upload_part:
+            upload_part.return_value = {"public_id": "images/a", "secure_url": "https://res.cloudinary.com/a"}
+            stream = CloudinaryStream("images/a", chunk_size=10)
+            for _ in range(5):
+                stream.write(b"x" * 5)
+            self.assertEqual(stream.close(), ("images/a", "https://res.cloudinary.com/a"))
+
+        ranges = [call.kwargs["http_headers"]["Content-Range"] for call in upload_part.call_args_list]
+        self.assertEqual(ranges, ["bytes 0-9/-1", "bytes 10-19/-1", "bytes 20-24/25"])
+        upload_ids = {call.kwargs["http_headers"]["X-Unique-Upload-Id"] for call in upload_part.call_args_list}
+        self.assertEqual(len(upload_ids), 1)
+
+    def test_local_storage_writes_resized_variants(self):
+        with tempfile.TemporaryDirectory() as root:
+            local = LocalStorage(root, "/media/")
+            key, url = local.upload(io.BytesIO(png_bytes()), "talent-1", "image/png")
+            self.assertEqual((key, url), ("talents/talent-1.png", "/media/talents/talent-1.png"))
+
+            variants = local.create_variants(key, VARIANTS)
+            self.assertEqual(variants["thumbnail"], "/media/talents/talent-1-thumbnail.png")
+            with Image.open(os.path.join(root, "talents", "talent-1-thumbnail.png")) as thumbnail:
+                self.assertEqual(thumbnail.size, (200, 200))
+            with Image.open(os.path.join(root, "talents", "talent-1-carousel.png")) as carousel:
+                self.assertEqual(carousel.size, (640, 480))
+
+            self.assertEqual(local.key_for_url(url), key)
+            self.assertIsNone(local.key_for_url("https://images.example.com/talents/talent-1.png"))
+            local.delete(key)
+            self.assertEqual(os.listdir(os.path.join(root, "talents")), [])
+
+    def test_cloudinary_keys_are_only_taken_from_its_own_folder(self):
+        cloudinary_storage = CloudinaryStorage(folder="talents")
+        url = "https://res.cloudinary.com/grito/image/upload/v1700000000/talents/talent-abc.png"
+        self.assertEqual(cloudinary_storage.key_for_url(url), "talents/talent-abc")
+        self.assertIsNone(cloudinary_storage.key_for_url(url.replace("/talents/", "/other/")))
+        self.assertIsNone(cloudinary_storage.key_for_url("https://images.example.com/talents/talent-abc.png"))
+
+
+class ImageUploadTests(TransactionTestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        patcher = mock.patch.object(storage, "_storage", LocalStorage(self.media_root, "/media/"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create(email="ada@grito.africa", username="ada", is_active=True)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens_for_user(self.user).access_token}")
+
+    def test_image_is_stored_before_the_response_and_variants_follow(self):
+        response = self.client.put(
+            reverse("user-image"), {"image": SimpleUploadedFile("me.png", png_bytes())}, format="multipart"
+        )
+        self.assertEqual(response.status_code, 202)
+        image_url = response.json()["data"]["image_url"]
+        self.assertRegex(image_url, r"^/media/talents/user-[0-9a-f]{12}\.png$")
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, *image_url.split("/")[2:])))
+
+        get_upload_queue().join()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.image_url, image_url)
+        self.assertEqual(set(self.user.image_variants), set(VARIANTS))
+
+    def test_replaced_image_is_deleted_with_its_variants(self):
+        def put_image():
+            response = self.client.put(
+                reverse("user-image"), {"image": SimpleUploadedFile("me.png", png_bytes())}, format="multipart"
+            )
+            get_upload_queue().join()
+            return response.json()["data"]["image_url"]
+
+        first, second = put_image(), put_image()
+        stem = second.rsplit("/", 1)[1].removesuffix(".png")
+        self.assertNotIn(stem, first)
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.media_root, "talents"))),
+            sorted([f"{stem}.png", *(f"{stem}-{name}.png" for name in VARIANTS)]),
+        )
+
+    def test_image_of_a_rejected_talent_is_deleted(self):
+        admin = User.objects.create(email="admin@grito.africa", username="admin", is_active=True, is_verified=True)
+        token = tokens_for_user(admin, groups=[SUPER_ADMIN]).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        response = self.client.post(
+            reverse("admin-talents"),
+            {"name": "Ada", "image": SimpleUploadedFile("ada.png", png_bytes())},
+            format="multipart",
+        )
+        get_upload_queue().join()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "talents")), [])
+
+    def test_files_that_are_not_images_are_rejected_unstored(self):
+        response = self.client.put(
+            reverse("user-image"), {"image": SimpleUploadedFile("me.png", b"not an image")}, format="multipart"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(os.listdir(self.media_root), [])
+
+
+class SchemaViewTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        patcher = mock.patch.object(views, "schema_cache", SchemaCache(self.directory))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(schema, "generate_schema", wraps=schema.generate_schema)
+        self.generate = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_schema_is_generated_once_and_revalidated_with_its_etag(self):
+        response = self.client.get(reverse("schema"), HTTP_ACCEPT="application/json", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertIn("/api/v1/talents", json.loads(gzip.decompress(response.content))["paths"])
+
+        response = self.client.get(reverse("schema"), HTTP_ACCEPT="application/json", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Content-Encoding", response)
+        response = self.client.get(reverse("schema"), HTTP_IF_NONE_MATCH=f'"{schema_version()}-yaml"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.generate.call_count, 1)
+
+        # Another process running the same code reads the stored documents
+        self.assertEqual(SchemaCache(self.directory).get("yaml").etag, f'"{schema_version()}-yaml"')
+        self.assertEqual(self.generate.call_count, 1)
+
+    def test_docs_load_the_immutable_versioned_schema(self):
+        page = self.client.get(reverse("swagger-ui"))
+        schema_url = f"{reverse('schema')}?v={schema_version()}"
+        self.assertEqual(page.data["schema_url"], schema_url)
+        response = self.client.get(schema_url)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn(f"max-age={365 * 24 * 3600}", response["Cache-Control"])
+
+
+@override_settings(METRICS_TOKEN="secret")
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email="admin@example.com", username="admin", name="Admin", is_active=True, is_verified=True
+        )
+
+    def setUp(self):
+        patcher = mock.patch.object(metrics, "slow_requests", metrics.SlowRequestLog(2))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = Client(HTTP_AUTHORIZATION="Bearer secret")
+
+    def test_histogram_exposition(self):
+        histogram = metrics.Histogram("test_seconds", "Test", ("view",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, ('a"b',))
+        histogram.observe(5, ('a"b',))
+        lines = list(histogram.samples())
+        self.assertEqual(
+            lines,
+            [
+                'test_seconds_bucket{view="a\\"b",le="0.1"} 1',
+                'test_seconds_bucket{view="a\\"b",le="1.0"} 1',
+                'test_seconds_bucket{view="a\\"b",le="+Inf"} 2',
+                'test_seconds_sum{view="a\\"b"} 5.05',
+                'test_seconds_count{view="a\\"b"} 2',
+            ],
+        )
+
+    def test_requests_are_counted_by_url_name_with_their_queries(self):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {tokens_for_user(self.user, groups=[SUPER_ADMIN]).access_token}"
+        )
+        self.assertEqual(client.get(reverse("export", args=["users", "xml"])).status_code, 400)
+        b"".join(client.get(reverse("export", args=["users", "csv"])).streaming_content)
+
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+        content = response.content.decode()
+        self.assertIn('http_requests_total{view="export",method="GET",status="400"}', content)
+        self.assertIn('http_request_db_queries_count{view="export"}', content)
+        self.assertIn("# TYPE http_request_duration_seconds histogram", content)
+
+        traces = self.client.get(reverse("metrics-slow-requests")).json()["data"]
+        self.assertEqual(len(traces), 2)
+        self.assertGreaterEqual(traces[0]["seconds"], traces[1]["seconds"])
+        self.assertTrue(any(trace["slowestQueries"] for trace in traces))
+
+    def test_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
+        self.assertEqual(Client().get(reverse("metrics")).status_code, 401)
+        self.assertEqual(Client(HTTP_AUTHORIZATION="Bearer wrong").get(reverse("metrics")).status_code, 401)
+
+    @override_settings(METRICS_TOKEN="")
+    def test_views_are_not_served_without_a_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+        self.assertEqual(self.client.get(reverse("metrics-slow-requests")).status_code, 404)
+
+
+class QueryInspectionTests(TestCase):
+    def request(self, view):
+        request = RequestFactory().get("/users")
+        request.resolver_match = ResolverMatch(view, (), {}, url_name="users")
+        return QueryInspectionMiddleware(view)(request)
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t1 WHERE id IN (%s, %s,%s) AND name = 'O''Brien'\n  AND n > 10"),
+            "SELECT * FROM t1 WHERE id IN (%s, ...) AND name = ? AND n > ?",
+        )
+
+    @override_settings(SLOW_QUERY_THRESHOLD=1e-9)
+    def test_slow_query_is_logged_with_its_plan(self):
+        with self.assertLogs("grito_talent_pool_server.db.inspection", "WARNING") as logs:
+            list(User.objects.filter(email="someone@example.com"))
+        self.assertIn("Plan:", logs.output[0])
+        self.assertIn("authentication_user", logs.output[0].split("Plan:")[1])
+        self.assertNotIn("someone@example.com", logs.output[0])
+        self.assertIn("Parameters: ['str']", logs.output[0])
+
+    @override_settings(SLOW_QUERY_THRESHOLD=1e-9, SLOW_QUERY_LOG_PARAMS=True)
+    def test_slow_query_parameters_are_logged_when_enabled(self):
+        with self.assertLogs("grito_talent_pool_server.db.inspection", "WARNING") as logs:
+            list(User.objects.filter(email="someone@example.com"))
+        self.assertIn("Parameters: ('someone@example.com',)", logs.output[0])
+
+    @override_settings(N_PLUS_ONE_THRESHOLD=3)
+    def test_repeated_statement_is_reported(self):
+        def view(request):
+            for i in range(4):
+                User.objects.filter(email=f"user{i}@example.com").first()
+            return HttpResponse()
+
+        with self.assertLogs("grito_talent_pool_server.db.inspection", "WARNING") as logs:
+            self.request(view)
+        self.assertIn("Possible N+1", logs.output[0])
+        self.assertIn("ran 4 times", logs.output[0])
+
+    def test_query_budget(self):
+        def view(request):
+            User.objects.count()
+            User.objects.exists()
+            return HttpResponse()
+
+        view.query_budget = {"GET": 2}
+        self.assertEqual(self.request(view).status_code, 200)
+        view.query_budget = {"GET": 1}
+        with self.assertRaisesMessage(QueryBudgetExceeded, "ran 2 queries, over its budget of 1"):
+            self.request(view)
+        with override_settings(QUERY_BUDGET_RAISE=False), self.assertLogs("grito_talent_pool_server.db.inspection"):
+            self.request(view)
+
+
+class RecorderTests(SimpleTestCase):
+    def test_summary(self):
+        recorder = Recorder()
+        for i in range(1, 101):
+            recorder.record("login", i / 1000, ok=i <= 98)
+        recorder.record("logout", 0.5, ok=True)
+        summary = recorder.summary(elapsed=10)
+        self.assertEqual(summary["login"]["requests"], 100)
+        self.assertEqual(summary["login"]["errorRate"], 0.02)
+        self.assertEqual(summary["login"]["throughput"], 10)
+        self.assertEqual(summary["login"]["p50Ms"], 50.5)
+        self.assertEqual(summary["logout"]["p99Ms"], 500)
+        self.assertEqual(summary["all"]["requests"], 101)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class LoadTestTests(LiveServerTestCase):
+    def setUp(self):
+        # As in a deployed database, so sign-ups stay within their query budget
+        Group.objects.create(name=SUPER_ADMIN)
+        clear_group_cache()
+        self.addCleanup(clear_group_cache)
+
+    def test_sessions_run_the_auth_flow(self):
+        recorder, _, sessions = run_load(self.live_server_url, concurrency=1, sessions=2, talents=False)
+        summary = recorder.summary(elapsed=1)
+        self.assertEqual(sessions, 2)
+        self.assertEqual(list(summary), ["sign-up", "confirm-otp", "login", "logout", "all"])
+        self.assertEqual(summary["all"]["errors"], 0)
+        self.assertTrue(User.objects.filter(email__startswith="loadtest-", is_verified=True).exists())
+
+    def test_a_user_missing_from_the_database_stops_the_run(self):
+        with self.assertRaisesMessage(LoadTestError, "is not in this database"):
+            activate_user("ada@grito.africa")
+
+        def activate(email):
+            raise LoadTestError("not shared")
+
+        with self.assertRaisesMessage(LoadTestError, "not shared"):
+            run_load(self.live_server_url, concurrency=2, duration=30, talents=False, activate=activate)
+
+    def test_url_needs_activation_via_the_database(self):
+        with self.assertRaisesMessage(CommandError, "--activate-via-db"):
+            call_command("loadtest", url=self.live_server_url, sessions=1)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch("grito_talent_pool_server.mail.time.monotonic", return_value=100.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    def open(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_lets_a_single_probe_through(self):
+        self.open()
+        self.clock.return_value += 30
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        self.open()
+        self.clock.return_value += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_probe_that_never_reports_is_replaced(self):
+        self.open()
+        self.clock.return_value += 30
+        self.assertTrue(self.breaker.allow())
+        self.clock.return_value += 30
+        self.assertTrue(self.breaker.allow())
+
+    def test_concurrent_callers_claim_one_probe(self):
+        self.open()
+        self.clock.return_value += 30
+        allowed = []
+        threads = [threading.Thread(target=lambda: allowed.append(self.breaker.allow())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(allowed.count(True), 1)
+
+
+class ZeptoMailClientTests(SimpleTestCase):
+    def client_for(self, stub, **options):
+        stub.start()
+        self.addCleanup(stub.stop)
+        client = ZeptoMailClient("stub-key", base_url=stub.url, backoff_factor=0, **options)
+        self.addCleanup(client.close)
+        return client
+
+    def send(self, client, email="ada@example.com"):
+        return client.send_template("template", email, "Ada", {"OTP": "123456"})
+
+    def test_server_errors_are_retried(self):
+        stub = ZeptoStubServer(failure_rate=1.0)
+        client = self.client_for(stub, max_retries=2)
+        with self.assertRaises(MailError):
+            self.send(client)
+        self.assertEqual(stub.requests_received, 3)
+
+    def test_rejections_are_not_retried_and_keep_the_breaker_closed(self):
+        stub = ZeptoStubServer(rejected={"bounced@example.com"})
+        client = self.client_for(stub, max_retries=2, breaker=CircuitBreaker(failure_threshold=1))
+        with self.assertRaises(MailRejected) as raised:
+            self.send(client, "bounced@example.com")
+        self.assertEqual(raised.exception.status_code, 422)
+        self.assertEqual(stub.requests_received, 1)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_read_timeouts_are_not_replayed(self):
+        stub = ZeptoStubServer(latency=0.5)
+        client = self.client_for(stub, max_retries=2, read_timeout=0.1)
+        with self.assertRaises(MailError):
+            self.send(client)
+        self.assertEqual(stub.requests_received, 1)
+
+    def test_open_breaker_fails_fast(self):
+        stub = ZeptoStubServer(failure_rate=1.0)
+        client = self.client_for(stub, max_retries=0, breaker=CircuitBreaker(failure_threshold=1))
+        with self.assertRaises(MailError):
+            self.send(client)
+        with self.assertRaises(CircuitOpenError):
+            self.send(client)
+        self.assertEqual(stub.requests_received, 1)
+
+
+class FakeConnection:
+    """Stands in for a psycopg connection in ConnectionPool tests"""
+
+    def __init__(self):
+        self.closed = False
+        self.autocommit = True
+        self.broken = False
+        self.rollbacks = 0
+        self.info = mock.Mock(transaction_status=0)
+
+    def cursor(self):
+        if self.broken:
+            raise OSError("server closed the connection unexpectedly")
+        return mock.MagicMock()
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = 0
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.created = []
+
+    def connect(self):
+        conn = FakeConnection()
+        self.created.append(conn)
+        return conn
+
+    def test_returned_connection_is_reused(self):
+        pool = db_pool.ConnectionPool(max_size=2)
+        conn = pool.getconn(self.connect)
+        pool.putconn(conn)
+        self.assertIs(pool.getconn(self.connect), conn)
+        self.assertEqual(len(self.created), 1)
+        self.assertEqual(pool.snapshot()["in_use"], 1)
+
+    def test_open_transaction_is_rolled_back_on_return(self):
+        pool = db_pool.ConnectionPool()
+        conn = pool.getconn(self.connect)
+        conn.info.transaction_status = 2
+        pool.putconn(conn)
+        self.assertEqual(conn.rollbacks, 1)
+        self.assertEqual(pool.snapshot()["idle"], 1)
+
+    def test_checkout_waits_at_max_size_then_times_out(self):
+        pool = db_pool.ConnectionPool(max_size=1, timeout=0.05)
+        conn = pool.getconn(self.connect)
+        with self.assertRaises(db_pool.PoolTimeout):
+            pool.getconn(self.connect)
+        threading.Timer(0.01, pool.putconn, args=(conn,)).start()
+        pool.timeout = 5
+        self.assertIs(pool.getconn(self.connect), conn)
+        self.assertEqual(pool.snapshot()["timeouts"], 1)
+
+    def test_broken_connection_is_discarded(self):
+        pool = db_pool.ConnectionPool(check_after=0)
+        conn = pool.getconn(self.connect)
+        pool.putconn(conn)
+        conn.broken = True
+        replacement = pool.getconn(self.connect)
+        self.assertIsNot(replacement, conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.snapshot()["failed_checks"], 1)
+        self.assertEqual(pool.snapshot()["size"], 1)
+
+    def test_closed_connection_is_not_returned_to_the_pool(self):
+        pool = db_pool.ConnectionPool()
+        conn = pool.getconn(self.connect)
+        conn.close()
+        pool.putconn(conn)
+        self.assertEqual(pool.snapshot()["size"], 0)
+
+    def test_failed_connect_frees_its_slot(self):
+        pool = db_pool.ConnectionPool(max_size=1, timeout=0)
+
+        def fail():
+            raise OSError("connection refused")
+
+        with self.assertRaises(OSError):
+            pool.getconn(fail)
+        self.assertIsNotNone(pool.getconn(self.connect))
+
+    def test_pool_inherited_through_fork_is_replaced_without_closing(self):
+        key = ("default", "fork-test")
+        self.addCleanup(db_pool._pools.pop, key, None)
+        parent = db_pool.get_pool(key, {})
+        conn = parent.getconn(self.connect)
+        parent.putconn(conn)
+        with mock.patch("grito_talent_pool_server.db.pool.os.getpid", return_value=parent.pid + 1):
+            child = db_pool.get_pool(key, {})
+            self.assertIsNot(child, parent)
+            self.assertIsNot(child.getconn(self.connect), conn)
+            self.assertIs(db_pool.get_pool(key, {}), child)
+            db_pool.close_pools("default")
+        # The parent's socket is left alone for the parent to use
+        self.assertFalse(conn.closed)
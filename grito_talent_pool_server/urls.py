@@ -2,38 +2,38 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularRedocView,
-    SpectacularSwaggerView,
-)
 
-SPECTACULAR_SETTINGS = {
-    "TITLE": "Grito Talent Pool Project API",
-    "DESCRIPTION": "API for Grito Talent Pool Project",
-    "VERSION": "1.0.0",
-    "SERVE_INCLUDE_SCHEMA": False,
-    # OTHER SETTINGS
-}
+from .views import ExportView, MetricsView, SchemaRedocView, SchemaSwaggerView, SchemaView, SlowRequestsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("auth/v1/", include("authentication.urls")),
+    path("api/v1/", include("talents.urls")),
+    path(
+        "api/v1/admin/export/<slug:dataset>.<slug:file_format>",
+        ExportView.as_view(),
+        name="export",
+    ),
 
-    path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
+    path("api/schema/", SchemaView.as_view(), name="schema"),
     # Optional UI:
     path(
         "api/docs",
-        SpectacularSwaggerView.as_view(url_name="schema"),
+        SchemaSwaggerView.as_view(url_name="schema"),
         name="swagger-ui",
     ),
     path(
         "api/schema/redoc/",
-        SpectacularRedocView.as_view(url_name="schema"),
+        SchemaRedocView.as_view(url_name="schema"),
         name="redoc",
     ),
 ]
 
+if settings.METRICS_ENABLED:
+    urlpatterns += [
+        path("metrics", MetricsView.as_view(), name="metrics"),
+        path("metrics/slow-requests", SlowRequestsView.as_view(), name="metrics-slow-requests"),
+    ]
 
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,42 +1,12 @@
-import json
-from decouple import config
-import requests
+import logging
+
 from datetime import datetime
 from rest_framework.response import Response
 from rest_framework import status, serializers
 from django.http import JsonResponse
 from django.conf import settings
 
-
-def send_otp_email(email, otp_code, name, product_name="Grito Talent Pool"):
-    try:
-        zepto_auth = config("ZEPTO_API_KEY")
-        otp_template = config("VERIFY_EMAIL_TEMPLATE")
-
-        url = "https://api.zeptomail.com/v1.1/email/template"
-        payload_json = {
-            "merge_info": {
-                "name": name,
-                "OTP": otp_code,
-                "product_name": product_name
-            },
-            "template_key": otp_template,
-            "from": {"address": "support@grito.africa"},
-            "to": [{"email_address": {"address": email, "name": name}}]
-        }
-        print(payload_json)
-
-        payload = json.dumps(payload_json)
-        headers = {
-            'accept': "application/json",
-            'content-type': "application/json",
-            'authorization': zepto_auth,
-        }
-        response = requests.request("POST", url, data=payload, headers=headers)
-
-        return response.text
-    except Exception as e:
-        print(e)
+logger = logging.getLogger(__name__)
 
 
 class GenerateKey:
@@ -47,7 +17,7 @@ class GenerateKey:
 
 def error_500(request):
     message = "An error occurred"
-    print(request)
+    logger.error("Unhandled error serving %s %s", request.method, request.path)
     # send_mail to developer to handle error
     response = JsonResponse(data={"message": message, "status_code": 404})
     response.status_code = 500
@@ -98,6 +68,18 @@ def error_406(message):
     )
 
 
+def error_503(message):
+    return Response(
+        {
+            "code": status.HTTP_503_SERVICE_UNAVAILABLE,
+            "status": "error",
+            "message": message,
+        },
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "1"},
+    )
+
+
 def serializer_error_400(message):
     return serializers.ValidationError(
         {"code": 400, "status": "error", "message": message}
@@ -0,0 +1,170 @@
+import hmac
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.middleware.gzip import re_accepts_gzip
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from drf_spectacular.plumbing import set_query_parameters
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from authentication.permissions import IsSuperAdmin
+
+from . import metrics
+from .export import FORMATS, ExportError, export_filename, export_rows
+from .schema import schema_cache, schema_version
+from .utils import error_400, error_401, error_404
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines, so the view runs on the event loop under ASGI.
+    Authentication, permission and throttle checks may hit the database, so they run
+    through sync_to_async before the handler is awaited.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class ExportView(APIView):
+    """
+    Stream a dataset as a CSV or NDJSON download: /export/<dataset>.<csv|ndjson>
+    Query parameters: after=<id of the last row received> to resume, gzip=1 to compress.
+    """
+
+    permission_classes = (IsSuperAdmin,)
+
+    def get(self, request, dataset, file_format):
+        use_gzip = request.query_params.get("gzip") in ("1", "true")
+        try:
+            chunks = export_rows(
+                dataset,
+                file_format,
+                after=request.query_params.get("after"),
+                chunk_size=settings.EXPORT_CHUNK_SIZE,
+                gzip=use_gzip,
+            )
+        except ExportError as e:
+            return error_400(str(e))
+
+        response = StreamingHttpResponse(
+            chunks, content_type="application/gzip" if use_gzip else FORMATS[file_format]
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{export_filename(dataset, file_format, use_gzip)}"'
+        )
+        response["Cache-Control"] = "no-store"
+        return response
+
+
+class SchemaView(APIView):
+    """
+    The OpenAPI schema, served from SchemaCache instead of generated per request; YAML or
+    JSON by content negotiation, as from SpectacularAPIView, and gzipped when accepted.
+    The docs pages load it from a ?v=<schema version> URL, which never changes content and
+    is cached for a year; the plain URL is revalidated with its ETag.
+    """
+
+    renderer_classes = SpectacularAPIView.renderer_classes
+    permission_classes = (AllowAny,)
+    authentication_classes = ()
+    immutable_max_age = 365 * 24 * 3600
+
+    @extend_schema(exclude=True)
+    def get(self, request, *args, **kwargs):
+        renderer, media_type = self.perform_content_negotiation(request)
+        document = schema_cache.get(renderer.format)
+        use_gzip = bool(re_accepts_gzip.search(request.META.get("HTTP_ACCEPT_ENCODING", "")))
+        etag = document.gzip_etag if use_gzip else document.etag
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(document.gzip_content if use_gzip else document.content, content_type=media_type)
+            if use_gzip:
+                response["Content-Encoding"] = "gzip"
+        response["ETag"] = etag
+        patch_vary_headers(response, ("Accept", "Accept-Encoding"))
+        if request.query_params.get("v") == document.version:
+            patch_cache_control(response, public=True, max_age=self.immutable_max_age, immutable=True)
+        else:
+            patch_cache_control(response, public=True, no_cache=True)
+        return response
+
+
+class VersionedSchemaUrlMixin:
+    def _get_schema_url(self, request):
+        return set_query_parameters(super()._get_schema_url(request), v=schema_version())
+
+
+class SchemaSwaggerView(VersionedSchemaUrlMixin, SpectacularSwaggerView):
+    pass
+
+
+class SchemaRedocView(VersionedSchemaUrlMixin, SpectacularRedocView):
+    pass
+
+
+class MetricsTokenMixin:
+    """Views that need METRICS_TOKEN as a bearer token, and are not found while it is unset"""
+
+    permission_classes = (AllowAny,)
+    authentication_classes = ()
+
+    def token_error(self, request):
+        """:return: error response when the request lacks the token, else None"""
+        if not settings.METRICS_TOKEN:
+            return error_404("Not found")
+        given = request.META.get("HTTP_AUTHORIZATION", "").removeprefix("Bearer ")
+        if hmac.compare_digest(given.encode(), settings.METRICS_TOKEN.encode()):
+            return None
+        return error_401("A valid metrics token is required")
+
+
+class MetricsView(MetricsTokenMixin, APIView):
+    """This process's metrics in the Prometheus text format"""
+
+    @extend_schema(exclude=True)
+    def get(self, request):
+        error = self.token_error(request)
+        if error:
+            return error
+        return HttpResponse(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+
+class SlowRequestsView(MetricsTokenMixin, APIView):
+    """Traces of the slowest requests this process has served, slowest first"""
+
+    @extend_schema(exclude=True)
+    def get(self, request):
+        error = self.token_error(request)
+        if error:
+            return error
+        return Response({"code": 200, "status": "success", "data": metrics.slow_requests.traces()})
@@ -0,0 +1,6 @@
+from django.contrib import admin
+
+from .models import Talent, TalentRequest
+
+admin.site.register(Talent)
+admin.site.register(TalentRequest)
@@ -0,0 +1,235 @@
+import hashlib
+import os
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework import generics, status
+from rest_framework.permissions import AllowAny
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from authentication.permissions import IsSuperAdmin
+from grito_talent_pool_server.images import ImageUploadMixin, schedule_delete, schedule_variants
+from grito_talent_pool_server.utils import error_400, error_404, serializer_errors
+
+from .cache import get_catalog_stamp, listing_cache
+from .filters import filter_talents
+from .importer import FORMATS, ImageArchive, TalentImportError, import_talents
+from .matching import matcher
+from .models import Talent
+from .serializers import TalentRequestSerializer, TalentSerializer
+
+
+class TalentListView(generics.ListAPIView):
+    """
+    Public listing, cached per catalog version (see talents.cache). Clients revalidate with
+    the ETag or Last-Modified and get a 304 without any serialization or query.
+    """
+
+    permission_classes = (AllowAny,)
+    authentication_classes = ()
+    serializer_class = TalentSerializer
+
+    def get_queryset(self):
+        # Read from the primary: pages are cached under the current catalog version, and a
+        # lagging replica could pin stale rows to it
+        return filter_talents(Talent.objects.using(DEFAULT_DB_ALIAS), self.request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        stamp = get_catalog_stamp()
+        query = urlencode(sorted((k, v) for k, values in request.query_params.lists() for v in values))
+        request_key = f"{request.get_host()}:{request.accepted_renderer.format}?{query}"
+        etag = quote_etag(hashlib.sha1(f"{stamp['version']}:{request_key}".encode()).hexdigest())
+        last_modified = int(stamp["last_modified"].timestamp())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            if isinstance(request.accepted_renderer, JSONRenderer):
+                content, content_type = listing_cache.get_or_build(
+                    listing_cache.key(stamp["version"], request_key),
+                    lambda: self.render_page(request, *args, **kwargs),
+                )
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                response = super().list(request, *args, **kwargs)
+
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+
+    def render_page(self, request, *args, **kwargs):
+        data = super().list(request, *args, **kwargs).data
+        renderer = request.accepted_renderer
+        content = renderer.render(data, request.accepted_media_type, self.get_renderer_context())
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+        return content, content_type
+
+
+class AdminTalentView(ImageUploadMixin, generics.ListAPIView):
+    """
+    The image may be sent as a file in a multipart body (see ImageUploadMixin) or as a URL.
+    Variants of an uploaded file are added to the talent in the background. A stored file
+    is deleted again when the talent is rejected, and a replaced image once the new one is saved.
+    """
+
+    permission_classes = (IsSuperAdmin,)
+    serializer_class = TalentSerializer
+    image_name_prefix = "talent"
+
+    def get_queryset(self):
+        return filter_talents(Talent.objects.all(), self.request.query_params)
+
+    def post(self, request):
+        data, image, error = self.get_image_data(request)
+        if error is not None:
+            return error
+        serializer = self.serializer_class(data=data)
+        if serializer.is_valid():
+            talent = serializer.save()
+            if image is not None:
+                schedule_variants(talent, "image", "image_variants", image)
+            return Response(
+                {
+                    "code": 201,
+                    "status": "success",
+                    "message": "Talent created successfully",
+                    "data": serializer.data,
+                },
+                status=status.HTTP_201_CREATED,
+            )
+        if image is not None:
+            schedule_delete(image.url)
+        return error_400(serializer_errors(serializer.errors))
+
+
+class AdminTalentDetailView(ImageUploadMixin, APIView):
+    permission_classes = (IsSuperAdmin,)
+    serializer_class = TalentSerializer
+    image_name_prefix = "talent"
+
+    def patch(self, request, pk):
+        talent = Talent.objects.filter(pk=pk).first()
+        if talent is None:
+            return error_404("Talent not found")
+        data, image, error = self.get_image_data(request)
+        if error is not None:
+            return error
+        serializer = self.serializer_class(talent, data=data, partial=True)
+        if serializer.is_valid():
+            previous_image = talent.image
+            image_changed = "image" in talent.update_from_dict(serializer.validated_data, commit=False)
+            if image_changed:
+                talent.image_variants = {}
+            talent.save_dirty()
+            if image_changed:
+                schedule_delete(previous_image)
+            if image is not None:
+                schedule_variants(talent, "image", "image_variants", image)
+            return Response(
+                {
+                    "code": 200,
+                    "status": "success",
+                    "message": "Talent updated successfully",
+                    "data": self.serializer_class(talent).data,
+                },
+                status=status.HTTP_200_OK,
+            )
+        if image is not None:
+            schedule_delete(image.url)
+        return error_400(serializer_errors(serializer.errors))
+
+    def delete(self, request, pk):
+        if not Talent.objects.filter(pk=pk).archive():
+            return error_404("Talent not found")
+        return Response(
+            {"code": 200, "status": "success", "message": "Talent deleted successfully"},
+            status=status.HTTP_200_OK,
+        )
+
+
+class AdminTalentImportView(APIView):
+    """
+    Bulk create talents from a multipart upload: `file` (CSV or NDJSON, the format taken
+    from ?format= or the file extension) and optionally `images`, a zip of the image files
+    the rows name. Responds with a per-row error report once every row is processed;
+    images are uploaded in the background after that.
+    """
+
+    permission_classes = (IsSuperAdmin,)
+
+    def post(self, request):
+        file = request.FILES.get("file")
+        if file is None:
+            return error_400("file is required")
+        file_format = request.query_params.get("format") or os.path.splitext(file.name)[1].lstrip(".").lower()
+        file_format = {"jsonl": "ndjson"}.get(file_format, file_format)
+        if file_format not in FORMATS:
+            return error_400(f"Unsupported format. Choose from {', '.join(FORMATS)}")
+
+        try:
+            images = ImageArchive.from_file(request.FILES["images"]) if "images" in request.FILES else None
+            report = import_talents(
+                file,
+                file_format,
+                images=images,
+                batch_size=settings.TALENT_IMPORT_BATCH_SIZE,
+                max_errors=settings.TALENT_IMPORT_MAX_ERRORS,
+                dry_run=request.query_params.get("dryRun") in ("1", "true"),
+            )
+        except TalentImportError as e:
+            return error_400(str(e))
+        return Response(
+            {
+                "code": 200,
+                "status": "success",
+                "message": f"{report.created} talents imported, {report.failed} rows rejected",
+                "data": report.as_dict(),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class TalentRequestView(APIView):
+    permission_classes = (AllowAny,)
+    serializer_class = TalentRequestSerializer
+
+    @staticmethod
+    def get_matches(talent_request):
+        ranked = matcher.match(
+            talent_request.skill_set,
+            level=talent_request.level,
+            country=talent_request.country,
+            gender=talent_request.gender,
+            k=settings.TALENT_MATCH_LIMIT,
+        )
+        talents = Talent.objects.in_bulk([talent_id for talent_id, _ in ranked])
+        # A talent archived since the last index sync is skipped
+        return [
+            {**TalentSerializer(talents[talent_id]).data, "score": round(score, 4)}
+            for talent_id, score in ranked
+            if talent_id in talents
+        ]
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        if serializer.is_valid():
+            talent_request = serializer.save()
+            return Response(
+                {
+                    "code": 201,
+                    "status": "success",
+                    "message": "Talent request submitted successfully",
+                    "data": serializer.data,
+                    "matches": self.get_matches(talent_request),
+                },
+                status=status.HTTP_201_CREATED,
+            )
+        return error_400(serializer_errors(serializer.errors))
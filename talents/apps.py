@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class TalentsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'talents'
+
+    def ready(self):
+        from . import cache, matching  # noqa: F401
@@ -0,0 +1,150 @@
+import hashlib
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Max
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from grito_talent_pool_server.models import rows_updated
+
+from .models import Talent
+
+CATALOG_VERSION_KEY = "talent-catalog-version"
+
+
+def latest_change():
+    live = Talent.objects.using(DEFAULT_DB_ALIAS).aggregate(latest=Max("last_modified"))["latest"]
+    archived = Talent.super_objects.using(DEFAULT_DB_ALIAS).aggregate(latest=Max("archived"))["latest"]
+    return max(filter(None, (live, archived)), default=timezone.now())
+
+
+def get_catalog_stamp():
+    """
+    The catalog's current {"version", "last_modified"}.
+    The version is a random token replaced on every talent write, so responses cached
+    under an older one are never served again. If the stamp was evicted, a new one is
+    made with last_modified read from the table.
+    """
+    stamp = cache.get(CATALOG_VERSION_KEY)
+    if stamp is None:
+        cache.add(CATALOG_VERSION_KEY, {"version": uuid.uuid4().hex, "last_modified": latest_change()}, None)
+        stamp = cache.get(CATALOG_VERSION_KEY)
+    return stamp
+
+
+def bump_catalog_version(last_modified=None):
+    """
+    Replace the catalog stamp now and again when the current transaction commits, so a
+    request that read the catalog before the commit cannot keep its result cached.
+    :param last_modified: Latest last_modified of the changed rows; read from the table
+        when not given, as for bulk writes
+    """
+
+    def bump():
+        stamp = {"version": uuid.uuid4().hex, "last_modified": last_modified or latest_change()}
+        cache.set(CATALOG_VERSION_KEY, stamp, None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=Talent)
+@receiver(rows_updated, sender=Talent)
+def invalidate_catalog(sender, instance=None, **kwargs):
+    bump_catalog_version(instance.last_modified if instance is not None else None)
+
+
+class SingleFlight:
+    """
+    Run one build per key at a time in this process; callers arriving while it runs wait
+    for it and share its result (or exception).
+    """
+
+    class Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, build):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self.Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = build()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class ListingCache:
+    """
+    Rendered listing pages in the shared cache, keyed by catalog version and request.
+    Misses are coalesced twice: threads of one process share a SingleFlight build, and
+    across processes the first to take a short cache lock builds while the others poll
+    for its result for up to `wait` seconds before building themselves.
+    """
+
+    def __init__(self, timeout=3600, wait=2.0, poll_interval=0.05):
+        self.timeout = timeout
+        self.wait = wait
+        self.poll_interval = poll_interval
+        self._flight = SingleFlight()
+
+    @staticmethod
+    def key(version, request_key):
+        return f"talents:listing:{version}:{hashlib.sha1(request_key.encode()).hexdigest()}"
+
+    def get_or_build(self, key, build):
+        """
+        :param build: Callable returning the value to cache
+        """
+        value = cache.get(key)
+        if value is not None:
+            return value
+        return self._flight.do(key, lambda: self._build_once(key, build))
+
+    def _build_once(self, key, build):
+        lock_key = f"{key}:lock"
+        locked = cache.add(lock_key, 1, timeout=max(1, int(self.wait * 2)))
+        if not locked:
+            deadline = time.monotonic() + self.wait
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                value = cache.get(key)
+                if value is not None:
+                    return value
+        try:
+            value = build()
+            cache.set(key, value, self.timeout)
+            return value
+        finally:
+            if locked:
+                cache.delete(lock_key)
+
+
+listing_cache = ListingCache(timeout=settings.TALENT_LISTING_CACHE_TIMEOUT, wait=settings.TALENT_LISTING_CACHE_WAIT)
@@ -0,0 +1,63 @@
+import json
+
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.fields.array import ArrayContains
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models
+
+
+class PortableArrayField(ArrayField):
+    """
+    ArrayField on PostgreSQL. On SQLite the list is stored as JSON text instead, so the
+    schema can be created and tests run without PostgreSQL; `contains` works on both.
+    """
+
+    def db_type(self, connection):
+        if connection.vendor == "postgresql":
+            return super().db_type(connection)
+        return "text"
+
+    def get_placeholder(self, value, compiler, connection):
+        if connection.vendor == "postgresql":
+            return super().get_placeholder(value, compiler, connection)
+        return "%s"
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = super().get_db_prep_value(value, connection, prepared)
+        if connection.vendor == "postgresql" or value is None:
+            return value
+        return json.dumps(value)
+
+    def from_db_value(self, value, expression, connection):
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
+
+@PortableArrayField.register_lookup
+class PortableArrayContains(ArrayContains):
+    def __init__(self, lhs, rhs):
+        # ArrayContains turns a list into an ARRAY[] expression, which SQLite cannot run
+        self.items = list(rhs) if isinstance(rhs, (list, tuple)) else None
+        super().__init__(lhs, rhs)
+
+    def as_sqlite(self, compiler, connection):
+        if self.items is None:
+            raise NotImplementedError("skill_set__contains takes a list on SQLite")
+        if not self.items:
+            return "1 = 1", []
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        condition = f"EXISTS (SELECT 1 FROM json_each({lhs}) WHERE json_each.value = %s)"
+        return (
+            " AND ".join([condition] * len(self.items)),
+            [param for item in self.items for param in (*lhs_params, item)],
+        )
+
+
+class PortableGinIndex(GinIndex):
+    """GinIndex on PostgreSQL; a plain index elsewhere, which cannot use GIN"""
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        if schema_editor.connection.vendor == "postgresql":
+            return super().create_sql(model, schema_editor, using=using, **kwargs)
+        return models.Index.create_sql(self, model, schema_editor, **kwargs)
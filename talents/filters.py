@@ -0,0 +1,27 @@
+FACETS = ("country", "level", "gender")
+SKILL_SET_PARAM = "skillSet"
+
+
+def get_skill_set(query_params):
+    """
+    Skills asked for, given either as repeated skillSet parameters or comma separated
+    """
+    skills = []
+    for value in query_params.getlist(SKILL_SET_PARAM):
+        skills.extend(skill.strip() for skill in value.split(","))
+    return [skill for skill in skills if skill]
+
+
+def filter_talents(queryset, query_params):
+    """
+    Narrow a Talent queryset by any combination of the listing facets.
+    country, level and gender match exactly; skillSet keeps talents having every listed
+    skill. Each combination is served by one of Talent's partial indexes.
+    """
+    filters = {
+        facet: query_params[facet] for facet in FACETS if query_params.get(facet)
+    }
+    skill_set = get_skill_set(query_params)
+    if skill_set:
+        filters["skill_set__contains"] = skill_set
+    return queryset.filter(**filters)
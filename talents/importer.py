@@ -0,0 +1,359 @@
+import codecs
+import csv
+import itertools
+import json
+import logging
+import os
+import posixpath
+import shutil
+import tempfile
+import threading
+import zipfile
+import zlib
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from grito_talent_pool_server.images import VARIANTS, sniff_image_type
+from grito_talent_pool_server.models import rows_updated
+from grito_talent_pool_server.storage import get_image_storage, get_upload_queue
+
+from .models import PendingImageUpload, Talent
+from .serializers import TalentSerializer
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "ndjson")
+
+
+class TalentImportError(Exception):
+    pass
+
+
+class ImageArchive:
+    """
+    Zip of images that import rows name in their image column.
+    Upload workers read members straight from the file, one at a time. Each queued upload
+    holds a reference to the archive, and when the last is released the zip is closed (and
+    deleted if it is a temporary copy no pending upload still needs).
+    """
+
+    def __init__(self, path, temporary=False):
+        # Absolute, as pending uploads may be resumed from another working directory
+        self.path = os.path.abspath(path)
+        self.temporary = temporary
+        try:
+            self._zip = zipfile.ZipFile(path)
+        except (zipfile.BadZipFile, OSError):
+            self._remove()
+            raise TalentImportError("The images file is not a valid zip archive")
+        self._members = {
+            posixpath.basename(info.filename): info for info in self._zip.infolist() if not info.is_dir()
+        }
+        # One reference is held by the import itself until it calls release()
+        self._references = 1
+        self._uploads_queued = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, file):
+        """Copy an uploaded zip that is deleted after the request to a file the workers can read later"""
+        with tempfile.NamedTemporaryFile(
+            prefix="talent-images-", suffix=".zip", dir=settings.IMAGE_IMPORT_DIR or None, delete=False
+        ) as copy:
+            shutil.copyfileobj(file, copy, 1 << 20)
+        return cls(copy.name, temporary=True)
+
+    def open(self, name):
+        # ZipFile serializes reads of the underlying file, so workers can share it
+        return self._zip.open(self._members[name])
+
+    def inspect(self, name):
+        """
+        Check a member as ImageStreamHandler checks a direct upload: its size against
+        IMAGE_UPLOAD_MAX_SIZE, taken from the zip directory before anything is inflated, and
+        its type from its first bytes
+        :return: (content type, None), or (None, why the member cannot be uploaded)
+        """
+        info = self._members.get(name)
+        if info is None:
+            return None, "Not found in the images archive"
+        if info.file_size > settings.IMAGE_UPLOAD_MAX_SIZE:
+            return None, f"Larger than {settings.IMAGE_UPLOAD_MAX_SIZE // 2**20} MB"
+        try:
+            with self.open(name) as member:
+                content_type = sniff_image_type(member.read(16))
+        except (zipfile.BadZipFile, zlib.error, OSError, RuntimeError, NotImplementedError):
+            return None, "Cannot be read from the images archive"
+        if content_type is None:
+            return None, "Must be a JPEG, PNG, GIF or WebP image"
+        return content_type, None
+
+    def retain(self):
+        with self._lock:
+            self._references += 1
+            self._uploads_queued = True
+
+    def release(self):
+        """:return: True when this was the last reference"""
+        with self._lock:
+            self._references -= 1
+            if self._references:
+                return False
+        self._zip.close()
+        # A copy is kept while uploads that failed still need it
+        if not (
+            self.temporary
+            and self._uploads_queued
+            and PendingImageUpload.objects.filter(archive=self.path).exists()
+        ):
+            self._remove()
+        return True
+
+    def _remove(self):
+        if self.temporary:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class ImportReport:
+    def __init__(self, max_errors=1000):
+        self.max_errors = max_errors
+        self.valid = 0
+        self.created = 0
+        self.failed = 0
+        self.images_queued = 0
+        self.errors = []
+
+    def add_error(self, row, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "errors": errors})
+
+    def as_dict(self):
+        return {
+            "valid": self.valid,
+            "created": self.created,
+            "failed": self.failed,
+            "imagesQueued": self.images_queued,
+            "errors": self.errors,
+            "errorsTruncated": self.failed > len(self.errors),
+        }
+
+
+def read_csv(file):
+    return csv.DictReader(codecs.getreader("utf-8-sig")(file))
+
+
+def read_ndjson(file):
+    for line in codecs.getreader("utf-8-sig")(file):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield None
+            continue
+        yield row if isinstance(row, dict) else None
+
+
+def normalize_row(row):
+    # Accept the column names and list encoding of the talents export as well
+    if "skillSet" not in row and "skill_set" in row:
+        row["skillSet"] = row.pop("skill_set")
+    skill_set = row.get("skillSet")
+    if isinstance(skill_set, str) and skill_set.startswith("["):
+        try:
+            row["skillSet"] = json.loads(skill_set)
+        except ValueError:
+            pass
+    return row
+
+
+def error_details(detail):
+    if isinstance(detail, dict):
+        return {field: error_details(value) for field, value in detail.items()}
+    if isinstance(detail, list):
+        return [str(message) for message in detail]
+    return [str(detail)]
+
+
+def validate_row(serializer, row, images):
+    """
+    :return: (Talent, image file name or None) for a valid row
+    :raises ValidationError: with the row's errors
+    """
+    image = row.get("image") or ""
+    is_file_name = bool(image) and not image.startswith(("http://", "https://"))
+    if is_file_name:
+        row = {**row, "image": ""}
+    data = serializer.run_validation(row)
+    if is_file_name:
+        _, error = images.inspect(image) if images is not None else (None, "Not found in the images archive")
+        if error is not None:
+            raise ValidationError({"image": [error]})
+    return Talent(**data), image if is_file_name else None
+
+
+def upload_image(images, talent_id, name):
+    """Upload one image of an archive and its variants, then drop its PendingImageUpload"""
+    storage = get_image_storage()
+    try:
+        content_type, error = images.inspect(name)
+        if error is not None:
+            # Checked when the row was imported; the archive changed since
+            raise TalentImportError(f"{name}: {error}")
+        with images.open(name) as image:
+            key, url = storage.upload(image, f"talent-{talent_id}", content_type)
+        try:
+            variants = storage.create_variants(key, VARIANTS)
+        except Exception:
+            logger.exception("Variants of %s were not generated", key)
+            variants = {}
+        with transaction.atomic():
+            Talent.objects.filter(pk=talent_id).update(
+                image=url, image_variants=variants, last_modified=timezone.now()
+            )
+            PendingImageUpload.objects.filter(talent_id=talent_id).delete()
+    except Exception:
+        logger.exception("Image %s of talent %s was not uploaded; it stays pending", name, talent_id)
+    finally:
+        if images.release():
+            # The listing shows the new images once the whole archive is done
+            rows_updated.send(sender=Talent)
+        # Idle upload threads should not each hold a database connection
+        connection.close()
+
+
+def pending_uploads(rows, images):
+    return [
+        PendingImageUpload(
+            talent_id=talent.pk, archive=images.path, archive_is_temporary=images.temporary, member=image
+        )
+        for _, talent, image in rows
+        if image
+    ]
+
+
+def insert_batch(batch, report, images):
+    """
+    Insert a batch in one transaction, falling back to row by row to isolate the rows the
+    database rejects. Rows with an image are recorded as pending uploads in the same
+    transaction, then queued.
+    """
+    # Durable: uploads are queued right after, and their workers must see the rows committed
+    try:
+        with transaction.atomic(durable=True):
+            Talent.objects.bulk_create([talent for _, talent, _ in batch])
+            PendingImageUpload.objects.bulk_create(pending_uploads(batch, images))
+        inserted = batch
+    except DatabaseError:
+        inserted = []
+        for row in batch:
+            row_number, talent, image = row
+            talent.pk = None
+            try:
+                with transaction.atomic(durable=True):
+                    Talent.objects.bulk_create([talent])
+                    PendingImageUpload.objects.bulk_create(pending_uploads([row], images))
+            except DatabaseError as e:
+                report.add_error(row_number, {"error": [str(e).strip()]})
+            else:
+                inserted.append(row)
+
+    report.created += len(inserted)
+    uploads = [(talent.pk, image) for _, talent, image in inserted if image]
+    for talent_id, image in uploads:
+        images.retain()
+        get_upload_queue().submit(upload_image, images, talent_id, image)
+    report.images_queued += len(uploads)
+
+
+def resume_image_uploads():
+    """
+    Queue the uploads still pending, left by imports a restart interrupted or whose upload
+    failed. Run it when no import is in progress, e.g. on start-up.
+    :return: (uploads queued, uploads dropped because their archive is gone)
+    """
+    queued = dropped = 0
+    # Listed up front: submit() blocks while the queue is full, and the workers delete rows
+    pending = list(
+        PendingImageUpload.objects.order_by("archive", "created_at").values_list(
+            "archive", "archive_is_temporary", "talent_id", "member"
+        )
+    )
+    for (path, temporary), uploads in itertools.groupby(pending, key=lambda upload: upload[:2]):
+        uploads = list(uploads)
+        try:
+            images = ImageArchive(path, temporary=temporary)
+        except TalentImportError:
+            logger.error("Images archive %s is not readable; its %d pending uploads are dropped", path, len(uploads))
+            PendingImageUpload.objects.filter(archive=path).delete()
+            dropped += len(uploads)
+            continue
+        for _, _, talent_id, member in uploads:
+            images.retain()
+            get_upload_queue().submit(upload_image, images, talent_id, member)
+        images.release()
+        queued += len(uploads)
+    return queued, dropped
+
+
+def import_talents(file, file_format, images=None, batch_size=1000, max_errors=1000, dry_run=False):
+    """
+    Create talents from a CSV or NDJSON file, streamed in constant memory.
+    Rows use the API's field names (name, country, skillSet, level, gender, portfolio,
+    image) and are validated with TalentSerializer, a chunk at a time, then inserted with
+    one bulk INSERT per chunk in its own transaction. Invalid rows are reported and skipped
+    without failing their chunk. An image column holding a file name instead of a URL
+    refers to a member of the `images` zip; those images are uploaded by background
+    workers after their rows are committed, along with their VARIANTS, and this function
+    does not wait for them. They are recorded with their rows as PendingImageUpload, which
+    resume_image_uploads() queues again after a restart.
+    :param file: Binary file object
+    :param file_format: "csv" or "ndjson"
+    :param images: Optional ImageArchive, released when the import is done
+    :param batch_size: Rows per chunk and per transaction
+    :param max_errors: Row errors listed in the report; the rest are only counted
+    :param dry_run: Validate every row without inserting any
+    :return: ImportReport. Rows are numbered from 1, not counting a CSV header
+    :raises TalentImportError: for an unknown format
+    """
+    if file_format not in FORMATS:
+        raise TalentImportError(f"Unknown format {file_format}. Choose from {', '.join(FORMATS)}")
+
+    report = ImportReport(max_errors=max_errors)
+    serializer = TalentSerializer()
+    rows = read_csv(file) if file_format == "csv" else read_ndjson(file)
+    batch = []
+    row_number = 0
+    try:
+        for row_number, row in enumerate(rows, start=1):
+            if row is None:
+                report.add_error(row_number, {"error": ["Not a JSON object"]})
+                continue
+            try:
+                talent, image = validate_row(serializer, normalize_row(row), images)
+            except ValidationError as e:
+                report.add_error(row_number, error_details(e.detail))
+                continue
+            report.valid += 1
+            batch.append((row_number, talent, image))
+            if len(batch) == batch_size:
+                if not dry_run:
+                    insert_batch(batch, report, images)
+                batch = []
+        if batch and not dry_run:
+            insert_batch(batch, report, images)
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Rows already committed stay; the report says where reading stopped
+        report.add_error(row_number + 1, {"error": [f"Could not read the file from here on: {e}"]})
+    finally:
+        if images is not None:
+            images.release()
+    return report
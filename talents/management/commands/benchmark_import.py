@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from grito_talent_pool_server.storage import get_upload_queue
+from talents.importer import ImageArchive, import_talents
+from talents.models import Talent
+
+COUNTRIES = ["Nigeria", "Ghana", "Kenya", "South Africa", "Egypt", "Rwanda"]
+LEVELS = ["Junior", "Intermediate", "Senior", "Expert"]
+SKILLS = ["Python", "Django", "React", "Nodejs", "MongoDB", "Java", "Go", "Figma"]
+# Smallest valid GIF; the stub storage only reads it
+PIXEL = b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"
+
+
+class Command(BaseCommand):
+    help = (
+        "Import synthetic talents and report throughput and peak memory. Use with "
+        "IMAGE_STORAGE=stub; imported rows are archived again afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50000)
+        parser.add_argument("--images", type=int, default=1000, help="Rows that reference an image in a zip")
+        parser.add_argument("--invalid", type=int, default=100, help="Rows with a missing portfolio")
+        parser.add_argument("--batch-size", type=int, default=settings.TALENT_IMPORT_BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Parse and validate only")
+
+    def handle(self, *args, **options):
+        if settings.IMAGE_STORAGE != "stub" and options["images"] and not options["dry_run"]:
+            raise CommandError("Set IMAGE_STORAGE=stub to benchmark image uploads")
+
+        rows, images = options["rows"], min(options["images"], options["rows"])
+        invalid = set(range(0, rows, max(1, rows // options["invalid"]))) if options["invalid"] else set()
+        with tempfile.TemporaryDirectory() as directory:
+            data_path = os.path.join(directory, "talents.ndjson")
+            with open(data_path, "w") as data:
+                for i in range(rows):
+                    row = {
+                        "name": f"Imported talent {i}",
+                        "country": COUNTRIES[i % len(COUNTRIES)],
+                        "skillSet": [SKILLS[i % len(SKILLS)], SKILLS[(i * 7 + 3) % len(SKILLS)]],
+                        "level": LEVELS[i % len(LEVELS)],
+                        "gender": ("Male", "Female")[i % 2],
+                        "portfolio": "" if i in invalid else f"https://portfolio.example.com/import-{i}",
+                    }
+                    if i < images:
+                        row["image"] = f"{i}.gif"
+                    data.write(json.dumps(row) + "\n")
+            archive = None
+            if images:
+                zip_path = os.path.join(directory, "images.zip")
+                with zipfile.ZipFile(zip_path, "w") as images_zip:
+                    for i in range(images):
+                        images_zip.writestr(f"images/{i}.gif", PIXEL)
+                archive = ImageArchive(zip_path)
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            with open(data_path, "rb") as data:
+                report = import_talents(
+                    data, "ndjson", images=archive, batch_size=options["batch_size"], dry_run=options["dry_run"]
+                )
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            if report.images_queued:
+                get_upload_queue().join()
+            uploads_done = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{rows} rows: {report.valid} valid, {report.created} created, {report.failed} rejected "
+            f"in {elapsed:.2f} s ({rows / elapsed:.0f} rows/s), peak {peak / 2**20:.1f} MiB traced"
+        )
+        if report.images_queued:
+            self.stdout.write(f"{report.images_queued} images uploaded {uploads_done - elapsed:.2f} s after the import returned")
+        if report.created:
+            archived = Talent.objects.filter(name__startswith="Imported talent ").archive()
+            self.stdout.write(f"archived the {archived} imported talents")
@@ -0,0 +1,82 @@
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from talents.matching import LEVELS, TalentIndex
+
+COUNTRIES = ["Nigeria", "Ghana", "Kenya", "South Africa", "Egypt", "Rwanda", "Germany", "Canada"]
+GENDERS = ["Male", "Female"]
+
+
+class Command(BaseCommand):
+    help = "Measure talent index build time, memory footprint and query latency on synthetic talents"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--talents", type=int, default=100000)
+        parser.add_argument("--skills", type=int, default=500, help="Distinct skills in the catalog")
+        parser.add_argument("--queries", type=int, default=1000)
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        skills = [f"skill-{i}" for i in range(options["skills"])]
+        # Popular skills are far more common than niche ones
+        skill_weights = [1 / (rank + 1) for rank in range(len(skills))]
+        levels = list(LEVELS)
+
+        def pick_skills(count):
+            return set(rng.choices(skills, weights=skill_weights, k=count))
+
+        rows = [
+            (i + 1, pick_skills(rng.randint(2, 8)), rng.choice(levels), rng.choice(COUNTRIES), rng.choice(GENDERS))
+            for i in range(options["talents"])
+        ]
+
+        started = time.perf_counter()
+        index = TalentIndex.from_rows(rows)
+        build_time = time.perf_counter() - started
+        # Tracing slows allocation down, so memory is measured on a second build
+        tracemalloc.start()
+        traced_index = TalentIndex.from_rows(rows)
+        traced, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del traced_index
+
+        self.stdout.write(f"indexed {len(index)} talents, {len(skills)} skills in {build_time:.2f} s")
+        self.stdout.write(
+            f"memory: {index.nbytes / 2**20:.1f} MiB in arrays, {traced / 2**20:.1f} MiB allocated in total"
+        )
+
+        queries = [
+            (
+                pick_skills(rng.randint(1, 4)),
+                rng.choice(levels),
+                rng.choice(COUNTRIES + ["Any"]),
+                rng.choice(GENDERS + ["Any"]),
+            )
+            for _ in range(options["queries"])
+        ]
+        latencies = []
+        for skill_set, level, country, gender in queries:
+            started = time.perf_counter()
+            index.search(skill_set, level=level, country=country, gender=gender, k=options["k"])
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        latencies.sort()
+        quantiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"query latency over {len(latencies)} queries (top {options['k']}): "
+            f"p50 {quantiles[49]:.2f} ms, p95 {quantiles[94]:.2f} ms, p99 {quantiles[98]:.2f} ms, "
+            f"max {latencies[-1]:.2f} ms"
+        )
+
+        started = time.perf_counter()
+        for talent_id, skill_set, level, country, gender in rows[:1000]:
+            index.upsert(talent_id, skill_set | {"skill-0"}, level, country, gender)
+        self.stdout.write(
+            f"incremental update: {(time.perf_counter() - started) / 1000 * 1e6:.1f} us per upsert"
+        )
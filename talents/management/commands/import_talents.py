@@ -0,0 +1,52 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from grito_talent_pool_server.storage import get_upload_queue
+from talents.importer import FORMATS, ImageArchive, TalentImportError, import_talents
+
+
+class Command(BaseCommand):
+    help = "Bulk create talents from a CSV or NDJSON file, with images from an optional zip"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", dest="file_format", choices=FORMATS, help="Default: the file extension")
+        parser.add_argument("--images", help="Zip of the image files named in the image column")
+        parser.add_argument("--batch-size", type=int, default=settings.TALENT_IMPORT_BATCH_SIZE)
+        parser.add_argument("--max-errors", type=int, default=settings.TALENT_IMPORT_MAX_ERRORS)
+        parser.add_argument("--dry-run", action="store_true", help="Validate every row without inserting any")
+
+    def handle(self, *args, **options):
+        file_format = options["file_format"] or os.path.splitext(options["path"])[1].lstrip(".").lower()
+        file_format = {"jsonl": "ndjson"}.get(file_format, file_format)
+        started = time.perf_counter()
+        try:
+            images = ImageArchive(options["images"]) if options["images"] else None
+            with open(options["path"], "rb") as file:
+                report = import_talents(
+                    file,
+                    file_format,
+                    images=images,
+                    batch_size=options["batch_size"],
+                    max_errors=options["max_errors"],
+                    dry_run=options["dry_run"],
+                )
+        except (TalentImportError, OSError) as e:
+            raise CommandError(str(e))
+        imported_in = time.perf_counter() - started
+
+        for error in report.errors:
+            self.stderr.write(json.dumps(error))
+        self.stdout.write(
+            f"{report.valid} valid rows, {report.created} created, {report.failed} rejected "
+            f"in {imported_in:.1f} s"
+        )
+        if report.images_queued:
+            get_upload_queue().join()
+            self.stdout.write(
+                f"{report.images_queued} images uploaded in {time.perf_counter() - started - imported_in:.1f} s more"
+            )
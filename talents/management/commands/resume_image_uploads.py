@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from grito_talent_pool_server.storage import get_upload_queue
+from talents.importer import resume_image_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Upload the images of imported talents that are still pending, after a restart interrupted "
+        "their import. Run when no import is in progress, e.g. on start-up."
+    )
+
+    def handle(self, *args, **options):
+        queued, dropped = resume_image_uploads()
+        if dropped:
+            self.stderr.write(f"{dropped} pending uploads dropped: their images archive is gone")
+        get_upload_queue().join()
+        self.stdout.write(f"{queued} pending uploads retried")
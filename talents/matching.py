@@ -0,0 +1,310 @@
+import datetime
+import logging
+import math
+import sys
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from grito_talent_pool_server.db.pool import close_pools
+
+from .models import Talent
+
+logger = logging.getLogger(__name__)
+
+LEVELS = {"junior": 0, "intermediate": 1, "senior": 2, "expert": 3}
+ANY = "any"
+# Score lost per level between the requested and the talent's level
+LEVEL_PENALTY = 0.15
+
+
+def normalize(value):
+    return value.strip().lower() if value else ""
+
+
+class TalentIndex:
+    """
+    In-memory index over talent skills and facets, independent of the database.
+    Talents occupy slots; every skill and facet value maps to a bitset over those slots
+    (packed, one bit per slot), and levels are kept in an int8 array, so a query is a few
+    bitwise ANDs and vectorized sums over the whole catalog. Freed slots are reused and
+    storage doubles when full.
+    """
+
+    def __init__(self, capacity=1024):
+        self._capacity = max(8, -(-capacity // 8) * 8)
+        self._size = 0
+        self._free = []
+        self._ids = np.zeros(self._capacity, dtype=np.int64)
+        self._levels = np.full(self._capacity, -1, dtype=np.int8)
+        self._alive = self._new_bitset()
+        self._skills = {}
+        self._doc_freq = {}
+        self._countries = {}
+        self._genders = {}
+        self._slot_of = {}
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def _new_bitset(self):
+        return np.zeros(self._capacity // 8, dtype=np.uint8)
+
+    def _grow(self):
+        old_bytes = self._capacity // 8
+        self._capacity *= 2
+        self._ids = np.concatenate([self._ids, np.zeros_like(self._ids)])
+        self._levels = np.concatenate([self._levels, np.full_like(self._levels, -1)])
+        for bitsets in (self._skills, self._countries, self._genders):
+            for key, bits in bitsets.items():
+                bitsets[key] = np.concatenate([bits, np.zeros(old_bytes, dtype=np.uint8)])
+        self._alive = np.concatenate([self._alive, np.zeros(old_bytes, dtype=np.uint8)])
+
+    @staticmethod
+    def _set(bits, slot):
+        bits[slot >> 3] |= np.uint8(1 << (slot & 7))
+
+    @staticmethod
+    def _clear(bits, slot):
+        bits[slot >> 3] &= np.uint8(~(1 << (slot & 7)) & 0xFF)
+
+    @staticmethod
+    def _normalize_entry(skill_set, country, gender):
+        # Interned, so the same skill or country is stored once however many talents share it
+        # A tuple takes a fraction of a frozenset's memory, and each slot keeps one
+        skills = tuple({sys.intern(normalize(skill)) for skill in skill_set if normalize(skill)})
+        return skills, sys.intern(normalize(country)), sys.intern(normalize(gender))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build an index in one pass, setting each bitset with a single vectorized write
+        instead of one upsert per talent
+        :param rows: Iterable of (talent_id, skill_set, level, country, gender), ids unique
+        """
+        rows = list(rows)
+        index = cls(capacity=len(rows))
+        slots = {"skills": {}, "countries": {}, "genders": {}}
+        levels = []
+        for slot, (talent_id, skill_set, level, country, gender) in enumerate(rows):
+            entry = cls._normalize_entry(skill_set, country, gender)
+            skills, country, gender = entry
+            for skill in skills:
+                slots["skills"].setdefault(skill, []).append(slot)
+            slots["countries"].setdefault(country, []).append(slot)
+            slots["genders"].setdefault(gender, []).append(slot)
+            levels.append(LEVELS.get(normalize(level), -1))
+            index._slot_of[talent_id] = slot
+            index._entries[slot] = entry
+
+        size = len(rows)
+        index._size = size
+        index._ids[:size] = [row[0] for row in rows]
+        index._levels[:size] = levels
+        index._alive = index._pack(range(size))
+        for name, bitsets in (("skills", index._skills), ("countries", index._countries), ("genders", index._genders)):
+            for key, key_slots in slots[name].items():
+                bitsets[key] = index._pack(key_slots)
+        index._doc_freq = {skill: len(skill_slots) for skill, skill_slots in slots["skills"].items()}
+        return index
+
+    def _pack(self, slots):
+        bits = np.zeros(self._capacity, dtype=bool)
+        bits[np.fromiter(slots, dtype=np.int64)] = True
+        return np.packbits(bits, bitorder="little")
+
+    def upsert(self, talent_id, skill_set, level, country, gender):
+        self.remove(talent_id)
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._size == self._capacity:
+                self._grow()
+            slot = self._size
+            self._size += 1
+
+        skills, country, gender = entry = self._normalize_entry(skill_set, country, gender)
+        for skill in skills:
+            self._set(self._skills.setdefault(skill, self._new_bitset()), slot)
+            self._doc_freq[skill] = self._doc_freq.get(skill, 0) + 1
+        self._set(self._countries.setdefault(country, self._new_bitset()), slot)
+        self._set(self._genders.setdefault(gender, self._new_bitset()), slot)
+        self._set(self._alive, slot)
+        self._ids[slot] = talent_id
+        self._levels[slot] = LEVELS.get(normalize(level), -1)
+        self._slot_of[talent_id] = slot
+        self._entries[slot] = entry
+
+    def remove(self, talent_id):
+        slot = self._slot_of.pop(talent_id, None)
+        if slot is None:
+            return
+        skills, country, gender = self._entries.pop(slot)
+        for skill in skills:
+            self._clear(self._skills[skill], slot)
+            self._doc_freq[skill] -= 1
+        self._clear(self._countries[country], slot)
+        self._clear(self._genders[gender], slot)
+        self._clear(self._alive, slot)
+        self._free.append(slot)
+
+    def _unpack(self, bits):
+        return np.unpackbits(bits, count=self._size, bitorder="little")
+
+    def search(self, skill_set, level=None, country=None, gender=None, k=10):
+        """
+        Rank talents against a request.
+        A talent must have at least one requested skill and match country and gender unless
+        those are empty or "Any". Its score is the share of the requested skills it has,
+        each weighted by rarity (inverse document frequency), minus LEVEL_PENALTY per level
+        away from the requested one.
+        :return: Up to k (talent_id, score) pairs, best first
+        """
+        skills = {normalize(skill) for skill in skill_set} - {""}
+        if not skills or not self._slot_of:
+            return []
+
+        mask = self._alive.copy()
+        for value, bitsets in ((country, self._countries), (gender, self._genders)):
+            value = normalize(value)
+            if value and value != ANY:
+                if value not in bitsets:
+                    return []
+                mask &= bitsets[value]
+
+        # Rarer skills weigh more. Unknown skills still count against every talent
+        total = len(self._slot_of)
+        weights = {
+            skill: math.log(1 + total / self._doc_freq[skill]) for skill in skills if self._doc_freq.get(skill)
+        }
+        if not weights:
+            return []
+        requested_weight = sum(weights.values()) + math.log(1 + total) * (len(skills) - len(weights))
+
+        has_skill = np.zeros_like(mask)
+        scores = np.zeros(self._size, dtype=np.float32)
+        for skill, weight in weights.items():
+            bits = self._skills[skill]
+            has_skill |= bits
+            scores += self._unpack(bits) * np.float32(weight / requested_weight)
+
+        candidates = np.flatnonzero(self._unpack(mask & has_skill))
+        if not candidates.size:
+            return []
+        scores = scores[candidates]
+
+        requested_level = LEVELS.get(normalize(level), -1)
+        if requested_level >= 0:
+            levels = self._levels[candidates]
+            distance = np.abs(levels.astype(np.int16) - requested_level)
+            scores -= np.where(levels >= 0, distance, 0).astype(np.float32) * np.float32(LEVEL_PENALTY)
+
+        if candidates.size > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(candidates.size)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(self._ids[candidates[i]]), float(scores[i])) for i in top]
+
+    @property
+    def nbytes(self):
+        """Bytes held in NumPy arrays; the Python dicts keyed by id and skill come on top"""
+        bitsets = [*self._skills.values(), *self._countries.values(), *self._genders.values()]
+        return self._ids.nbytes + self._levels.nbytes + self._alive.nbytes + sum(b.nbytes for b in bitsets)
+
+
+class TalentMatcher:
+    """
+    Process-wide TalentIndex over live talents.
+    Built on first use (or at startup, see preload), kept current in this process by the
+    post_save receiver below, and every `sync_interval` seconds it pulls rows other
+    processes changed or archived, including bulk updates that send no signals.
+    """
+
+    def __init__(self, sync_interval=5):
+        self.sync_interval = sync_interval
+        self._index = None
+        self._synced_at = 0
+        self._last_modified = None
+        self._lock = threading.RLock()
+
+    @property
+    def index(self):
+        return self._index
+
+    def build(self):
+        started_at = timezone.now()
+        talents = Talent.objects.order_by().values_list("id", "skill_set", "level", "country", "gender")
+        index = TalentIndex.from_rows(talents.iterator(chunk_size=5000))
+        with self._lock:
+            self._index = index
+            self._last_modified = started_at
+            self._synced_at = time.monotonic()
+
+    def sync(self, force=False):
+        now = time.monotonic()
+        if not force and self._index is not None and now - self._synced_at < self.sync_interval:
+            return
+        with self._lock:
+            if not force and self._index is not None and now - self._synced_at < self.sync_interval:
+                return
+            if self._index is None:
+                self.build()
+                return
+            # Overlap the previous pull so rows committed late with an older timestamp are not missed
+            since = self._last_modified - datetime.timedelta(seconds=self.sync_interval * 2)
+            self._last_modified = timezone.now()
+            changed = Talent.objects.order_by().filter(last_modified__gte=since)
+            for row in changed.values_list("id", "skill_set", "level", "country", "gender"):
+                self._index.upsert(*row)
+            archived = Talent.super_objects.order_by().filter(archived__gte=since)
+            for talent_id in archived.values_list("id", flat=True):
+                self._index.remove(talent_id)
+            self._synced_at = now
+
+    def preload(self):
+        """
+        Build the index now, leaving it to the first match if the database is unavailable.
+        Under gunicorn --preload this runs in the master before workers are forked, so the
+        connections it opened are closed, pooled ones included, for no worker to inherit.
+        """
+        try:
+            self.sync(force=True)
+        except DatabaseError:
+            logger.warning("Talent index not preloaded; it will be built on first use", exc_info=True)
+        finally:
+            connections.close_all()
+            for alias in connections:
+                close_pools(alias)
+
+    def refresh(self, talent):
+        with self._lock:
+            if self._index is None:
+                return
+            if talent.archived is not None:
+                self._index.remove(talent.pk)
+            else:
+                self._index.upsert(talent.pk, talent.skill_set, talent.level, talent.country, talent.gender)
+
+    def match(self, skill_set, level=None, country=None, gender=None, k=10):
+        """
+        :return: Up to k (talent_id, score) pairs, best first; see TalentIndex.search
+        """
+        self.sync()
+        with self._lock:
+            return self._index.search(skill_set, level=level, country=country, gender=gender, k=k)
+
+
+matcher = TalentMatcher(sync_interval=settings.TALENT_MATCHER_SYNC_INTERVAL)
+
+
+@receiver(post_save, sender=Talent)
+def refresh_matcher(sender, instance, **kwargs):
+    transaction.on_commit(lambda: matcher.refresh(instance))
@@ -0,0 +1,75 @@
+from django.db import models
+from django.db.models import Q
+
+from grito_talent_pool_server.models import BaseModel
+
+from .fields import PortableArrayField, PortableGinIndex
+
+LIVE_ROWS = Q(archived__isnull=True)
+
+
+class Talent(BaseModel):
+    name = models.CharField(max_length=255)
+    country = models.CharField(max_length=100)
+    skill_set = PortableArrayField(models.CharField(max_length=100), default=list)
+    level = models.CharField(max_length=50)
+    gender = models.CharField(max_length=20)
+    portfolio = models.URLField(max_length=500)
+    image = models.URLField(max_length=500, blank=True)
+    # Variant name -> URL of a resized copy of the image, filled in the background after an upload
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    class Meta(BaseModel.Meta):
+        # Together these serve every combination of the listing facets (see filters.py)
+        # over live rows, already in listing order
+        indexes = [
+            *BaseModel.Meta.indexes,
+            models.Index(
+                fields=["country", "level", "gender", "-last_modified", "-id"],
+                condition=LIVE_ROWS,
+                name="talent_facets_idx",
+            ),
+            models.Index(
+                fields=["level", "gender", "-last_modified", "-id"],
+                condition=LIVE_ROWS,
+                name="talent_level_gender_idx",
+            ),
+            models.Index(
+                fields=["gender", "-last_modified", "-id"],
+                condition=LIVE_ROWS,
+                name="talent_gender_idx",
+            ),
+            PortableGinIndex(fields=["skill_set"], condition=LIVE_ROWS, name="talent_skill_set_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.level}, {self.country})"
+
+
+class PendingImageUpload(models.Model):
+    """
+    Image of an imported talent still to be uploaded from its archive. Written in the
+    transaction that inserts the talent and deleted once the upload is done, so uploads a
+    restart interrupts are not lost (see importer.resume_image_uploads).
+    """
+
+    talent = models.ForeignKey(Talent, on_delete=models.CASCADE, related_name="+")
+    archive = models.CharField(max_length=500)
+    # The archive is a temporary copy, deleted once its last image is uploaded
+    archive_is_temporary = models.BooleanField(default=False)
+    member = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.member} of {self.archive}"
+
+
+class TalentRequest(BaseModel):
+    client_name = models.CharField(max_length=255)
+    country = models.CharField(max_length=100)
+    skill_set = PortableArrayField(models.CharField(max_length=100), default=list)
+    level = models.CharField(max_length=50)
+    gender = models.CharField(max_length=20)
+
+    def __str__(self) -> str:
+        return f"{self.client_name}: {self.level} in {self.country}"
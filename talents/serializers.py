@@ -0,0 +1,33 @@
+from rest_framework import serializers
+
+from .models import Talent, TalentRequest
+
+
+class SkillSetField(serializers.ListField):
+    child = serializers.CharField(max_length=100)
+
+    def to_internal_value(self, data):
+        # Form posts send skills as one comma separated value
+        if isinstance(data, str):
+            data = data.split(",")
+        elif len(data) == 1 and isinstance(data[0], str):
+            data = data[0].split(",")
+        return [skill for skill in super().to_internal_value([s.strip() for s in data]) if skill]
+
+
+class TalentSerializer(serializers.ModelSerializer):
+    skillSet = SkillSetField(source="skill_set", allow_empty=False)
+    imageVariants = serializers.JSONField(source="image_variants", read_only=True)
+
+    class Meta:
+        model = Talent
+        fields = ("id", "name", "country", "skillSet", "level", "gender", "portfolio", "image", "imageVariants")
+
+
+class TalentRequestSerializer(serializers.ModelSerializer):
+    clientName = serializers.CharField(source="client_name", max_length=255)
+    skillSet = SkillSetField(source="skill_set", allow_empty=False)
+
+    class Meta:
+        model = TalentRequest
+        fields = ("id", "clientName", "country", "skillSet", "level", "gender")
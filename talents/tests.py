@@ -0,0 +1,413 @@
+import io
+import json
+import os
+import threading
+import time
+import zipfile
+from itertools import combinations
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.http import QueryDict
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from authentication.groups import SUPER_ADMIN
+from authentication.models import User
+from authentication.tokens import tokens_for_user
+from grito_talent_pool_server import storage
+from grito_talent_pool_server.storage import StubStorage, get_upload_queue
+
+from .cache import SingleFlight, get_catalog_stamp
+from .filters import filter_talents
+from .importer import ImageArchive, import_talents, resume_image_uploads
+from .matching import TalentIndex, TalentMatcher, matcher
+from .models import PendingImageUpload, Talent, TalentRequest
+
+requires_postgres = skipUnless(connection.vendor == "postgresql", "Query plans are checked on PostgreSQL")
+
+
+def make_talents(count):
+    countries = ["Nigeria", "Ghana", "Kenya", "Germany"]
+    levels = ["Junior", "Intermediate", "Senior"]
+    genders = ["Male", "Female"]
+    skills = ["Python", "Django", "Nodejs", "MongoDB", "React", "Java"]
+    return Talent.objects.bulk_create(
+        Talent(
+            name=f"Talent {i}",
+            country=countries[i % len(countries)],
+            level=levels[i % len(levels)],
+            gender=genders[i % len(genders)],
+            skill_set=[skills[i % len(skills)], skills[(i + 1) % len(skills)]],
+            portfolio=f"https://portfolio.example.com/{i}",
+        )
+        for i in range(count)
+    )
+
+
+@requires_postgres
+class TalentListingQueryPlanTests(TestCase):
+    params = {"country": "Nigeria", "level": "Senior", "gender": "Female", "skillSet": "Python,Django"}
+    # Index led by each facet, the first present of which should serve the combination
+    facet_indexes = {
+        "country": "talent_facets_idx",
+        "level": "talent_level_gender_idx",
+        "gender": "talent_gender_idx",
+    }
+
+    def expected_indexes(self, names):
+        facet = next((facet for facet in self.facet_indexes if facet in names), None)
+        expected = {self.facet_indexes[facet] if facet else "talent_live_idx"}
+        if "skillSet" in names:
+            expected.add("talent_skill_set_idx")
+        return expected
+
+    @classmethod
+    def setUpTestData(cls):
+        make_talents(2000)
+
+    def test_every_filter_combination_uses_its_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Talent._meta.db_table}")
+            # With sequential scans priced out, a Seq Scan left in a plan means no index fits
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+        for size in range(len(self.params) + 1):
+            for names in combinations(self.params, size):
+                query_params = QueryDict(mutable=True)
+                query_params.update({name: self.params[name] for name in names})
+                with self.subTest(filters=names):
+                    plan = filter_talents(Talent.objects.all(), query_params)[:10].explain()
+                    self.assertNotIn("Seq Scan", plan)
+                    expected = self.expected_indexes(names)
+                    self.assertTrue(any(index in plan for index in expected), f"None of {expected} in:\n{plan}")
+
+
+class TalentApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.talents = make_talents(12)
+        cls.admin = User.objects.create(email="admin@grito.africa", username="admin", is_active=True, is_verified=True)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.admin_client = APIClient()
+        token = tokens_for_user(self.admin, groups=[SUPER_ADMIN]).access_token
+        self.admin_client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_listing_filters_on_facets(self):
+        response = self.client.get(reverse("talents"), {"country": "Nigeria", "skillSet": "Python"})
+        self.assertEqual(response.status_code, 200)
+        expected = [t.pk for t in self.talents if t.country == "Nigeria" and "Python" in t.skill_set]
+        self.assertCountEqual([t["id"] for t in response.json()["results"]], expected)
+
+    def test_listing_revalidates_without_queries(self):
+        response = self.client.get(reverse("talents"), {"level": "Senior"})
+        etag = response["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("talents"), {"level": "Senior"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("talents"), {"level": "Senior"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], etag)
+
+        self.admin_client.patch(reverse("admin-talent", args=[self.talents[0].pk]), {"name": "New"}, format="json")
+        response = self.client.get(reverse("talents"), {"level": "Senior"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_catalog_last_modified_follows_the_changed_rows(self):
+        talent = self.talents[0]
+        talent.name = "Renamed"
+        talent.save()
+        self.assertEqual(get_catalog_stamp()["last_modified"], talent.last_modified)
+
+        Talent.objects.filter(pk=self.talents[1].pk).archive()
+        archived = Talent.super_objects.get(pk=self.talents[1].pk).archived
+        self.assertEqual(get_catalog_stamp()["last_modified"], archived)
+
+        response = self.client.get(reverse("talents"))
+        self.assertEqual(response["Last-Modified"], http_date(archived.timestamp()))
+
+    def test_admin_endpoints_require_super_admin(self):
+        self.assertEqual(self.client.get(reverse("admin-talents")).status_code, 401)
+
+    def test_admin_creates_updates_and_deletes_talent(self):
+        response = self.admin_client.post(
+            reverse("admin-talents"),
+            {
+                "name": "Buzz Brain",
+                "country": "Nigeria",
+                "skillSet": "Nodejs, MongoDB",
+                "level": "Intermediate",
+                "gender": "Male",
+                "portfolio": "https://portfolio.example.com",
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        talent = Talent.objects.get(pk=response.json()["data"]["id"])
+        self.assertEqual(talent.skill_set, ["Nodejs", "MongoDB"])
+
+        url = reverse("admin-talent", args=[talent.pk])
+        response = self.admin_client.patch(url, {"level": "Senior"}, format="json")
+        self.assertEqual(response.json()["data"]["level"], "Senior")
+
+        self.assertEqual(self.admin_client.delete(url).status_code, 200)
+        self.assertFalse(Talent.objects.filter(pk=talent.pk).exists())
+        self.assertEqual(self.admin_client.delete(url).status_code, 404)
+
+    def test_talent_request_returns_matches(self):
+        matcher.build()
+        response = self.client.post(
+            reverse("talent-request"),
+            {
+                "clientName": "Acme Corp",
+                "country": "Germany",
+                "skillSet": ["Java", "Spring"],
+                "level": "Junior",
+                "gender": "Any",
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(TalentRequest.objects.get().skill_set, ["Java", "Spring"])
+        self.assertEqual([t["id"] for t in response.json()["matches"]], [self.talents[11].pk])
+
+
+# Smallest valid GIF
+PIXEL = b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"
+
+
+def images_zip(*names, content=PIXEL):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name in names:
+            archive.writestr(f"photos/{name}", content)
+    buffer.seek(0)
+    return buffer
+
+
+class TalentImportTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        admin = User.objects.create(email="admin@grito.africa", username="admin", is_active=True, is_verified=True)
+        self.client = APIClient()
+        token = tokens_for_user(admin, groups=[SUPER_ADMIN]).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_import_creates_valid_rows_and_uploads_images_in_background(self):
+        rows = [
+            {"name": "Ada", "country": "Nigeria", "skillSet": ["Python"], "level": "Senior", "gender": "Female",
+             "portfolio": "https://portfolio.example.com/ada", "image": "ada.png"},
+            {"name": "Bad", "country": "Ghana", "skillSet": [], "level": "Junior", "gender": "Male",
+             "portfolio": "https://portfolio.example.com/bad"},
+            {"name": "Kofi", "country": "Ghana", "skillSet": ["Go", "React"], "level": "Junior", "gender": "Male",
+             "portfolio": "https://portfolio.example.com/kofi", "image": "https://images.example.com/kofi.png"},
+        ]
+        data = "".join(json.dumps(row) + "\n" for row in rows).encode()
+        with mock.patch.object(storage, "_storage", StubStorage()):
+            response = self.client.post(
+                reverse("admin-talent-import"),
+                {
+                    "file": SimpleUploadedFile("talents.ndjson", data),
+                    "images": SimpleUploadedFile("images.zip", images_zip("ada.png").read()),
+                },
+            )
+            get_upload_queue().join()
+
+        self.assertEqual(response.status_code, 200)
+        report = response.json()["data"]
+        self.assertEqual((report["created"], report["failed"], report["imagesQueued"]), (2, 1, 1))
+        self.assertEqual(report["errors"], [{"row": 2, "errors": {"skillSet": ["This list may not be empty."]}}])
+        ada = Talent.objects.get(name="Ada")
+        self.assertEqual(ada.image, f"https://images.invalid/talents/talent-{ada.pk}")
+        self.assertEqual(set(ada.image_variants), {"thumbnail", "carousel"})
+        self.assertEqual(Talent.objects.get(name="Kofi").image, "https://images.example.com/kofi.png")
+        self.assertFalse(PendingImageUpload.objects.exists())
+
+    def import_failing_upload(self):
+        """Import a row whose image upload fails. :return: the ImageArchive"""
+        row = {"name": "Ada", "country": "Nigeria", "skillSet": ["Python"], "level": "Senior", "gender": "Female",
+               "portfolio": "https://portfolio.example.com/ada", "image": "ada.png"}
+        images = ImageArchive.from_file(images_zip("ada.png"))
+        failing = StubStorage()
+        with (
+            mock.patch.object(failing, "open_stream", side_effect=storage.StorageError("unavailable")),
+            mock.patch.object(storage, "_storage", failing),
+            self.assertLogs("talents.importer", "ERROR"),
+        ):
+            import_talents(io.BytesIO(json.dumps(row).encode()), "ndjson", images=images)
+            get_upload_queue().join()
+        return images
+
+    def test_failed_upload_stays_pending_and_is_resumed(self):
+        images = self.import_failing_upload()
+        pending = PendingImageUpload.objects.get()
+        self.assertEqual((pending.archive, pending.member), (images.path, "ada.png"))
+        self.assertEqual(Talent.objects.get(name="Ada").image, "")
+        self.assertTrue(os.path.exists(images.path))
+
+        # The archive is reopened from the recorded path, as after a restart
+        with mock.patch.object(storage, "_storage", StubStorage()):
+            self.assertEqual(resume_image_uploads(), (1, 0))
+            get_upload_queue().join()
+        ada = Talent.objects.get(name="Ada")
+        self.assertEqual(ada.image, f"https://images.invalid/talents/talent-{ada.pk}")
+        self.assertFalse(PendingImageUpload.objects.exists())
+        self.assertFalse(os.path.exists(images.path))
+
+    def test_uploads_of_a_missing_archive_are_dropped(self):
+        os.unlink(self.import_failing_upload().path)
+        with self.assertLogs("talents.importer", "ERROR"):
+            self.assertEqual(resume_image_uploads(), (0, 1))
+        self.assertFalse(PendingImageUpload.objects.exists())
+
+
+class TalentImportValidationTests(SimpleTestCase):
+    header = "name,country,skillSet,level,gender,portfolio,image\n"
+
+    def import_csv(self, lines, images=None):
+        file = io.BytesIO((self.header + "".join(lines)).encode())
+        return import_talents(file, "csv", images=images, dry_run=True)
+
+    def test_invalid_rows_are_reported_without_stopping_the_import(self):
+        report = self.import_csv(
+            [
+                'Ada,Nigeria,"Python,Django",Senior,Female,https://portfolio.example.com/ada,\n',
+                "Bad,Ghana,Go,Junior,Male,not-a-url,\n",
+                ",Ghana,Go,Junior,Male,https://portfolio.example.com/x,\n",
+                'Kofi,Ghana,"[""Go"", ""React""]",Junior,Male,https://portfolio.example.com/kofi,\n',
+            ]
+        )
+        self.assertEqual((report.valid, report.failed), (2, 2))
+        self.assertEqual([error["row"] for error in report.errors], [2, 3])
+        self.assertEqual(list(report.errors[0]["errors"]), ["portfolio"])
+        self.assertEqual(list(report.errors[1]["errors"]), ["name"])
+
+    def test_ndjson_lines_that_are_not_objects_are_reported(self):
+        data = b'{"name": "Ada"\n[1, 2]\n\n'
+        report = import_talents(io.BytesIO(data), "ndjson", dry_run=True)
+        self.assertEqual(report.errors, [
+            {"row": 1, "errors": {"error": ["Not a JSON object"]}},
+            {"row": 2, "errors": {"error": ["Not a JSON object"]}},
+        ])
+
+    def test_image_file_names_must_be_in_the_archive(self):
+        row = "Ada,Nigeria,Python,Senior,Female,https://portfolio.example.com/ada,{}\n"
+        images = ImageArchive.from_file(images_zip("ada.png"))
+        report = self.import_csv([row.format("ada.png"), row.format("missing.png")], images=images)
+        self.assertEqual(report.valid, 1)
+        self.assertEqual(report.errors, [{"row": 2, "errors": {"image": ["Not found in the images archive"]}}])
+        # Nothing was queued, so the temporary copy went with the import's own reference
+        self.assertFalse(os.path.exists(images.path))
+
+        report = self.import_csv([row.format("ada.png")])
+        self.assertEqual(report.failed, 1)
+
+    def test_archive_members_are_checked_like_direct_uploads(self):
+        row = "Ada,Nigeria,Python,Senior,Female,https://portfolio.example.com/ada,{}\n"
+        images = ImageArchive.from_file(images_zip("script.png", content=b"=cmd|' /C calc'!A0"))
+        report = self.import_csv([row.format("script.png")], images=images)
+        self.assertEqual(report.errors, [{"row": 1, "errors": {"image": ["Must be a JPEG, PNG, GIF or WebP image"]}}])
+
+        # Sizes come from the zip directory: a bomb is refused without being inflated
+        images = ImageArchive.from_file(images_zip("bomb.gif", content=PIXEL + bytes(3 * 2**20)))
+        with override_settings(IMAGE_UPLOAD_MAX_SIZE=2**20):
+            report = self.import_csv([row.format("bomb.gif")], images=images)
+        self.assertEqual(report.errors, [{"row": 1, "errors": {"image": ["Larger than 1 MB"]}}])
+
+
+class TalentIndexTests(SimpleTestCase):
+    rows = [
+        (1, ["Python", "Django"], "Senior", "Nigeria", "Female"),
+        (2, ["Python"], "Senior", "Nigeria", "Male"),
+        (3, ["python", "Django", "React"], "Junior", "Ghana", "Female"),
+        (4, ["Java"], "Senior", "Nigeria", "Female"),
+    ]
+
+    def build(self, rows=None):
+        index = TalentIndex(capacity=2)
+        for row in rows or self.rows:
+            index.upsert(*row)
+        return index
+
+    def test_ranks_by_weighted_skill_overlap(self):
+        ranked = self.build().search(["Python", "Django"])
+        self.assertEqual([talent_id for talent_id, _ in ranked], [1, 3, 2])
+        self.assertAlmostEqual(ranked[0][1], 1.0, places=5)
+
+    def test_level_distance_lowers_the_score(self):
+        index = self.build()
+        without_level = dict(index.search(["Python", "Django"]))
+        with_level = dict(index.search(["Python", "Django"], level="Senior"))
+        self.assertAlmostEqual(with_level[1], without_level[1], places=5)
+        # Junior is two levels below Senior
+        self.assertAlmostEqual(with_level[3], without_level[3] - 0.3, places=5)
+
+    def test_country_and_gender_filter_unless_any(self):
+        index = self.build()
+        self.assertEqual([t for t, _ in index.search(["Python"], country="nigeria", gender="Female")], [1])
+        self.assertEqual(len(index.search(["Python"], country="Any", gender="Any")), 3)
+        self.assertEqual(index.search(["Python"], country="Kenya"), [])
+
+    def test_top_k(self):
+        self.assertEqual([t for t, _ in self.build().search(["Python", "Django"], k=2)], [1, 3])
+
+    def test_updates_and_removals_are_reflected(self):
+        index = self.build()
+        index.remove(1)
+        index.upsert(4, ["Java", "Django"], "Senior", "Nigeria", "Female")
+        self.assertEqual([t for t, _ in index.search(["Django"])], [3, 4])
+        self.assertEqual(len(index), 3)
+
+    def test_bulk_build_matches_incremental_build(self):
+        query = (["Python", "Django", "React"], "Junior", "Any", "Female")
+        self.assertEqual(TalentIndex.from_rows(self.rows).search(*query), self.build().search(*query))
+
+
+class TalentMatcherTests(SimpleTestCase):
+    def test_preload_leaves_no_connection_open(self):
+        preloading = TalentMatcher()
+        with (
+            mock.patch.object(preloading, "sync", side_effect=DatabaseError),
+            mock.patch("talents.matching.connections") as connections,
+            mock.patch("talents.matching.close_pools") as close_pools,
+            self.assertLogs("talents.matching", "WARNING"),
+        ):
+            connections.__iter__.return_value = iter(["default"])
+            preloading.preload()
+        connections.close_all.assert_called_once_with()
+        close_pools.assert_called_once_with("default")
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_calls_share_one_build(self):
+        flight = SingleFlight()
+        builds = []
+        results = []
+
+        def build():
+            builds.append(1)
+            time.sleep(0.05)
+            return "page"
+
+        threads = [threading.Thread(target=lambda: results.append(flight.do("key", build))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(results, ["page"] * 8)
+
+    def test_failed_build_is_not_kept(self):
+        flight = SingleFlight()
+        with self.assertRaises(ValueError):
+            flight.do("key", lambda: (_ for _ in ()).throw(ValueError()))
+        self.assertEqual(flight.do("key", lambda: "page"), "page")
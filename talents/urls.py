@@ -0,0 +1,10 @@
+from django.urls import path
+from . import apis as view
+
+urlpatterns = [
+    path("talents", view.TalentListView.as_view(), name="talents"),
+    path("admin/talents", view.AdminTalentView.as_view(), name="admin-talents"),
+    path("admin/talents/import", view.AdminTalentImportView.as_view(), name="admin-talent-import"),
+    path("admin/talents/<int:pk>", view.AdminTalentDetailView.as_view(), name="admin-talent"),
+    path("talent-request", view.TalentRequestView.as_view(), name="talent-request"),
+]